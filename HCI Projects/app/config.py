@@ -0,0 +1,83 @@
+"""
+Deployment settings shared by the UI, daemon, training and benchmarks.
+"""
+import os
+
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(APP_DIR, "models")
+
+
+# =========================
+# DATABASE
+# =========================
+# "mysql", or "sqlite" for a single-room install without a database
+# server (ATTENDANCE_DB_BACKEND overrides it, e.g. to benchmark both)
+DB_BACKEND = os.environ.get("ATTENDANCE_DB_BACKEND", "mysql")
+
+# MySQL server
+DB_HOST = "localhost"
+DB_PORT = 3306
+DB_USER = "root"
+DB_PASSWORD = ""
+DB_NAME = "attendance_system"
+
+# connections shared by the dashboard / daemon threads (mysql.connector
+# allows up to 32); command-line tools use a single connection
+DB_POOL_SIZE = 4
+
+# SQLite database file (WAL mode: keep it on a local disk)
+SQLITE_PATH = os.path.join(APP_DIR, "data", "attendance.sqlite")
+
+
+# =========================
+# CAMERAS
+# =========================
+# every source of a session: camera index, RTSP / HTTP URL or video file,
+# e.g. [0, "rtsp://192.168.1.20:554/stream1"]
+CAMERA_SOURCES = [0]
+
+# live preview redraws per second in the session window (0: no preview);
+# cameras keep capturing and recognizing at their own rate
+PREVIEW_FPS = 15
+
+# cores live recognition may use on average, split between all cameras
+# (recognition slows down rather than exceed it)
+RECOGNITION_CORES = 1.0
+
+
+# =========================
+# FACE DETECTION
+# =========================
+# "hog", "yunet", "ssd", "haar" or "lbp" (see app/recognition/detectors.py);
+# yunet and ssd are much faster but need a model file in app/models/
+DETECTOR_BACKEND = "hog"
+
+# OpenCV DNN models, downloaded into app/models/
+YUNET_MODEL = os.path.join(MODELS_DIR, "face_detection_yunet_2023mar.onnx")
+SSD_MODEL = os.path.join(MODELS_DIR, "res10_300x300_ssd_iter_140000.caffemodel")
+SSD_CONFIG = os.path.join(MODELS_DIR, "deploy.prototxt")
+
+# OpenCV ships the Haar cascades; the LBP cascade is a separate download
+LBP_CASCADE = os.path.join(MODELS_DIR, "lbpcascade_frontalface_improved.xml")
+
+
+# =========================
+# ATTENDANCE SPOOL
+# =========================
+# marks wait here until MySQL has them (see app/database/attendance_spool.py)
+ATTENDANCE_SPOOL = os.path.join(APP_DIR, "spool", "attendance.sqlite")
+
+
+# =========================
+# ATTENDANCE DAEMON
+# =========================
+# daemon.py serves live sessions here; the session window uses a running
+# daemon when it finds one and runs the cameras itself otherwise
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+SERVICE_URL = f"http://{SERVICE_HOST}:{SERVICE_PORT}"
+# shared secret sent as "Authorization: Bearer <token>"; required before
+# the daemon listens on anything but this machine (the preview shows
+# students' faces and names)
+SERVICE_TOKEN = os.environ.get("ATTENDANCE_SERVICE_TOKEN", "")
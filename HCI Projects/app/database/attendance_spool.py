@@ -0,0 +1,120 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from app import config
+
+
+class AttendanceSpool:
+    """
+    Attendance marks kept in a local SQLite file until MySQL has them.
+
+    Marks are appended here first and only removed once written to
+    MySQL, so they survive database outages and restarts of the app.
+    Marks the database refuses for good (unknown lecture or student) are
+    moved to the `rejected` table so they do not hold up the rest.
+    Both sides deduplicate on (lecture_id, student_id): a mark spooled
+    twice is stored once, and replaying a batch that already reached
+    MySQL (crash between the MySQL commit and remove()) changes nothing
+    there, as marks already in the database are skipped.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or config.ATTENDANCE_SPOOL
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        # shared by the recognition path (add) and the writer thread
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # a mark is on disk before add() returns, even across power loss
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self._lock = threading.Lock()
+
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS marks (
+            lecture_id INTEGER NOT NULL,
+            student_id INTEGER NOT NULL,
+            attendance_time TEXT NOT NULL,
+            status TEXT NOT NULL,
+            PRIMARY KEY (lecture_id, student_id)
+        )
+        """)
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS rejected (
+            lecture_id INTEGER NOT NULL,
+            student_id INTEGER NOT NULL,
+            attendance_time TEXT NOT NULL,
+            status TEXT NOT NULL,
+            error TEXT NOT NULL,
+            rejected_at TEXT NOT NULL
+        )
+        """)
+        self.conn.commit()
+
+    def add(self, lecture_id, student_id, attendance_time, status="Present"):
+        """
+        Returns: False if the student was already spooled for the lecture
+        """
+        with self._lock:
+            cursor = self.conn.execute("""
+                INSERT OR IGNORE INTO marks
+                (lecture_id, student_id, attendance_time, status)
+                VALUES (?, ?, ?, ?)
+            """, (lecture_id, student_id, attendance_time.isoformat(sep=" "), status))
+            self.conn.commit()
+            return cursor.rowcount > 0
+
+    def peek(self, limit):
+        """
+        Returns: up to `limit` oldest marks as
+                 [(lecture_id, student_id, attendance_time, status), ...]
+        """
+        with self._lock:
+            rows = self.conn.execute("""
+                SELECT lecture_id, student_id, attendance_time, status
+                FROM marks ORDER BY rowid LIMIT ?
+            """, (limit,)).fetchall()
+        return [(lecture_id, student_id, datetime.fromisoformat(when), status)
+                for lecture_id, student_id, when, status in rows]
+
+    def remove(self, marks):
+        """
+        Drop marks that are now in MySQL.
+        """
+        with self._lock:
+            self.conn.executemany(
+                "DELETE FROM marks WHERE lecture_id = ? AND student_id = ?",
+                [(lecture_id, student_id) for lecture_id, student_id, _, _ in marks]
+            )
+            self.conn.commit()
+
+    def reject(self, failed):
+        """
+        Move marks the database refused out of the queue, keeping them
+        (with the error) for an administrator to look at.
+        failed: [((lecture_id, student_id, attendance_time, status), error), ...]
+        """
+        now = datetime.now().isoformat(sep=" ")
+        with self._lock:
+            self.conn.executemany("""
+                INSERT INTO rejected
+                (lecture_id, student_id, attendance_time, status, error, rejected_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [
+                (lecture_id, student_id, when.isoformat(sep=" "), status, str(error), now)
+                for (lecture_id, student_id, when, status), error in failed
+            ])
+            self.conn.executemany(
+                "DELETE FROM marks WHERE lecture_id = ? AND student_id = ?",
+                [(mark[0], mark[1]) for mark, _ in failed]
+            )
+            self.conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM marks").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,175 @@
+import threading
+from datetime import datetime
+
+from app.database.attendance_spool import AttendanceSpool
+
+
+class AttendanceWriter:
+    """
+    Write-behind queue for attendance marks.
+
+    add() only appends the mark to the local spool, so recognition never
+    waits on MySQL and nothing is lost while it is unreachable. One
+    writer thread with its own connection moves spooled marks to MySQL
+    in batches of up to batch_size, with one multi-row insert and one
+    commit each, waiting max_wait seconds after a mark arrives so
+    that marks close together share a batch. A failed write reconnects
+    and is retried with growing delays for as long as the database is
+    down; marks still spooled when the app exits are written on its next
+    start. Any other error means some mark in the batch is refused (e.g.
+    its lecture no longer exists): the batch is split until the refused
+    marks are found, and those go to the spool's rejected table.
+    """
+
+    def __init__(self, db_factory, spool=None, batch_size=200, max_wait=0.5,
+                 retry_delay=0.5, max_retry_delay=30.0):
+        """
+        db_factory: returns a dedicated Database for the writer thread
+        spool: AttendanceSpool (default: the file set in config)
+        """
+        self.db_factory = db_factory
+        self.spool = spool if spool is not None else AttendanceSpool()
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+        self._thread = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._give_up = threading.Event()
+        self._lock = threading.Lock()
+        self._written = threading.Condition()
+
+    # =========================
+    # CONTROL
+    # =========================
+    def start(self):
+        """
+        Also replays what an earlier run left in the spool.
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                if not self._stop.is_set():
+                    return
+                self._thread.join()  # let a stopping thread finish first
+            self._stop.clear()
+            self._give_up.clear()
+            self._wake.set()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def flush(self, timeout=None):
+        """
+        Wait until every spooled mark is in MySQL.
+        Returns: False if marks were still spooled after `timeout` seconds
+        """
+        self._wake.set()
+        with self._written:
+            return self._written.wait_for(lambda: self.pending == 0, timeout)
+
+    def stop(self, timeout=10.0):
+        """
+        Write what is spooled, for up to `timeout` seconds, then end the
+        writer thread; anything left stays in the spool.
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._give_up.set()
+            self._thread.join(1.0)
+        if self.pending:
+            print(f"[WARNING] {self.pending} attendance marks left in {self.spool.path}")
+
+    @property
+    def pending(self):
+        return len(self.spool)
+
+    # =========================
+    # QUEUE
+    # =========================
+    def add(self, lecture_id, student_id, attendance_time=None, status="Present"):
+        """
+        attendance_time: when the student was seen (default: now, not
+                         when the batch happens to be written)
+        """
+        if attendance_time is None:
+            attendance_time = datetime.now()
+
+        self.spool.add(lecture_id, student_id, attendance_time, status)
+        self.start()
+        self._wake.set()
+
+    # =========================
+    # WRITER THREAD
+    # =========================
+    def _run(self):
+        db = None
+        delay = self.retry_delay
+        try:
+            while not self._give_up.is_set():
+                self._wake.clear()
+                batch = self.spool.peek(self.batch_size)
+
+                if not batch:
+                    if self._stop.is_set():
+                        break
+                    self._wake.wait(1.0)
+                    # let marks arriving together share a batch
+                    if not self._stop.is_set():
+                        self._give_up.wait(self.max_wait)
+                    continue
+
+                try:
+                    db = db or self.db_factory()
+                    rejected = self._write(db, batch)
+                except Exception as e:
+                    print(f"[WARNING] Attendance write failed, {self.pending} marks "
+                          f"spooled, retrying in {delay:.1f}s: {e}")
+                    if db is not None:
+                        try:
+                            db.close()
+                        except Exception:
+                            pass
+                    db = None
+                    self._give_up.wait(delay)
+                    delay = min(delay * 2, self.max_retry_delay)
+                    continue
+
+                if rejected:
+                    for (lecture_id, student_id, _, _), error in rejected:
+                        print(f"[ERROR] Attendance of student {student_id} for lecture "
+                              f"{lecture_id} refused by the database, moved to "
+                              f"{self.spool.path} (rejected): {error}")
+                    self.spool.reject(rejected)
+                    refused = {(mark[0], mark[1]) for mark, _ in rejected}
+                    batch = [mark for mark in batch if (mark[0], mark[1]) not in refused]
+
+                self.spool.remove(batch)
+                delay = self.retry_delay
+                with self._written:
+                    self._written.notify_all()
+        finally:
+            if db is not None:
+                db.close()
+            with self._written:
+                self._written.notify_all()
+
+    def _write(self, db, batch):
+        """
+        Writes what the database accepts; connection errors propagate
+        so the whole batch is retried.
+        Returns: [(mark, error), ...] refused for good
+        """
+        try:
+            db.mark_attendance_many(batch)
+            return []
+        except db.backend.connection_errors:
+            raise
+        except Exception as e:
+            if len(batch) == 1:
+                return [(batch[0], e)]
+
+        half = len(batch) // 2
+        return self._write(db, batch[:half]) + self._write(db, batch[half:])
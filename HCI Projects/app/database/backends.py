@@ -0,0 +1,673 @@
+"""
+Storage engines behind Database.
+
+Database writes its queries in MySQL syntax; a backend supplies the
+connections, the schema, the migrations and, for SQLite, the translation
+of the few MySQL constructs those queries use.
+
+Migrations are (version, description, steps) applied in order by
+Database.migrate(); a step is a statement or a function of the cursor.
+Both backends use the same version numbers.
+
+Change stamps (updated_at, deleted_at) and NOW() are UTC on both
+backends, so they never repeat when the clocks go back.
+"""
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, time as time_of_day, timedelta
+from functools import lru_cache
+
+from app import config
+
+
+# =========================
+# MYSQL
+# =========================
+MYSQL_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS students (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        student_code VARCHAR(50) UNIQUE,
+        name VARCHAR(255),
+        face_encoding LONGBLOB,
+        updated_at TIMESTAMP(6) NOT NULL
+            DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+        INDEX idx_students_updated_at (updated_at)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS instructors (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(255),
+        email VARCHAR(255)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS lectures (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        instructor_id INT,
+        course_name VARCHAR(255),
+        room VARCHAR(100),
+        session_date DATE,
+        start_time TIME,
+        end_time TIME,
+        FOREIGN KEY (instructor_id) REFERENCES instructors(id)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS attendance (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        lecture_id INT,
+        student_id INT,
+        attendance_time DATETIME,
+        status ENUM('Present','Late') DEFAULT 'Present',
+        UNIQUE (lecture_id, student_id),
+        FOREIGN KEY (lecture_id) REFERENCES lectures(id),
+        FOREIGN KEY (student_id) REFERENCES students(id)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS enrollments (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        course_name VARCHAR(255),
+        student_id INT,
+        UNIQUE (course_name, student_id),
+        FOREIGN KEY (student_id) REFERENCES students(id)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS student_templates (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        student_id INT NOT NULL,
+        template_no INT NOT NULL,
+        encoding LONGBLOB NOT NULL,
+        UNIQUE (student_id, template_no),
+        FOREIGN KEY (student_id) REFERENCES students(id)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        description VARCHAR(255) NOT NULL,
+        applied_at DATETIME NOT NULL
+    );
+    """,
+)
+
+
+def _mysql_add_updated_at(cursor):
+    # tables created before incremental gallery sync existed
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE()
+          AND TABLE_NAME = 'students' AND COLUMN_NAME = 'updated_at'
+    """)
+    if not cursor.fetchone()[0]:
+        cursor.execute("""
+            ALTER TABLE students
+            ADD COLUMN updated_at TIMESTAMP(6) NOT NULL
+                DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+            ADD INDEX idx_students_updated_at (updated_at)
+        """)
+
+
+def _mysql_index(table, name, columns):
+    """
+    Step creating an index unless it exists. MySQL has no
+    CREATE INDEX IF NOT EXISTS, and DDL commits on its own, so a
+    migration cut short after its index was built must be safe to rerun.
+    """
+    def step(cursor):
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE()
+              AND TABLE_NAME = %s AND INDEX_NAME = %s
+        """, (table, name))
+        if not cursor.fetchone()[0]:
+            cursor.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+    return step
+
+
+def _mysql_trigger(name, statement):
+    """
+    Step creating a trigger unless it exists (CREATE TRIGGER IF NOT
+    EXISTS needs MySQL 8.0.29).
+    """
+    def step(cursor):
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.TRIGGERS
+            WHERE TRIGGER_SCHEMA = DATABASE() AND TRIGGER_NAME = %s
+        """, (name,))
+        if not cursor.fetchone()[0]:
+            cursor.execute(statement)
+    return step
+
+
+MYSQL_MIGRATIONS = (
+    (1, "students.updated_at for incremental gallery sync", (
+        _mysql_add_updated_at,
+    )),
+    # get_student_report: attendance of one student, joined to lectures;
+    # list_lectures: every lecture, newest first
+    (2, "indexes for student reports and the lecture list", (
+        _mysql_index("attendance", "idx_attendance_student", "student_id, lecture_id"),
+        _mysql_index("lectures", "idx_lectures_date", "session_date, start_time"),
+    )),
+    # gallery caches learn about deleted students from here
+    (3, "student_deletions for gallery caches", (
+        """
+        CREATE TABLE IF NOT EXISTS student_deletions (
+            student_id INT PRIMARY KEY,
+            deleted_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+            INDEX idx_student_deletions_deleted_at (deleted_at)
+        )
+        """,
+        _mysql_trigger("students_deleted", """
+            CREATE TRIGGER students_deleted AFTER DELETE ON students
+            FOR EACH ROW
+                INSERT INTO student_deletions (student_id) VALUES (OLD.id)
+                ON DUPLICATE KEY UPDATE deleted_at = CURRENT_TIMESTAMP(6)
+        """),
+    )),
+    # TIMESTAMP columns are stored in UTC already; sessions now read
+    # and compare them in UTC (time_zone in MySQLBackend)
+    (4, "change stamps in UTC", ()),
+)
+
+
+class _MySQLCursor:
+    """
+    mysql.connector cursor that survives a server restart: when the
+    first statement of a transaction finds the connection dead, it
+    reconnects and runs that statement again. Later statements are not
+    retried, as the server has dropped what the transaction did so far.
+    """
+
+    def __init__(self, conn, errors):
+        self._conn = conn
+        self._errors = errors
+        self._cursor = None     # opened by the first statement
+
+    def execute(self, sql, params=()):
+        self._run("execute", sql, params)
+
+    def executemany(self, sql, rows):
+        self._run("executemany", sql, rows)
+
+    def _run(self, method, sql, params):
+        if self._cursor is not None:
+            getattr(self._cursor, method)(sql, params)
+            return
+
+        try:
+            self._cursor = self._conn.cursor()
+            getattr(self._cursor, method)(sql, params)
+        except self._errors as e:
+            print(f"[WARNING] Database connection lost, reconnecting: {e}")
+            self._conn.reconnect(attempts=3, delay=1)
+            self._cursor = self._conn.cursor()
+            getattr(self._cursor, method)(sql, params)
+
+    def __getattr__(self, name):
+        # fetchone, fetchall, lastrowid, description, ...
+        return getattr(self._cursor, name)
+
+    def close(self):
+        if self._cursor is None:
+            return
+        try:
+            self._cursor.close()
+        except self._errors:
+            pass    # connection already gone
+
+
+class _MySQLConnection:
+
+    def __init__(self, conn, errors):
+        self.conn = conn
+        self.errors = errors
+
+    def cursor(self):
+        return _MySQLCursor(self.conn, self.errors)
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+
+class MySQLBackend:
+    """
+    pool_size=0   one connection, operations take turns on it
+    pool_size=N   up to N connections, opened as needed and kept for
+                  reuse (callers wait while all N are busy)
+
+    A connection the server closed (restart, wait_timeout) is reopened
+    by the first statement that finds it dead.
+    """
+    name = "mysql"
+    schema = MYSQL_SCHEMA
+    migrations = MYSQL_MIGRATIONS
+
+    def __init__(self, pool_size=0):
+        import mysql.connector
+        from mysql.connector import errors
+
+        # server gone or unreachable: worth retrying, unlike bad data
+        self.connection_errors = (errors.OperationalError, errors.InterfaceError)
+        self.pool_size = max(pool_size, 1)
+        self._args = {
+            "host": config.DB_HOST,
+            "port": config.DB_PORT,
+            "user": config.DB_USER,
+            "password": config.DB_PASSWORD,
+            "database": config.DB_NAME,
+            # also set again when a lost connection is reopened
+            "time_zone": "+00:00",
+        }
+        self._connect = mysql.connector.connect
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self._lock = threading.Lock()
+        # the first connection right away: wrong settings fail here
+        self._idle = [self._connect(**self._args)]
+
+    @contextmanager
+    def connection(self):
+        with self._slots:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            conn = conn or self._connect(**self._args)
+            try:
+                yield _MySQLConnection(conn, self.connection_errors)
+            finally:
+                with self._lock:
+                    self._idle.append(conn)
+
+    def close(self):
+        # let borrowed connections come back first
+        taken = [self._slots.acquire(timeout=5.0) for _ in range(self.pool_size)]
+        try:
+            with self._lock:
+                idle, self._idle = self._idle, []
+            for conn in idle:
+                try:
+                    conn.close()
+                except self.connection_errors:
+                    pass
+        finally:
+            for acquired in taken:
+                if acquired:
+                    self._slots.release()
+
+
+# =========================
+# SQLITE
+# =========================
+# UTC with milliseconds, like MySQL's TIMESTAMP(6) (text sorts in time
+# order as long as every value has the same format)
+SQLITE_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+# stamps were local time before migration 4: the schema and migration 3
+# keep it, so that migration 4 converts every older stamp
+SQLITE_LOCAL_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"
+
+SQLITE_SCHEMA = (
+    f"""
+    CREATE TABLE IF NOT EXISTS students (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_code TEXT UNIQUE,
+        name TEXT,
+        face_encoding BLOB,
+        updated_at TIMESTAMP NOT NULL DEFAULT ({SQLITE_LOCAL_NOW})
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_students_updated_at ON students (updated_at)
+    """,
+    # MySQL's ON UPDATE CURRENT_TIMESTAMP
+    f"""
+    CREATE TRIGGER IF NOT EXISTS students_touch
+    AFTER UPDATE OF student_code, name, face_encoding ON students
+    BEGIN
+        UPDATE students SET updated_at = {SQLITE_LOCAL_NOW} WHERE id = NEW.id;
+    END
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS instructors (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        email TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS lectures (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        instructor_id INTEGER REFERENCES instructors(id),
+        course_name TEXT,
+        room TEXT,
+        session_date DATE,
+        start_time TIME,
+        end_time TIME
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS attendance (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        lecture_id INTEGER REFERENCES lectures(id),
+        student_id INTEGER REFERENCES students(id),
+        attendance_time DATETIME,
+        status TEXT DEFAULT 'Present' CHECK (status IN ('Present', 'Late')),
+        UNIQUE (lecture_id, student_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS enrollments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        course_name TEXT,
+        student_id INTEGER REFERENCES students(id),
+        UNIQUE (course_name, student_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS student_templates (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER NOT NULL REFERENCES students(id),
+        template_no INTEGER NOT NULL,
+        encoding BLOB NOT NULL,
+        UNIQUE (student_id, template_no)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at DATETIME NOT NULL
+    )
+    """,
+)
+
+SQLITE_MIGRATIONS = (
+    # the SQLite schema always had updated_at
+    (1, "students.updated_at for incremental gallery sync", ()),
+    (2, "indexes for student reports and the lecture list", (
+        """
+        CREATE INDEX IF NOT EXISTS idx_attendance_student
+        ON attendance (student_id, lecture_id)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_lectures_date
+        ON lectures (session_date, start_time)
+        """,
+    )),
+    (3, "student_deletions for gallery caches", (
+        f"""
+        CREATE TABLE IF NOT EXISTS student_deletions (
+            student_id INTEGER PRIMARY KEY,
+            deleted_at TIMESTAMP NOT NULL DEFAULT ({SQLITE_LOCAL_NOW})
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_student_deletions_deleted_at
+        ON student_deletions (deleted_at)
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS students_deleted
+        AFTER DELETE ON students
+        BEGIN
+            INSERT OR REPLACE INTO student_deletions (student_id, deleted_at)
+            VALUES (OLD.id, {SQLITE_LOCAL_NOW});
+        END
+        """,
+    )),
+    # the guard keeps the conversion to one run when two processes
+    # migrate together (the second waits for the first to commit)
+    (4, "change stamps in UTC", (
+        """
+        UPDATE students SET updated_at = strftime('%Y-%m-%d %H:%M:%f', updated_at, 'utc')
+        WHERE NOT EXISTS (SELECT 1 FROM schema_migrations WHERE version = 4)
+        """,
+        """
+        UPDATE student_deletions SET deleted_at = strftime('%Y-%m-%d %H:%M:%f', deleted_at, 'utc')
+        WHERE NOT EXISTS (SELECT 1 FROM schema_migrations WHERE version = 4)
+        """,
+        "DROP TRIGGER IF EXISTS students_touch",
+        f"""
+        CREATE TRIGGER students_touch
+        AFTER UPDATE OF student_code, name, face_encoding ON students
+        BEGIN
+            UPDATE students SET updated_at = {SQLITE_NOW} WHERE id = NEW.id;
+        END
+        """,
+        "DROP TRIGGER IF EXISTS students_deleted",
+        f"""
+        CREATE TRIGGER students_deleted
+        AFTER DELETE ON students
+        BEGIN
+            INSERT OR REPLACE INTO student_deletions (student_id, deleted_at)
+            VALUES (OLD.id, {SQLITE_NOW});
+        END
+        """,
+        # the column default stays local time (SQLite cannot alter it)
+        f"""
+        CREATE TRIGGER IF NOT EXISTS students_created
+        AFTER INSERT ON students
+        BEGIN
+            UPDATE students SET updated_at = {SQLITE_NOW} WHERE id = NEW.id;
+        END
+        """,
+    )),
+)
+
+_INSERT_IGNORE = re.compile(r"\bINSERT IGNORE\b")
+
+# MySQL construct -> SQLite equivalent, in the order they are applied
+_SQLITE_REWRITES = (
+    (re.compile(r"%s"), "?"),
+    (_INSERT_IGNORE, "INSERT OR IGNORE"),
+    (re.compile(r"\bON DUPLICATE KEY UPDATE\b"), "ON CONFLICT DO UPDATE SET"),
+    (re.compile(r"\bVALUES\((\w+)\)"), r"excluded.\1"),
+    (re.compile(r"\bCURRENT_TIMESTAMP\(6\)"), SQLITE_NOW),
+    (re.compile(r"\bNOW\(\)"), "datetime('now')"),
+)
+
+
+@lru_cache(maxsize=256)
+def translate(sql):
+    """
+    MySQL query of Database -> SQLite query.
+    Covers what Database uses: %s placeholders, INSERT IGNORE,
+    ON DUPLICATE KEY UPDATE col = VALUES(col) (SQLite 3.35+ upsert),
+    NOW() and CURRENT_TIMESTAMP(6) (both UTC).
+    """
+    for pattern, replacement in _SQLITE_REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+def _parse_time(value):
+    # "09:30" / "09:30:00" -> timedelta, as MySQL returns TIME columns
+    parts = [float(p) for p in value.decode().split(":")] + [0, 0]
+    return timedelta(hours=parts[0], minutes=parts[1], seconds=parts[2])
+
+
+def _format_time(value):
+    seconds = int(value.total_seconds())
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+# values go in and come back with the Python types mysql.connector uses
+sqlite3.register_adapter(datetime, lambda v: v.isoformat(" ", timespec="milliseconds"))
+sqlite3.register_adapter(date, lambda v: v.isoformat())
+sqlite3.register_adapter(time_of_day, lambda v: v.isoformat(timespec="seconds"))
+sqlite3.register_adapter(timedelta, _format_time)
+sqlite3.register_converter("TIMESTAMP", lambda v: datetime.fromisoformat(v.decode()))
+sqlite3.register_converter("DATETIME", lambda v: datetime.fromisoformat(v.decode()))
+sqlite3.register_converter("DATE", lambda v: date.fromisoformat(v.decode()))
+sqlite3.register_converter("TIME", _parse_time)
+
+
+class _SQLiteCursor:
+    """
+    sqlite3 cursor taking Database's MySQL queries.
+
+    MySQL's INSERT IGNORE also skips rows breaking a foreign key, which
+    SQLite's OR IGNORE does not: such rows are skipped here, one by one,
+    with a warning (MySQL only leaves a server-side warning).
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params=()):
+        params = tuple(params)
+        try:
+            self._cursor.execute(translate(sql), params)
+        except sqlite3.IntegrityError as e:
+            if not _INSERT_IGNORE.search(sql):
+                raise
+            print(f"[WARNING] Row ignored by INSERT IGNORE: {params}: {e}")
+
+    def executemany(self, sql, rows):
+        if not _INSERT_IGNORE.search(sql):
+            self._cursor.executemany(translate(sql), rows)
+            return
+
+        rows = [tuple(row) for row in rows]
+        try:
+            self._cursor.executemany(translate(sql), rows)
+        except sqlite3.IntegrityError:
+            # only the failing row was undone; the rows before it are in
+            # and are ignored again as duplicates
+            for row in rows:
+                self.execute(sql, row)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def close(self):
+        self._cursor.close()
+
+
+class _SQLiteConnection:
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def cursor(self):
+        return _SQLiteCursor(self.conn.cursor())
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+
+class SQLiteBackend:
+    """
+    One local file in WAL mode: readers never block the writer, so the
+    session, reports and the UI can share it. Connections are kept in a
+    small pool and reused by whichever thread needs one.
+    """
+    name = "sqlite"
+    schema = SQLITE_SCHEMA
+    migrations = SQLITE_MIGRATIONS
+    # locked, unreadable or missing file (retried, unlike bad data)
+    connection_errors = (sqlite3.OperationalError,)
+
+    def __init__(self, path=None, pool_size=0):
+        self.path = path or config.SQLITE_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        self.pool_size = max(pool_size, 1)
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=5.0,    # wait for another writer instead of failing
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-16000")       # 16 MB
+        conn.execute("PRAGMA mmap_size=268435456")     # 256 MB
+        return _SQLiteConnection(conn)
+
+    @contextmanager
+    def connection(self):
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        conn = conn or self._connect()
+
+        try:
+            yield conn
+        finally:
+            with self._lock:
+                if len(self._idle) < self.pool_size:
+                    self._idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.conn.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.conn.close()
+
+
+# =========================
+# FACTORY
+# =========================
+BACKENDS = {
+    "mysql": MySQLBackend,
+    "sqlite": SQLiteBackend,
+}
+
+
+def make_backend(kind=None, pool_size=0):
+    """
+    kind: key of BACKENDS (default: config.DB_BACKEND)
+    pool_size: connections kept for concurrent threads (0: one, MySQL)
+    """
+    kind = (kind or config.DB_BACKEND).lower()
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown database backend: {kind} (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[kind](pool_size=pool_size)
+
+
+# dropped in reverse order of the foreign keys
+TABLES = ("attendance", "enrollments", "student_templates", "lectures",
+          "instructors", "students", "student_deletions", "schema_migrations")
+
+
+def drop_tables(kind=None):
+    """
+    Used by the benchmarks and tests to empty a scratch database.
+    Never point it at the real one.
+    """
+    backend = make_backend(kind)
+    try:
+        with backend.connection() as conn:
+            cursor = conn.cursor()
+            for table in TABLES:
+                cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.commit()
+            cursor.close()
+    finally:
+        backend.close()
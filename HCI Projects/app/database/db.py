@@ -1,199 +1,570 @@
-import mysql.connector
-import pickle
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
 import numpy as np
 
+from app.database.backends import make_backend
+from app.database.encoding_codec import (
+    ENCODING_DIM, is_packed, pack_encoding, unpack_encoding, unpack_encodings
+)
+
+
+def _as_datetime(value):
+    # SQLite has no column type for an aggregate and returns text
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
 
 class Database:
-    def __init__(self):
-        self.conn = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="",
-            database="attendance_system"
-        )
-        self.cursor = self.conn.cursor()
-        self.create_tables()
+    """
+    Every method runs in its own transaction() on a borrowed connection,
+    so one Database can be used from several threads. Queries are
+    written for MySQL; the SQLite backend translates them.
+
+        pool_size=0   one connection, operations take turns on it
+        pool_size=N   up to N connections, operations of different
+                      threads run in parallel (callers wait while all N
+                      are busy)
+    """
+
+    def __init__(self, pool_size=0, backend=None, schema_version=None):
+        """
+        backend: "mysql" or "sqlite" (default: config.DB_BACKEND)
+        schema_version: migrate only up to this version (default: latest)
+        """
+        self.backend = make_backend(backend, pool_size=pool_size)
+        self._local = threading.local()
+        self.create_tables(schema_version)
+
+    # =========================
+    # CONNECTIONS
+    # =========================
+    @contextmanager
+    def transaction(self):
+        """
+        with db.transaction() as cursor: ...
+        Commits when the block ends, rolls back if it raises. Calls made
+        inside the block by the same thread join this transaction.
+        """
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is not None:
+            yield cursor
+            return
+
+        with self.backend.connection() as conn:
+            cursor = conn.cursor()
+            self._local.cursor = cursor
+            try:
+                yield cursor
+                conn.commit()
+            except Exception:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass  # connection lost: the server drops the transaction
+                raise
+            finally:
+                self._local.cursor = None
+                cursor.close()
+
+    def ping(self):
+        """
+        Health check.
+        Returns: True if the database answers
+        """
+        try:
+            with self.transaction() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+            return True
+        except Exception as e:
+            print(f"[WARNING] Database health check failed: {e}")
+            return False
 
     # =========================
     # TABLE CREATION
     # =========================
-    def create_tables(self):
-
-        self.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS students (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            student_code VARCHAR(50) UNIQUE,
-            name VARCHAR(255),
-            face_encoding LONGBLOB
-        );
-        """)
-
-        self.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS instructors (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            name VARCHAR(255),
-            email VARCHAR(255)
-        );
-        """)
-
-        self.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS lectures (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            instructor_id INT,
-            course_name VARCHAR(255),
-            room VARCHAR(100),
-            session_date DATE,
-            start_time TIME,
-            end_time TIME,
-            FOREIGN KEY (instructor_id) REFERENCES instructors(id)
-        );
-        """)
-
-        self.cursor.execute("""
-        CREATE TABLE IF NOT EXISTS attendance (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            lecture_id INT,
-            student_id INT,
-            attendance_time DATETIME,
-            status ENUM('Present','Late') DEFAULT 'Present',
-            UNIQUE (lecture_id, student_id),
-            FOREIGN KEY (lecture_id) REFERENCES lectures(id),
-            FOREIGN KEY (student_id) REFERENCES students(id)
-        );
-        """)
-
-        self.conn.commit()
+    def create_tables(self, schema_version=None):
+        with self.transaction() as cursor:
+            for statement in self.backend.schema:
+                cursor.execute(statement)
+        self.migrate(schema_version)
+
+    def get_schema_version(self):
+        with self.transaction() as cursor:
+            cursor.execute("SELECT MAX(version) FROM schema_migrations")
+            return cursor.fetchone()[0] or 0
+
+    def migrate(self, target=None):
+        """
+        Applies the backend's migrations newer than the database, each in
+        its own transaction together with its row in schema_migrations.
+        Steps are idempotent, so processes starting together (daemon and
+        dashboard) may both run one.
+        target: last version to apply (default: all)
+        Returns: versions applied
+        """
+        current = self.get_schema_version()
+        applied = []
+
+        for version, description, steps in self.backend.migrations:
+            if version <= current or (target is not None and version > target):
+                continue
+
+            with self.transaction() as cursor:
+                for step in steps:
+                    if callable(step):
+                        step(cursor)
+                    else:
+                        cursor.execute(step)
+                cursor.execute("""
+                    INSERT IGNORE INTO schema_migrations (version, description, applied_at)
+                    VALUES (%s, %s, NOW())
+                """, (version, description))
+
+            applied.append(version)
+            print(f"[INFO] Database schema {version}: {description}")
+
+        return applied
 
     # =========================
     # STUDENT METHODS
     # =========================
     def add_student(self, student_code, name, face_encoding):
-        blob = pickle.dumps(face_encoding)
-        self.cursor.execute("""
-            INSERT INTO students (student_code, name, face_encoding)
-            VALUES (%s, %s, %s)
-        """, (student_code, name, blob))
-        self.conn.commit()
+        blob = pack_encoding(face_encoding)
+        with self.transaction() as cursor:
+            cursor.execute("""
+                INSERT INTO students (student_code, name, face_encoding)
+                VALUES (%s, %s, %s)
+            """, (student_code, name, blob))
+
+    def update_encodings(self, encodings):
+        """
+        encodings: iterable of (student_id, numpy encoding)
+        """
+        with self.transaction() as cursor:
+            cursor.executemany("""
+                UPDATE students SET face_encoding = %s WHERE id = %s
+            """, [(pack_encoding(enc), sid) for sid, enc in encodings])
 
     def get_all_students(self):
         """
-        Used by FaceRecognizer
         Returns: (id, name, face_encoding)
         """
-        self.cursor.execute("""
-            SELECT id, name, face_encoding FROM students
-        """)
+        students, matrix = self.load_gallery()
+        return [
+            (sid, name, matrix[i])
+            for i, (sid, name) in enumerate(students)
+        ]
 
-        students = []
+    def bulk_upsert_students(self, students, templates=None, batch_size=500):
+        """
+        Used by train_dataset
+        students: iterable of (student_code, name, face_encoding)
+        templates: optional {student_code: [encoding, ...]}; when given,
+                   the templates of every student in the batch are
+                   replaced (students missing from it end up with none)
+        New students are inserted, existing ones (same student_code) get
+        the new encoding and keep their name. One multi-row
+        INSERT ... ON DUPLICATE KEY UPDATE and one commit per batch.
+        Returns: {student_code: id}
+        """
+        students = list(students)
+        ids = {}
 
-        for sid, name, blob in self.cursor.fetchall():
-            if blob is None:
-                continue  # تجاهل أي طالب ملوش Face Encoding
+        for start in range(0, len(students), batch_size):
+            batch = students[start:start + batch_size]
+            codes = [code for code, _, _ in batch]
 
-            try:
-                encoding = pickle.loads(blob)
-                # Ensure encoding is a numpy array
-                if not isinstance(encoding, np.ndarray):
-                    encoding = np.array(encoding)
-            except Exception as e:
-                print(f"[WARNING] Failed to load encoding for student {name} (ID: {sid}): {e}")
-                continue  # أمان إضافي لو البيانات بايظة
+            with self.transaction() as cursor:
+                cursor.executemany("""
+                    INSERT INTO students (student_code, name, face_encoding)
+                    VALUES (%s, %s, %s)
+                    ON DUPLICATE KEY UPDATE
+                        face_encoding = VALUES(face_encoding),
+                        updated_at = CURRENT_TIMESTAMP(6)
+                """, [(code, name, pack_encoding(enc)) for code, name, enc in batch])
+
+                placeholders = ", ".join(["%s"] * len(codes))
+                cursor.execute(
+                    f"SELECT student_code, id FROM students WHERE student_code IN ({placeholders})",
+                    codes
+                )
+                batch_ids = dict(cursor.fetchall())
+
+                if templates is not None:
+                    self.replace_templates({
+                        batch_ids[code]: templates.get(code, [])
+                        for code in codes
+                    })
+
+            ids.update(batch_ids)
+
+        return ids
+
+    def replace_templates(self, templates):
+        """
+        templates: {student_id: [encoding, ...]}
+        Replaces each student's stored templates and bumps its updated_at
+        so gallery caches pick the change up.
+        """
+        ids = list(templates)
+        if not ids:
+            return
+
+        placeholders = ", ".join(["%s"] * len(ids))
+        rows = [
+            (sid, no, pack_encoding(enc))
+            for sid, encodings in templates.items()
+            for no, enc in enumerate(encodings)
+        ]
+
+        with self.transaction() as cursor:
+            cursor.execute(
+                f"DELETE FROM student_templates WHERE student_id IN ({placeholders})", ids
+            )
+            if rows:
+                cursor.executemany("""
+                    INSERT INTO student_templates (student_id, template_no, encoding)
+                    VALUES (%s, %s, %s)
+                """, rows)
+            cursor.execute(
+                f"UPDATE students SET updated_at = CURRENT_TIMESTAMP(6) WHERE id IN ({placeholders})",
+                ids
+            )
+
+    def clear_encodings(self, student_codes):
+        """
+        Used by train_dataset for students whose photos are all gone.
+        Drops their encoding and templates (so they are no longer
+        recognized) but keeps the student and their attendance history.
+        """
+        codes = list(student_codes)
+        if not codes:
+            return
+
+        placeholders = ", ".join(["%s"] * len(codes))
+        with self.transaction() as cursor:
+            cursor.execute(f"""
+                DELETE FROM student_templates WHERE student_id IN (
+                    SELECT id FROM students WHERE student_code IN ({placeholders})
+                )
+            """, codes)
+            # bumps updated_at: gallery caches see the student as cleared
+            cursor.execute(
+                f"UPDATE students SET face_encoding = NULL WHERE student_code IN ({placeholders})",
+                codes
+            )
+
+    def load_gallery(self, max_templates=0):
+        """
+        Used by FaceRecognizer
+        Bulk-decodes every encoding into one float32 matrix.
+        max_templates: 0 loads one averaged row per student, otherwise up
+                       to that many template rows (students without
+                       templates fall back to their averaged encoding)
+        Returns: ([(id, name), ...], matrix with one row per template)
+        """
+        rows = self._fetch_gallery_rows(max_templates)
+        return self._decode_students(
+            [(sid, name, blob) for sid, name, blob, _ in rows if blob is not None]
+        )
+
+    def _fetch_gallery_rows(self, max_templates=0, since=None):
+        """
+        Returns: [(id, name, encoding blob, updated_at)], grouped by student
+        """
+        params = []
+        if max_templates:
+            select = """
+                SELECT s.id, s.name, s.face_encoding, t.encoding, s.updated_at
+                FROM students s
+                LEFT JOIN student_templates t
+                    ON t.student_id = s.id AND t.template_no < %s
+            """
+            order = "ORDER BY s.id, t.template_no"
+            params.append(max_templates)
+        else:
+            select = """
+                SELECT s.id, s.name, s.face_encoding, NULL, s.updated_at
+                FROM students s
+            """
+            order = "ORDER BY s.id"
+
+        where = ""
+        if since is not None:
+            where = "WHERE s.updated_at >= %s"
+            params.append(since)
+
+        with self.transaction() as cursor:
+            cursor.execute(f"{select} {where} {order}", params)
+            fetched = cursor.fetchall()
+
+        # a student whose averaged encoding was cleared is gone entirely
+        return [
+            (sid, name, template if (template and blob) else blob, updated)
+            for sid, name, blob, template, updated in fetched
+        ]
+
+    def get_gallery_revision(self):
+        """
+        Cheap freshness check for GalleryCache.
+        Returns: (number of students with an encoding,
+                  latest updated_at or deletion)
+        """
+        with self.transaction() as cursor:
+            cursor.execute("""
+                SELECT COUNT(face_encoding), MAX(updated_at) FROM students
+            """)
+            count, latest = cursor.fetchone()
+            cursor.execute("SELECT MAX(deleted_at) FROM student_deletions")
+            deleted = cursor.fetchone()[0]
+
+        changes = [_as_datetime(t) for t in (latest, deleted) if t is not None]
+        return count, max(changes, default=None)
+
+    def load_gallery_changes(self, since=None, max_templates=0):
+        """
+        Incremental loader used by GalleryCache.
+        Only rows updated at or after `since` are fetched (all rows when None).
+        Returns: (students, matrix, cleared_ids, watermark)
+            cleared_ids: changed students that no longer have an encoding
+                         or were deleted
+            watermark: latest updated_at or deletion among the fetched rows
+        """
+        rows = self._fetch_gallery_rows(max_templates, since)
+
+        with self.transaction() as cursor:
+            if since is None:
+                cursor.execute("SELECT student_id, deleted_at FROM student_deletions")
+            else:
+                cursor.execute("""
+                    SELECT student_id, deleted_at FROM student_deletions
+                    WHERE deleted_at >= %s
+                """, (since,))
+            deletions = cursor.fetchall()
+
+        watermark = max(
+            [r[3] for r in rows] + [deleted_at for _, deleted_at in deletions],
+            default=since
+        )
+        cleared = [sid for sid, _, blob, _ in rows if blob is None] + \
+            [sid for sid, _ in deletions]
+
+        students, matrix = self._decode_students(
+            [(sid, name, blob) for sid, name, blob, _ in rows if blob is not None]
+        )
+        return students, matrix, cleared, watermark
+
+    def _decode_students(self, rows):
+        """
+        Only packed encodings are read: pickled ones are left to
+        migrate_encodings, the one place that unpickles database contents.
+        """
+        packed = [r for r in rows if is_packed(r[2])]
+        legacy = len(rows) - len(packed)
 
-            students.append((sid, name, encoding))
+        if legacy:
+            print(
+                f"[WARNING] {legacy} students still use pickled encodings and are "
+                "skipped. Run: python -m app.database.migrate_encodings"
+            )
 
-        return students
+        try:
+            students = [(sid, name) for sid, name, _ in packed]
+            matrix = unpack_encodings([blob for _, _, blob in packed])
+        except ValueError:
+            # mixed formats or a damaged row: decode one by one
+            students, encodings = [], []
+            for sid, name, blob in packed:
+                try:
+                    encodings.append(unpack_encoding(blob))
+                except Exception as e:
+                    print(f"[WARNING] Failed to load encoding for student {name} (ID: {sid}): {e}")
+                    continue  # أمان إضافي لو البيانات بايظة
+                students.append((sid, name))
+            matrix = np.vstack(encodings) if encodings else np.empty((0, ENCODING_DIM), np.float32)
+
+        return students, matrix
 
     # =========================
     # INSTRUCTOR METHODS
     # =========================
     def add_instructor(self, name, email):
-        self.cursor.execute("""
-            INSERT INTO instructors (name, email)
-            VALUES (%s, %s)
-        """, (name, email))
-        self.conn.commit()
+        with self.transaction() as cursor:
+            cursor.execute("""
+                INSERT INTO instructors (name, email)
+                VALUES (%s, %s)
+            """, (name, email))
 
     def get_instructors(self):
-        self.cursor.execute("""
-            SELECT id, name FROM instructors
-        """)
-        return [
-            {"id": i, "name": n}
-            for i, n in self.cursor.fetchall()
-        ]
+        with self.transaction() as cursor:
+            cursor.execute("""
+                SELECT id, name FROM instructors
+            """)
+            return [
+                {"id": i, "name": n}
+                for i, n in cursor.fetchall()
+            ]
 
     # =========================
     # LECTURE METHODS
     # =========================
     def create_lecture(self, instructor_id, course_name, room,
                        session_date, start_time, end_time):
-        self.cursor.execute("""
-            INSERT INTO lectures
-            (instructor_id, course_name, room, session_date, start_time, end_time)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (
-            instructor_id,
-            course_name,
-            room,
-            session_date,
-            start_time,
-            end_time
-        ))
-        self.conn.commit()
-        return self.cursor.lastrowid
+        with self.transaction() as cursor:
+            cursor.execute("""
+                INSERT INTO lectures
+                (instructor_id, course_name, room, session_date, start_time, end_time)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, (
+                instructor_id,
+                course_name,
+                room,
+                session_date,
+                start_time,
+                end_time
+            ))
+            return cursor.lastrowid
+
+    def get_lecture(self, lecture_id):
+        """
+        Returns: the lecture as a dict, or None if there is no such lecture
+        """
+        with self.transaction() as cursor:
+            cursor.execute("""
+                SELECT id, course_name, room, session_date, start_time, end_time
+                FROM lectures
+                WHERE id = %s
+            """, (lecture_id,))
+            row = cursor.fetchone()
+
+        if row is None:
+            return None
+        keys = ("id", "course_name", "room", "session_date", "start_time", "end_time")
+        return dict(zip(keys, row))
 
     def list_lectures(self):
-        self.cursor.execute("""
-            SELECT id, course_name, session_date, start_time
-            FROM lectures
-            ORDER BY session_date DESC, start_time DESC
-        """)
-        return [
-            {
-                "id": i,
-                "course_name": c,
-                "session_date": d,
-                "start_time": t
-            }
-            for i, c, d, t in self.cursor.fetchall()
-        ]
+        with self.transaction() as cursor:
+            cursor.execute("""
+                SELECT id, course_name, session_date, start_time
+                FROM lectures
+                ORDER BY session_date DESC, start_time DESC
+            """)
+            return [
+                {
+                    "id": i,
+                    "course_name": c,
+                    "session_date": d,
+                    "start_time": t
+                }
+                for i, c, d, t in cursor.fetchall()
+            ]
+
+    # =========================
+    # ENROLLMENT METHODS
+    # =========================
+    def enroll_students(self, course_name, student_codes):
+        """
+        Adds students (by student_code) to a course roster.
+        Unknown codes and existing enrollments are ignored.
+        """
+        with self.transaction() as cursor:
+            cursor.executemany("""
+                INSERT IGNORE INTO enrollments (course_name, student_id)
+                SELECT %s, id FROM students WHERE student_code = %s
+            """, [(course_name, code) for code in student_codes])
+
+    def get_course_roster(self, course_name):
+        with self.transaction() as cursor:
+            cursor.execute("""
+                SELECT student_id FROM enrollments
+                WHERE course_name = %s
+            """, (course_name,))
+            return [sid for (sid,) in cursor.fetchall()]
+
+    def get_lecture_roster(self, lecture_id):
+        """
+        Used by FaceRecognizer
+        Returns: ids of students enrolled in the lecture's course
+        """
+        with self.transaction() as cursor:
+            cursor.execute("""
+                SELECT e.student_id
+                FROM lectures l
+                JOIN enrollments e ON e.course_name = l.course_name
+                WHERE l.id = %s
+            """, (lecture_id,))
+            return [sid for (sid,) in cursor.fetchall()]
 
     # =========================
     # ATTENDANCE METHODS
     # =========================
-    def mark_attendance(self, lecture_id, student_id, status="Present"):
-        self.cursor.execute("""
-            INSERT IGNORE INTO attendance
-            (lecture_id, student_id, attendance_time, status)
-            VALUES (%s, %s, NOW(), %s)
-        """, (lecture_id, student_id, status))
-        self.conn.commit()
+    def mark_attendance(self, lecture_id, student_id, status="Present",
+                        attendance_time=None):
+        """
+        attendance_time: when the student was seen (default: now), e.g.
+                         a timestamp taken from a lecture recording
+        """
+        # local time, like the marks of AttendanceWriter (NOW() is UTC)
+        if attendance_time is None:
+            attendance_time = datetime.now()
+
+        with self.transaction() as cursor:
+            cursor.execute("""
+                INSERT IGNORE INTO attendance
+                (lecture_id, student_id, attendance_time, status)
+                VALUES (%s, %s, %s, %s)
+            """, (lecture_id, student_id, attendance_time, status))
+
+    def mark_attendance_many(self, records):
+        """
+        Used by AttendanceWriter and video attendance
+        records: iterable of (lecture_id, student_id, attendance_time, status)
+        Students already marked for a lecture are left as they are. One
+        multi-row insert and one commit. Unlike INSERT IGNORE, a mark for
+        a lecture or student that does not exist raises (IntegrityError)
+        and nothing is written, so the caller can set it aside.
+        """
+        records = list(records)
+        if not records:
+            return
+
+        with self.transaction() as cursor:
+            # the no-op update only skips duplicates
+            cursor.executemany("""
+                INSERT INTO attendance
+                (lecture_id, student_id, attendance_time, status)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE id = id
+            """, records)
 
     # =========================
     # REPORT METHODS
     # =========================
     def get_student_report(self, student_id):
-        self.cursor.execute("""
-            SELECT l.course_name, l.session_date, a.status
-            FROM attendance a
-            JOIN lectures l ON a.lecture_id = l.id
-            WHERE a.student_id = %s
-            ORDER BY l.session_date
-        """, (student_id,))
-        return self.cursor.fetchall()
+        with self.transaction() as cursor:
+            cursor.execute("""
+                SELECT l.course_name, l.session_date, a.status
+                FROM attendance a
+                JOIN lectures l ON a.lecture_id = l.id
+                WHERE a.student_id = %s
+                ORDER BY l.session_date
+            """, (student_id,))
+            return cursor.fetchall()
 
     def get_lecture_report(self, lecture_id):
-        self.cursor.execute("""
-            SELECT s.student_code, s.name, a.status, a.attendance_time
-            FROM attendance a
-            JOIN students s ON a.student_id = s.id
-            WHERE a.lecture_id = %s
-        """, (lecture_id,))
-        return self.cursor.fetchall()
+        with self.transaction() as cursor:
+            cursor.execute("""
+                SELECT s.student_code, s.name, a.status, a.attendance_time
+                FROM attendance a
+                JOIN students s ON a.student_id = s.id
+                WHERE a.lecture_id = %s
+            """, (lecture_id,))
+            return cursor.fetchall()
 
     # =========================
     # CLEANUP
     # =========================
     def close(self):
-        self.cursor.close()
-        self.conn.close()
+        self.backend.close()
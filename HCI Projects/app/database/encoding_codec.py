@@ -0,0 +1,84 @@
+"""
+Compact binary format for face encodings stored in the database.
+
+    offset  size  field
+    0       2     magic b"FE"
+    2       1     format version
+    3       1     reserved (0)
+    4       2     dimension (uint16)
+    6       2     model id (uint16)
+    8       4*D   little-endian float32 values
+
+A 128-d encoding takes 520 bytes instead of ~1.2 KB as a float64 pickle,
+and a whole result set decodes with a single np.frombuffer call.
+"""
+import pickle
+import struct
+
+import numpy as np
+
+
+MAGIC = b"FE"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<2sBBHH")
+ENCODING_DIM = 128
+
+# face_recognition's dlib ResNet (128-d)
+MODEL_DLIB_RESNET = 1
+DEFAULT_MODEL_ID = MODEL_DLIB_RESNET
+
+
+def pack_encoding(encoding, model_id=DEFAULT_MODEL_ID):
+    values = np.asarray(encoding, dtype="<f4").ravel()
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(values), model_id)
+    return header + values.tobytes()
+
+
+def is_packed(blob):
+    return blob is not None and bytes(blob[:2]) == MAGIC
+
+
+def read_header(blob):
+    """
+    Returns: (version, dimension, model_id)
+    """
+    magic, version, _, dim, model_id = HEADER.unpack_from(blob)
+    if magic != MAGIC:
+        raise ValueError("Not a packed face encoding")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported encoding format version {version}")
+    return version, dim, model_id
+
+
+def unpack_encoding(blob):
+    _, dim, _ = read_header(blob)
+    return np.frombuffer(blob, dtype="<f4", count=dim, offset=HEADER.size)
+
+
+def unpack_legacy(blob):
+    """
+    Old rows hold pickle.dumps(numpy array). Only meant for migrating
+    existing data - never unpickle blobs from an untrusted database.
+    """
+    encoding = pickle.loads(blob)
+    return np.asarray(encoding, dtype=np.float32)
+
+
+def unpack_encodings(blobs):
+    """
+    Bulk loader: decodes a whole result set into one (N, D) float32 matrix.
+    All blobs must be packed with the same header.
+    """
+    blobs = [bytes(b) for b in blobs]
+    if not blobs:
+        return np.empty((0, ENCODING_DIM), dtype=np.float32)
+
+    _, dim, _ = read_header(blobs[0])
+    header = blobs[0][:HEADER.size]
+    row = np.dtype([("header", f"V{HEADER.size}"), ("values", "<f4", (dim,))])
+
+    if any(len(b) != row.itemsize or b[:HEADER.size] != header for b in blobs):
+        raise ValueError("Encodings use different formats, decode them one by one")
+
+    records = np.frombuffer(b"".join(blobs), dtype=row)
+    return np.ascontiguousarray(records["values"], dtype=np.float32)
@@ -0,0 +1,47 @@
+"""
+Enroll students in a course so its lectures only match their faces.
+
+Usage:
+    python -m app.database.enroll "Course Name" CODE1 CODE2 ...
+    python -m app.database.enroll --csv roster.csv
+
+The CSV has one "course_name,student_code" pair per line.
+"""
+import csv
+import sys
+from collections import defaultdict
+
+from app.database.db import Database
+
+
+def enroll_from_csv(db, path):
+    courses = defaultdict(list)
+
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if len(row) < 2 or not row[0].strip():
+                continue
+            courses[row[0].strip()].append(row[1].strip())
+
+    for course_name, codes in courses.items():
+        db.enroll_students(course_name, codes)
+        print(f"[INFO] {course_name}: {len(codes)} students enrolled")
+
+
+def main(argv):
+    if len(argv) == 2 and argv[0] == "--csv":
+        db = Database()
+        enroll_from_csv(db, argv[1])
+    elif len(argv) >= 2:
+        db = Database()
+        db.enroll_students(argv[0], argv[1:])
+        print(f"[INFO] {argv[0]}: {len(argv) - 1} students enrolled")
+    else:
+        print(__doc__)
+        return
+
+    db.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,48 @@
+"""
+One-shot migration of pickled face encodings to the binary format
+(see encoding_codec.py). Safe to run more than once.
+
+Usage:
+    python -m app.database.migrate_encodings [--dry-run]
+"""
+import sys
+
+from app.database.db import Database
+from app.database.encoding_codec import is_packed, unpack_legacy
+
+
+def migrate_encodings(batch_size=500, dry_run=False):
+    db = Database()
+
+    with db.transaction() as cursor:
+        cursor.execute("""
+            SELECT id, name, face_encoding FROM students
+            WHERE face_encoding IS NOT NULL
+        """)
+        legacy = [row for row in cursor.fetchall() if not is_packed(row[2])]
+
+    print(f"[INFO] {len(legacy)} pickled encodings to migrate")
+
+    converted = []
+    for sid, name, blob in legacy:
+        try:
+            converted.append((sid, unpack_legacy(blob)))
+        except Exception as e:
+            print(f"[SKIP] Student {name} (ID: {sid}): {e}")
+
+    if dry_run:
+        print(f"[DRY RUN] {len(converted)} encodings would be rewritten")
+        db.close()
+        return
+
+    for start in range(0, len(converted), batch_size):
+        batch = converted[start:start + batch_size]
+        db.update_encodings(batch)
+        print(f"[OK] Migrated {start + len(batch)}/{len(converted)}")
+
+    db.close()
+    print("[DONE] Encoding migration completed.")
+
+
+if __name__ == "__main__":
+    migrate_encodings(dry_run="--dry-run" in sys.argv[1:])
@@ -49,6 +49,20 @@ class Lecture:
     """
 
 
+# =========================
+# ENROLLMENT MODEL
+# =========================
+@dataclass
+class Enrollment:
+    id: Optional[int]
+    course_name: str
+    student_id: int
+    """
+    Links a student to a course.
+    Lectures of that course only match faces against enrolled students.
+    """
+
+
 # =========================
 # ATTENDANCE MODEL
 # =========================
@@ -0,0 +1,177 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from app.recognition.detectors import make_detector
+from app.recognition.tracker import box_iou
+
+
+class DetectionPolicy:
+    """
+    Where and at which resolution faces are searched for.
+
+    detector: backend from detectors.py (default: config.DETECTOR_BACKEND)
+    scales: detection passes, as factors of the frame size. (0.5,) is
+            the classic half-size pass; (0.5, 1.0) adds a full-size pass
+            that finds the small faces at the back of a lecture hall.
+    roi: search only regions of interest instead of the whole frame:
+            - the area that changed since the previous frame (motion)
+            - the door area, when given
+            - the previous faces' boxes, enlarged by track_margin
+         with a whole-frame scan every full_scan_every seconds so
+         nobody is missed for long.
+
+    Boxes are always returned in full-frame coordinates, so faces are
+    encoded from the full-resolution image.
+    """
+
+    def __init__(self, detector=None, scales=(0.5,), roi=False, door=None,
+                 track_margin=0.5, full_scan_every=2.0, motion_threshold=25, min_region=160):
+        """
+        door: (left, top, right, bottom) as fractions of the frame, e.g.
+              (0.0, 0.0, 0.25, 1.0) for a door on the left edge
+        motion_threshold: grey-level change (0-255) of a pixel counted as motion
+        min_region: regions are grown to at least this many pixels a side
+                    (detectors cannot find faces in tiny crops)
+        """
+        self.detector = detector or make_detector()
+        self.scales = tuple(scales)
+        self.roi = roi
+        self.door = door
+        self.track_margin = track_margin
+        self.full_scan_every = full_scan_every
+        self.motion_threshold = motion_threshold
+        self.min_region = min_region
+
+        self._lock = threading.Lock()
+        self._previous = None
+        self._last_full_scan = None
+
+    def reset(self):
+        with self._lock:
+            self._previous = None
+            self._last_full_scan = None
+
+    # =========================
+    # DETECTION
+    # =========================
+    def detect(self, rgb, track_boxes=(), now=None):
+        """
+        rgb: full-resolution RGB frame
+        track_boxes: face boxes of the previous pass (top, right, bottom, left)
+        Returns: face boxes (top, right, bottom, left) in frame coordinates
+        """
+        regions = self.regions(rgb, track_boxes, now)
+
+        boxes = []
+        for scale in self.scales:
+            for top, right, bottom, left in regions:
+                crop = rgb[top:bottom, left:right]
+                if scale != 1.0:
+                    crop = cv2.resize(crop, (0, 0), fx=scale, fy=scale)
+                else:
+                    crop = np.ascontiguousarray(crop)  # dlib / OpenCV need packed rows
+
+                for t, r, b, l in self.detector.detect(crop):
+                    boxes.append((
+                        top + int(round(t / scale)), left + int(round(r / scale)),
+                        top + int(round(b / scale)), left + int(round(l / scale))
+                    ))
+
+        return _suppress_duplicates(boxes)
+
+    # =========================
+    # REGIONS OF INTEREST
+    # =========================
+    def regions(self, rgb, track_boxes=(), now=None):
+        """
+        Returns: [(top, right, bottom, left), ...] to search, possibly empty
+        """
+        height, width = rgb.shape[:2]
+        whole = [(0, width, height, 0)]
+        if not self.roi:
+            return whole
+
+        now = time.monotonic() if now is None else now
+        motion = self._motion_box(rgb)
+
+        with self._lock:
+            if self._last_full_scan is None or now - self._last_full_scan >= self.full_scan_every:
+                self._last_full_scan = now
+                return whole
+
+        regions = []
+        if motion is not None:
+            regions.append(motion)
+        if self.door is not None:
+            l, t, r, b = self.door
+            regions.append((int(t * height), int(r * width), int(b * height), int(l * width)))
+        for top, right, bottom, left in track_boxes:
+            dy = int((bottom - top) * self.track_margin)
+            dx = int((right - left) * self.track_margin)
+            regions.append((top - dy, right + dx, bottom + dy, left - dx))
+
+        regions = [self._grow(region, width, height) for region in regions]
+        return _merge_overlapping(regions)
+
+    def _motion_box(self, rgb):
+        """
+        Bounding box of the pixels that changed since the previous frame.
+        """
+        height, width = rgb.shape[:2]
+        thumb = cv2.resize(cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY), (80, 60)).astype(np.int16)
+
+        with self._lock:
+            previous, self._previous = self._previous, thumb
+        if previous is None:
+            return None
+
+        ys, xs = np.nonzero(np.abs(thumb - previous) > self.motion_threshold)
+        if len(ys) < 3:
+            return None  # sensor noise
+
+        sy, sx = height / 60.0, width / 80.0
+        return (int(ys.min() * sy), int((xs.max() + 1) * sx),
+                int((ys.max() + 1) * sy), int(xs.min() * sx))
+
+    def _grow(self, region, width, height):
+        top, right, bottom, left = region
+        grow_y = max(0, self.min_region - (bottom - top)) // 2
+        grow_x = max(0, self.min_region - (right - left)) // 2
+        return (max(0, top - grow_y), min(width, right + grow_x),
+                min(height, bottom + grow_y), max(0, left - grow_x))
+
+
+def _merge_overlapping(regions):
+    """
+    Union overlapping regions so no area is searched twice.
+    """
+    regions = list(regions)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(regions)):
+            for j in range(i + 1, len(regions)):
+                a, b = regions[i], regions[j]
+                if a[0] < b[2] and b[0] < a[2] and a[3] < b[1] and b[3] < a[1]:
+                    regions[i] = (min(a[0], b[0]), max(a[1], b[1]),
+                                  max(a[2], b[2]), min(a[3], b[3]))
+                    del regions[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return regions
+
+
+def _suppress_duplicates(boxes, threshold=0.3):
+    """
+    The same face found by several passes: keep the first box.
+    """
+    kept = []
+    for box in boxes:
+        if all(box_iou(box, other) < threshold for other in kept):
+            kept.append(box)
+    return kept
@@ -0,0 +1,168 @@
+import os
+import threading
+
+import cv2
+import face_recognition
+
+from app import config
+
+
+# Every detector takes an RGB image and returns face boxes as
+# (top, right, bottom, left), the format face_recognition uses.
+
+
+class HogDetector:
+    """
+    dlib HOG + linear SVM (face_recognition's default). Accurate on
+    frontal faces, the slowest of the CPU backends.
+    """
+    name = "hog"
+
+    def __init__(self, upsample=1):
+        self.upsample = upsample
+
+    def detect(self, rgb):
+        return face_recognition.face_locations(
+            rgb, number_of_times_to_upsample=self.upsample, model="hog"
+        )
+
+
+class CascadeDetector:
+    """
+    OpenCV Viola-Jones cascade: Haar (shipped with opencv-python) or
+    LBP (faster, a little less accurate). Frontal faces only.
+    """
+
+    def __init__(self, kind="haar", path=None, scale_factor=1.1, min_neighbors=5, min_size=30):
+        if path is None:
+            path = (os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml")
+                    if kind == "haar" else config.LBP_CASCADE)
+        _require(path)
+
+        self.name = kind
+        self.classifier = cv2.CascadeClassifier(path)
+        if self.classifier.empty():
+            raise RuntimeError(f"Cannot load cascade: {path}")
+
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = (min_size, min_size)
+        self._lock = threading.Lock()
+
+    def detect(self, rgb):
+        gray = cv2.equalizeHist(cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY))
+        with self._lock:
+            found = self.classifier.detectMultiScale(
+                gray, scaleFactor=self.scale_factor,
+                minNeighbors=self.min_neighbors, minSize=self.min_size
+            )
+        return [(int(y), int(x + w), int(y + h), int(x)) for x, y, w, h in found]
+
+
+class YuNetDetector:
+    """
+    OpenCV's YuNet CNN (ONNX, cv2.FaceDetectorYN, OpenCV >= 4.8).
+    Fast on CPU and handles profile faces and small faces far better
+    than the cascades.
+    """
+    name = "yunet"
+
+    def __init__(self, path=None, score_threshold=0.8, nms_threshold=0.3):
+        path = path or config.YUNET_MODEL
+        _require(path)
+
+        self.model = cv2.FaceDetectorYN.create(
+            path, "", (320, 320), score_threshold, nms_threshold
+        )
+        self._lock = threading.Lock()
+
+    def detect(self, rgb):
+        height, width = rgb.shape[:2]
+        bgr = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+
+        with self._lock:
+            self.model.setInputSize((width, height))
+            _, faces = self.model.detect(bgr)
+
+        if faces is None:
+            return []
+        return [_clip(x, y, w, h, width, height) for x, y, w, h in faces[:, :4]]
+
+
+class SsdDetector:
+    """
+    OpenCV DNN ResNet-10 SSD (res10_300x300, Caffe or ONNX export).
+    """
+    name = "ssd"
+
+    def __init__(self, path=None, config_path=None, confidence=0.6):
+        path = path or config.SSD_MODEL
+        config_path = config_path if config_path is not None else config.SSD_CONFIG
+        _require(path)
+        if config_path:
+            _require(config_path)
+
+        self.net = cv2.dnn.readNet(path, config_path or "")
+        self.confidence = confidence
+        self._lock = threading.Lock()
+
+    def detect(self, rgb):
+        height, width = rgb.shape[:2]
+        blob = cv2.dnn.blobFromImage(
+            cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR), 1.0, (300, 300), (104.0, 177.0, 123.0)
+        )
+
+        with self._lock:
+            self.net.setInput(blob)
+            detections = self.net.forward()
+
+        boxes = []
+        for _, _, score, x0, y0, x1, y1 in detections.reshape(-1, 7):
+            if score < self.confidence:
+                continue
+            x0, x1 = x0 * width, x1 * width
+            y0, y1 = y0 * height, y1 * height
+            boxes.append(_clip(x0, y0, x1 - x0, y1 - y0, width, height))
+        return boxes
+
+
+def _clip(x, y, w, h, width, height):
+    left, top = max(0, int(x)), max(0, int(y))
+    right, bottom = min(width, int(x + w)), min(height, int(y + h))
+    return (top, right, bottom, left)
+
+
+def _require(path):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Detector model not found: {path}")
+
+
+HOG_OPTIONS = ("upsample",)
+
+DETECTORS = {
+    "hog": HogDetector,
+    "haar": lambda **options: CascadeDetector("haar", **options),
+    "lbp": lambda **options: CascadeDetector("lbp", **options),
+    "yunet": YuNetDetector,
+    "ssd": SsdDetector,
+}
+
+
+def make_detector(kind=None, **options):
+    """
+    Build the detector named `kind` (default: config.DETECTOR_BACKEND).
+    A backend that cannot load (model file missing or unreadable, OpenCV
+    too old for cv2.FaceDetectorYN) falls back to HOG, which keeps the
+    options it understands.
+    """
+    kind = kind or config.DETECTOR_BACKEND
+    if kind not in DETECTORS:
+        raise ValueError(f"Unknown detector backend: {kind}")
+
+    try:
+        return DETECTORS[kind](**options)
+    except (FileNotFoundError, AttributeError, RuntimeError, cv2.error) as e:
+        if kind == "hog":
+            raise
+        print(f"[WARNING] {kind} detector unavailable ({e}); using the HOG detector instead")
+        return HogDetector(**{k: v for k, v in options.items() if k in HOG_OPTIONS})
@@ -0,0 +1,157 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import dlib
+import numpy as np
+from face_recognition import api
+
+
+def _to_rect(box):
+    top, right, bottom, left = box
+    return dlib.rectangle(left, top, right, bottom)
+
+
+class _Request:
+
+    def __init__(self, chips):
+        self.chips = chips
+        self.future = Future()
+
+
+class BatchEncoder:
+    """
+    Encodes faces from several frames / cameras in one dlib call.
+
+    Callers align their faces (landmarks + 150x150 chip, cheap) on their
+    own thread and queue the chips. One encoder thread collects chips
+    until batch_size faces are waiting or max_wait seconds passed since
+    the first one, runs the ResNet once for the whole batch and hands
+    each caller its own encodings back through a Future.
+
+    Produces the same encodings as face_recognition.face_encodings.
+    After stop(), requests fail until start() is called again.
+    """
+
+    def __init__(self, batch_size=32, max_wait=0.01, num_jitters=1, timeout=10.0):
+        """
+        timeout: seconds encode() waits for its batch before giving up
+        """
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.num_jitters = num_jitters
+        self.timeout = timeout
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    # =========================
+    # CONTROL
+    # =========================
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                if not self._stop.is_set():
+                    return
+                self._thread.join()  # let a stopping thread finish first
+            self._stop.clear()
+            self._start_thread()
+
+    def _start_thread(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        # under the lock: a submit() either queued before (and is
+        # answered or failed by the thread) or sees the stop
+        with self._lock:
+            self._stop.set()
+
+    # =========================
+    # SUBMIT
+    # =========================
+    def submit(self, rgb, boxes):
+        """
+        rgb: RGB frame, boxes: [(top, right, bottom, left), ...]
+        Returns: Future resolving to one 128-d encoding per box
+        """
+        chips = [
+            dlib.get_face_chip(
+                rgb, api.pose_predictor_5_point(rgb, _to_rect(box)), size=150, padding=0.25
+            )
+            for box in boxes
+        ]
+
+        request = _Request(chips)
+        if not chips:
+            request.future.set_result([])
+            return request.future
+
+        with self._lock:
+            if self._stop.is_set():
+                request.future.set_exception(RuntimeError("Encoder stopped"))
+                return request.future
+            if self._thread is None or not self._thread.is_alive():
+                self._start_thread()
+            self._queue.put(request)
+        return request.future
+
+    def encode(self, rgb, boxes):
+        """
+        Blocking submit(): drop-in for face_recognition.face_encodings.
+        Raises: RuntimeError when stopped, TimeoutError after self.timeout
+        """
+        return self.submit(rgb, boxes).result(self.timeout)
+
+    # =========================
+    # ENCODER THREAD
+    # =========================
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            batch = [first]
+            faces = len(first.chips)
+            deadline = time.monotonic() + self.max_wait
+
+            while faces < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                faces += len(request.chips)
+
+            self._encode_batch(batch)
+
+        # fail whatever is still queued so no caller waits forever
+        while True:
+            try:
+                self._queue.get_nowait().future.set_exception(RuntimeError("Encoder stopped"))
+            except queue.Empty:
+                break
+
+    def _encode_batch(self, batch):
+        chips = [chip for request in batch for chip in request.chips]
+
+        try:
+            descriptors = api.face_encoder.compute_face_descriptor(chips, self.num_jitters)
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        start = 0
+        for request in batch:
+            end = start + len(request.chips)
+            request.future.set_result([np.array(d) for d in descriptors[start:end]])
+            start = end
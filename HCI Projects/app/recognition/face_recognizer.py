@@ -1,65 +1,319 @@
+import threading
+
 import cv2
 import numpy as np
 import face_recognition
 
+from app.recognition.detection import DetectionPolicy
+from app.recognition.gallery import Gallery
+from app.recognition.index import make_index
+
+
+class _Snapshot:
+    """
+    Everything one recognition pass reads, swapped as a single reference
+    so a background refresh never exposes a half-built gallery.
+    """
+
+    __slots__ = ("global_gallery", "global_index", "gallery", "index", "roster")
+
+    def __init__(self, global_gallery, global_index, roster=None):
+        self.global_gallery = global_gallery
+        self.global_index = global_index
+        self.roster = roster
+
+        if roster is None:
+            self.gallery, self.index = global_gallery, global_index
+        else:
+            # a roster is ~100 students: exact search is already instant
+            self.gallery = global_gallery.subset(roster)
+            self.index = make_index("exact", self.gallery)
+
 
 class FaceRecognizer:
-    def __init__(self, db, tolerance=0.38):
+    def __init__(self, db, tolerance=0.38, margin=0.12,
+                 index="exact", index_options=None, verify=True,
+                 roster_fallback=False, cache=None, max_templates=0, detection=None,
+                 encoder=None, sync_cache=True):
+        """
+        index: "exact" (brute force) or "ivf" (approximate, for very
+               large galleries)
+        verify: re-check matches accepted by an approximate index with
+                exact search, so it can only ever miss, never mislabel
+        roster_fallback: when a lecture roster is active, faces that match
+                nobody on it are retried against every student
+        cache: optional GalleryCache; the gallery is then read from a
+               local memory-mapped file kept fresh by incremental sync
+        max_templates: match against up to this many stored templates per
+               student (min distance) instead of one averaged encoding
+        detection: DetectionPolicy (detector backend, scales, regions of
+               interest); the default is one half-size pass over the
+               whole frame with config.DETECTOR_BACKEND
+        encoder: optional BatchEncoder shared with other recognizers /
+               workers, so faces from several frames are encoded together
+        sync_cache: False to only read the cache, when another process
+               keeps it synced (video attendance workers)
+        """
         self.db = db
         self.tolerance = tolerance
-        self.known_students = []
-        self.known_encodings = []
+        self.margin = margin
+        self.index_kind = index
+        self.index_options = index_options or {}
+        self.verify = verify
+        self.roster_fallback = roster_fallback
+        self.cache = cache
+        self.sync_cache = sync_cache
+        self.max_templates = max_templates
+        self.detection = detection or DetectionPolicy()
+        self.encoder = encoder
+
+        self._revision = None
+        # writers of _snapshot (refresh thread, session start/stop) take
+        # turns; recognition only reads the reference and never waits
+        self._snapshot_lock = threading.Lock()
+        self._refresh_thread = None
+        self._refresh_stop = threading.Event()
+
+        empty = Gallery([])
+        self._snapshot = _Snapshot(empty, make_index("exact", empty))
         self._load_students()
 
+    # =========================
+    # CURRENT GALLERY
+    # =========================
+    @property
+    def gallery(self):
+        return self._snapshot.gallery
+
+    @property
+    def index(self):
+        return self._snapshot.index
+
+    @property
+    def global_gallery(self):
+        return self._snapshot.global_gallery
+
+    @property
+    def roster(self):
+        return self._snapshot.roster
+
+    @property
+    def known_students(self):
+        return self._snapshot.global_gallery.students
+
     def _load_students(self):
-        self.known_students.clear()
-        self.known_encodings.clear()
+        if self.cache is not None:
+            students, matrix = self._load_from_cache()
+        else:
+            self._revision = self.db.get_gallery_revision()
+            students, matrix = self.db.load_gallery(self.max_templates)
+
+        self._install(students, matrix)
+        print(f"[FaceRecognizer] Loaded {len(self.known_students)} students "
+              f"({len(self.global_gallery.matrix)} encodings)")
+
+    def _load_from_cache(self, db=None):
+        db = db or self.db
+        try:
+            if self.sync_cache:
+                self.cache.sync(db)
+            loaded = self.cache.load()
+        except Exception as e:
+            print(f"[WARNING] Gallery cache unavailable, loading from database: {e}")
+            loaded = None
+
+        if loaded is None:
+            return db.load_gallery(self.max_templates)
+        return loaded
+
+    def _install(self, students, matrix):
+        """
+        Build the new gallery and index off to the side, then publish
+        them with one reference assignment (atomic in CPython).
+        """
+        gallery = Gallery.from_matrix(students, matrix)
+        index = make_index(self.index_kind, gallery, **self.index_options)
+        with self._snapshot_lock:
+            self._snapshot = _Snapshot(gallery, index, self._snapshot.roster)
+
+    # =========================
+    # HOT RELOAD
+    # =========================
+    def refresh(self, db=None):
+        """
+        Reload the gallery if students were enrolled or retrained since
+        the last load. Safe to call while recognize_faces runs.
+        Returns: True when a new gallery was swapped in
+        """
+        db = db or self.db
+
+        if self.cache is not None:
+            if not self.cache.sync(db):
+                return False
+            students, matrix = self.cache.load()
+        else:
+            revision = db.get_gallery_revision()
+            if revision == self._revision:
+                return False
+            students, matrix = db.load_gallery(self.max_templates)
+            self._revision = revision
+
+        self._install(students, matrix)
+        print(f"[FaceRecognizer] Gallery reloaded: {len(self.known_students)} students")
+        return True
 
-        students = self.db.get_all_students()
-        print(f"[FaceRecognizer] Loaded {len(students)} students from database")
+    def start_auto_refresh(self, db_factory, interval=30.0):
+        """
+        Poll for gallery changes on a background thread.
+        db_factory: returns a dedicated Database for that thread
+        (a connection must not be shared with the camera thread).
+        """
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            if not self._refresh_stop.is_set():
+                return
+            self._refresh_thread.join()  # let a stopping thread finish its refresh
 
-        for sid, name, encoding in students:
-            if isinstance(encoding, np.ndarray):
-                self.known_students.append((sid, name, encoding))
-                self.known_encodings.append(encoding)
+        self._refresh_stop.clear()
+        self._refresh_thread = threading.Thread(
+            target=self._refresh_loop, args=(db_factory, interval), daemon=True
+        )
+        self._refresh_thread.start()
+
+    def stop_auto_refresh(self):
+        self._refresh_stop.set()
+
+    def _refresh_loop(self, db_factory, interval):
+        db = None
+        try:
+            while not self._refresh_stop.wait(interval):
+                try:
+                    db = db or db_factory()
+                    self.refresh(db)
+                except Exception as e:
+                    print(f"[WARNING] Gallery refresh failed: {e}")
+                    if db is not None:
+                        try:
+                            db.close()
+                        except Exception:
+                            pass
+                    db = None
+        finally:
+            if db is not None:
+                db.close()
+
+    # =========================
+    # COURSE ROSTER
+    # =========================
+    def use_lecture(self, lecture_id):
+        """
+        Restrict matching to the students enrolled in the lecture's course.
+        Courses without enrollments keep matching every student.
+        Returns: number of students faces are matched against
+        """
+        roster = self.db.get_lecture_roster(lecture_id)
+        with self._snapshot_lock:
+            current = self._snapshot
+            self._snapshot = _Snapshot(
+                current.global_gallery, current.global_index,
+                set(roster) if roster else None
+            )
+
+        if not roster:
+            print(f"[FaceRecognizer] No roster for lecture {lecture_id}, using all students")
+        else:
+            print(f"[FaceRecognizer] Lecture {lecture_id} roster: {len(self.gallery)} students")
+        return len(self.gallery)
+
+    def clear_roster(self):
+        with self._snapshot_lock:
+            current = self._snapshot
+            self._snapshot = _Snapshot(current.global_gallery, current.global_index)
 
     def start_video_capture(self, device=0):
+        """
+        device: camera index, RTSP / HTTP stream URL or video file path
+        """
         cap = cv2.VideoCapture(device)
         if not cap.isOpened():
             raise RuntimeError("Cannot open camera")
         return cap
 
-    def recognize_faces(self, frame):
-        small = cv2.resize(frame, (0, 0), fx=0.5, fy=0.5)
-        rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+    def recognize_faces(self, frame, tracker=None, detection=None):
+        """
+        tracker: optional FaceTracker; faces it already identified are
+                 not re-encoded, their last match is reused (marked
+                 "fresh": False)
+        detection: DetectionPolicy of this camera (default: self.detection)
+        Returns: (boxes, results) in frame coordinates
+        """
+        detection = detection or self.detection
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
-        boxes = face_recognition.face_locations(rgb, model="hog")
-        encodings = face_recognition.face_encodings(rgb, boxes)
+        # detection may run downscaled; encoding uses the full-size frame
+        if tracker is None:
+            boxes = detection.detect(rgb)
+            return boxes, self._match(self._encode(rgb, boxes))
 
-        results = []
+        boxes = detection.detect(rgb, tracker.boxes())
+        tracks, todo = tracker.assign(boxes)
+        if todo:
+            encodings = self._encode(rgb, [boxes[i] for i in todo])
+            for i, result in zip(todo, self._match(encodings)):
+                tracker.update(tracks[i], result)
 
-        for encoding in encodings:
-            name = "Unknown"
-            student_id = None
+        encoded = set(todo)
+        return boxes, [tracker.result(track, i in encoded) for i, track in enumerate(tracks)]
+
+    def _encode(self, rgb, boxes):
+        if self.encoder is not None:
+            return self.encoder.encode(rgb, boxes)
+        return face_recognition.face_encodings(rgb, boxes)
+
+    def _match(self, encodings):
+        # read the snapshot once: a refresh may swap it mid-frame
+        snapshot = self._snapshot
+        results = self._match_gallery(snapshot.gallery, snapshot.index, encodings)
 
-            if self.known_encodings:
-                distances = face_recognition.face_distance(
-                    self.known_encodings, encoding
+        if snapshot.roster is not None and self.roster_fallback:
+            retry = [i for i, r in enumerate(results) if r["student_id"] is None]
+            if retry:
+                fallback = self._match_gallery(
+                    snapshot.global_gallery, snapshot.global_index,
+                    [encodings[i] for i in retry]
                 )
+                for i, r in zip(retry, fallback):
+                    results[i] = r
 
-                sorted_idx = np.argsort(distances)
-                best = distances[sorted_idx[0]]
+        return results
 
-                print(f"[DEBUG] Best distance = {best:.3f}")
+    def _match_gallery(self, gallery, index, encodings):
+        results = []
+
+        if not len(encodings):
+            return results
+
+        # one batched distance computation for every face in the frame
+        indices, distances = index.search(encodings, k=2)
+
+        if index.approximate and self.verify:
+            indices, distances = self._verify(gallery, encodings, indices, distances)
+
+        for i in range(len(encodings)):
+            name = "Unknown"
+            student_id = None
+            best = None
+
+            if len(gallery):
+                best = distances[i, 0]
 
                 # ✅ STRICT RULES
                 if best < self.tolerance:
-                    if len(sorted_idx) > 1:
-                        second = distances[sorted_idx[1]]
-                        if (second - best) >= 0.12:
-                            student_id, name, _ = self.known_students[sorted_idx[0]]
+                    if distances.shape[1] > 1:
+                        second = distances[i, 1]
+                        if (second - best) >= self.margin:
+                            student_id, name = gallery.students[indices[i, 0]]
                     else:
-                        student_id, name, _ = self.known_students[sorted_idx[0]]
+                        student_id, name = gallery.students[indices[i, 0]]
 
             results.append({
                 "student_id": student_id,
@@ -67,5 +321,17 @@ class FaceRecognizer:
                 "distance": float(best) if student_id else None
             })
 
-        boxes = [(t*2, r*2, b*2, l*2) for (t, r, b, l) in boxes]
-        return boxes, results
+        return results
+
+    def _verify(self, gallery, encodings, indices, distances):
+        """
+        Exact fallback for faces the approximate index would accept.
+        """
+        accepted = distances[:, 0] < self.tolerance
+        if not accepted.any():
+            return indices, distances
+
+        queries = np.asarray(encodings)[accepted]
+        indices, distances = indices.copy(), distances.copy()
+        indices[accepted], distances[accepted] = gallery.nearest(queries, k=indices.shape[1])
+        return indices, distances
@@ -0,0 +1,169 @@
+import numpy as np
+
+from app.database.encoding_codec import ENCODING_DIM
+
+
+class Gallery:
+    """
+    All enrolled encodings packed into one contiguous float32 matrix.
+    Squared row norms are precomputed so a whole frame of faces is
+    matched with a single matrix product.
+
+    A student may own several rows (templates: different poses and
+    lighting). Rows of one student are contiguous and a student's
+    distance is the minimum over its rows.
+    """
+
+    def __init__(self, students):
+        """
+        students: iterable of (id, name, encoding), ids may repeat
+        """
+        students = list(students)
+
+        if students:
+            matrix = np.vstack([enc for _, _, enc in students])
+        else:
+            matrix = np.empty((0, ENCODING_DIM))
+
+        self._set(
+            [(sid, name) for sid, name, _ in students], matrix
+        )
+
+    @classmethod
+    def from_matrix(cls, rows, matrix):
+        """
+        rows: [(id, name), ...] matching the rows of matrix
+        (as returned by Database.load_gallery, no per-row copies)
+        """
+        gallery = cls.__new__(cls)
+        gallery._set(list(rows), matrix)
+        return gallery
+
+    def _set(self, rows, matrix):
+        matrix = np.asarray(matrix)
+        if not len(matrix):
+            matrix = matrix.reshape(0, ENCODING_DIM)
+
+        # owner[row] = position of the row's student in self.students
+        positions = {}
+        self.students = []
+        for sid, name in rows:
+            if sid not in positions:
+                positions[sid] = len(self.students)
+                self.students.append((sid, name))
+        owner = np.array([positions[sid] for sid, _ in rows], dtype=np.intp)
+
+        # group each student's rows together (already the case for
+        # database and cache loads, which keeps memory-mapped rows uncopied)
+        if len(owner) and np.any(np.diff(owner) < 0):
+            order = np.argsort(owner, kind="stable")
+            owner, matrix = owner[order], matrix[order]
+
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.sq_norms = np.einsum("ij,ij->i", self.matrix, self.matrix)
+        self.owner = owner
+
+        counts = np.bincount(owner, minlength=len(self.students))
+        self.starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.intp)
+        self.max_templates = int(counts.max()) if len(counts) else 1
+        self.multi = self.max_templates > 1
+
+        if self.multi:
+            # every student's rows, padded with its first row: (students, max_templates)
+            offsets = np.minimum(np.arange(self.max_templates), counts[:, None] - 1)
+            self.template_rows = self.starts[:, None] + offsets
+
+    def __len__(self):
+        return len(self.students)
+
+    def subset(self, student_ids):
+        """
+        Sub-gallery holding only the given students (e.g. a course roster).
+        """
+        wanted = set(student_ids)
+        keep = np.array(
+            [sid in wanted for sid, _ in self.students], dtype=bool
+        )
+        rows = np.flatnonzero(keep[self.owner]) if len(self.owner) else np.empty(0, np.intp)
+
+        return Gallery.from_matrix(
+            [self.students[self.owner[r]] for r in rows], self.matrix[rows]
+        )
+
+    # =========================
+    # DISTANCES
+    # =========================
+    def distances(self, queries):
+        """
+        Euclidean distance from every query to every gallery row.
+        Returns: float32 array of shape (len(queries), number of rows)
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.matrix.shape[1])
+        q_sq = np.einsum("ij,ij->i", queries, queries)
+
+        sq = queries @ self.matrix.T
+        sq *= -2.0
+        sq += q_sq[:, None]
+        sq += self.sq_norms[None, :]
+        np.maximum(sq, 0.0, out=sq)
+        return np.sqrt(sq, out=sq)
+
+    def nearest(self, queries, k=2):
+        """
+        The k closest students for each query, closest first.
+        Candidates are picked with argpartition on the batched float32
+        distances, then re-measured exactly like face_distance does so
+        the tolerance / margin rules see the same numbers as before.
+        Returns: (student indices, distances), both (len(queries), k)
+        """
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, self.matrix.shape[1])
+        k = min(k, len(self))
+        if k == 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.intp), empty
+
+        dist = self.distances(queries)
+        if self.multi:
+            # per-student minimum over its templates
+            dist = np.minimum.reduceat(dist, self.starts, axis=1)
+
+        if k < dist.shape[1]:
+            idx = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        else:
+            idx = np.broadcast_to(np.arange(k), dist.shape).copy()
+
+        if self.multi:
+            rows = self.template_rows[idx].reshape(len(queries), -1)
+            return self.refine(queries, rows, k)
+        return self.refine(queries, idx, k)
+
+    def refine(self, queries, rows, k):
+        """
+        Re-measure candidate rows in float64 (as face_distance does),
+        keep the closest row per student and sort closest first.
+        rows: candidate row indices, shape (len(queries), n)
+        Returns: (student indices, distances), both (len(queries), k);
+                 missing students are padded with an infinite distance
+        """
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, self.matrix.shape[1])
+        exact = np.linalg.norm(
+            self.matrix[rows].astype(np.float64) - queries[:, None, :], axis=2
+        )
+        order = np.argsort(exact, axis=1)
+        rows = np.take_along_axis(rows, order, axis=1)
+        exact = np.take_along_axis(exact, order, axis=1)
+
+        if not self.multi:
+            return rows[:, :k], exact[:, :k]
+
+        owners = self.owner[rows]
+        out_idx = np.zeros((len(queries), k), dtype=np.intp)
+        out_dist = np.full((len(queries), k), np.inf)
+
+        for i in range(len(queries)):
+            _, first = np.unique(owners[i], return_index=True)
+            first = np.sort(first)[:k]
+            out_idx[i, :len(first)] = owners[i, first]
+            out_dist[i, :len(first)] = exact[i, first]
+
+        return out_idx, out_dist
@@ -0,0 +1,210 @@
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:     # Windows
+    fcntl = None
+    import msvcrt
+
+from app.database.encoding_codec import ENCODING_DIM
+
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache"
+)
+
+# 3: watermarks in UTC (database migration 4)
+CACHE_FORMAT = 3
+
+# rows committed slightly out of order must still be picked up
+SYNC_SLACK = timedelta(seconds=5)
+
+
+class GalleryCache:
+    """
+    Local copy of the enrolled gallery, so opening a session does not
+    pull every encoding from MySQL.
+
+        gallery-<n>.npy   float32 matrix, opened memory-mapped (zero copy)
+        gallery.json      ids, names and the updated_at watermark
+
+    sync() only fetches students whose updated_at moved, or who were
+    deleted (student_deletions), since the last sync. Each rewrite goes
+    to a new .npy file so readers that still map the previous one are
+    never disturbed. Several processes may share the folder: sync()
+    holds a lock file, and processes that only read call load().
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_templates=0):
+        """
+        max_templates: as in Database.load_gallery (0 = averaged encoding)
+        """
+        self.cache_dir = cache_dir
+        self.max_templates = max_templates
+        self.meta_path = os.path.join(cache_dir, "gallery.json")
+        self.lock_path = os.path.join(cache_dir, "gallery.lock")
+        self._loaded = None     # generation returned by the last load()
+
+    # =========================
+    # READ
+    # =========================
+    def load(self):
+        """
+        Returns: ([(id, name), ...], read-only memory-mapped matrix)
+                 or None when there is no cache yet
+        """
+        meta = self._read_meta()
+        if meta is None:
+            return None
+
+        self._loaded = meta["generation"]
+        path = os.path.join(self.cache_dir, meta["file"])
+        if meta["count"]:
+            matrix = np.load(path, mmap_mode="r")
+        else:
+            matrix = np.empty((0, ENCODING_DIM), dtype=np.float32)
+
+        return list(zip(meta["ids"], meta["names"])), matrix
+
+    def _read_meta(self):
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if meta.get("format") != CACHE_FORMAT:
+            return None
+        if meta.get("max_templates", 0) != self.max_templates:
+            return None
+        if meta["count"] and not os.path.exists(os.path.join(self.cache_dir, meta["file"])):
+            return None
+        return meta
+
+    # =========================
+    # SYNC
+    # =========================
+    def sync(self, db):
+        """
+        Bring the cache up to date with the students table.
+        Returns: True when the cache differs from what load() last
+                 returned (also when another process updated it)
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self._lock():
+            self._sync(db)
+            meta = self._read_meta()
+        return meta is None or meta["generation"] != self._loaded
+
+    def _sync(self, db):
+        count, latest = db.get_gallery_revision()
+        latest = latest.isoformat() if latest else None
+
+        # count as the database reports it: rows that fail to decode
+        # are not in the cache but must not look like a change forever
+        meta = self._read_meta()
+        if meta and meta["watermark"] == latest and meta["db_count"] == count:
+            return
+
+        if meta is None or meta["watermark"] is None:
+            self._full_sync(db, count)
+            return
+
+        since = datetime.fromisoformat(meta["watermark"]) - SYNC_SLACK
+        students, matrix, cleared, watermark = db.load_gallery_changes(
+            since, self.max_templates
+        )
+
+        cached = self.load()
+        keep = {sid for sid, _ in cached[0]} - set(cleared) - {sid for sid, _ in students}
+
+        # unchanged rows first, then every changed row (a student's
+        # template rows stay together)
+        kept = [i for i, (sid, _) in enumerate(cached[0]) if sid in keep]
+        merged = [cached[0][i] for i in kept] + list(students)
+
+        matrix = np.vstack([np.asarray(cached[1][kept]), matrix])
+        self._write(merged, matrix, watermark, count, meta)
+        print(f"[GalleryCache] Synced {len({sid for sid, _ in students} | set(cleared))} "
+              f"changed students")
+
+    def _full_sync(self, db, count):
+        students, matrix, _, watermark = db.load_gallery_changes(
+            max_templates=self.max_templates
+        )
+        self._write(students, matrix, watermark, count, self._read_meta())
+        print(f"[GalleryCache] Rebuilt cache with {len({sid for sid, _ in students})} students")
+
+    # =========================
+    # WRITE
+    # =========================
+    @contextmanager
+    def _lock(self):
+        """
+        One sync at a time across processes; released by the OS if the
+        process dies.
+        """
+        with open(self.lock_path, "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)   # retries for ~10 s
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _write(self, students, matrix, watermark, db_count, previous):
+        """
+        Called with the lock held.
+        """
+        generation = (previous or {}).get("generation", 0) + 1
+        # unique names: a crashed writer never leaves a file in the way
+        fd, path = tempfile.mkstemp(prefix=f"gallery-{generation}-", suffix=".npy",
+                                    dir=self.cache_dir)
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, np.ascontiguousarray(matrix, dtype=np.float32))
+        filename = os.path.basename(path)
+
+        if isinstance(watermark, datetime):
+            watermark = watermark.isoformat()
+
+        meta = {
+            "format": CACHE_FORMAT,
+            "generation": generation,
+            "file": filename,
+            "count": len({sid for sid, _ in students}),
+            "db_count": db_count,
+            "max_templates": self.max_templates,
+            "watermark": watermark,
+            "ids": [sid for sid, _ in students],
+            "names": [name for _, name in students],
+        }
+
+        fd, tmp = tempfile.mkstemp(prefix="gallery-", suffix=".json.tmp", dir=self.cache_dir)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self.meta_path)
+
+        self._remove_stale(filename)
+
+    def _remove_stale(self, current):
+        # with the lock held no other process is writing a new file
+        for name in os.listdir(self.cache_dir):
+            stale = name.endswith(".npy") or name.endswith(".json.tmp")
+            if name.startswith("gallery-") and stale and name != current:
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass  # still mapped by a reader (Windows), removed next time
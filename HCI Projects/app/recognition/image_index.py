@@ -0,0 +1,121 @@
+import os
+import sqlite3
+
+from app.database.encoding_codec import pack_encoding, unpack_encoding
+
+
+INDEX_FILE = ".image_index.sqlite"
+
+
+class ImageIndex:
+    """
+    Per-image training state kept next to the dataset:
+
+        images    one row per photo: size, mtime, content hash and its
+                  encoding (NULL when no face was found)
+        students  students whose aggregate encoding still has to be
+                  written to the database (dirty = 1)
+
+    train_dataset only re-encodes photos whose size/mtime and hash
+    changed, and only rewrites dirty students. A student stays dirty
+    until its database write succeeds, so an interrupted run resumes.
+    """
+
+    def __init__(self, dataset_path):
+        self.path = os.path.join(dataset_path, INDEX_FILE)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS images (
+            student_code TEXT NOT NULL,
+            image_name TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            sha1 TEXT NOT NULL,
+            encoding BLOB,
+            PRIMARY KEY (student_code, image_name)
+        )
+        """)
+
+        self.conn.execute("""
+        CREATE TABLE IF NOT EXISTS students (
+            student_code TEXT PRIMARY KEY,
+            dirty INTEGER NOT NULL DEFAULT 0
+        )
+        """)
+        self.conn.commit()
+
+    # =========================
+    # IMAGES
+    # =========================
+    def load(self):
+        """
+        Returns: {student_code: {image_name: (size, mtime_ns, sha1)}}
+        """
+        known = {}
+        for code, name, size, mtime, sha1 in self.conn.execute(
+            "SELECT student_code, image_name, size, mtime_ns, sha1 FROM images"
+        ):
+            known.setdefault(code, {})[name] = (size, mtime, sha1)
+        return known
+
+    def put(self, student_code, image_name, size, mtime_ns, sha1, encoding):
+        blob = pack_encoding(encoding) if encoding is not None else None
+        self.conn.execute("""
+            INSERT OR REPLACE INTO images
+            (student_code, image_name, size, mtime_ns, sha1, encoding)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (student_code, image_name, size, mtime_ns, sha1, blob))
+
+    def touch(self, student_code, image_name, size, mtime_ns):
+        """
+        Same content, new stat (file copied or re-saved unchanged).
+        """
+        self.conn.execute("""
+            UPDATE images SET size = ?, mtime_ns = ?
+            WHERE student_code = ? AND image_name = ?
+        """, (size, mtime_ns, student_code, image_name))
+
+    def delete(self, student_code, image_name):
+        self.conn.execute("""
+            DELETE FROM images WHERE student_code = ? AND image_name = ?
+        """, (student_code, image_name))
+
+    def encodings(self, student_code):
+        rows = self.conn.execute("""
+            SELECT encoding FROM images
+            WHERE student_code = ? AND encoding IS NOT NULL
+            ORDER BY image_name
+        """, (student_code,))
+        return [unpack_encoding(blob) for (blob,) in rows]
+
+    # =========================
+    # STUDENTS
+    # =========================
+    def mark_dirty(self, student_codes):
+        self.conn.executemany("""
+            INSERT INTO students (student_code, dirty) VALUES (?, 1)
+            ON CONFLICT (student_code) DO UPDATE SET dirty = 1
+        """, [(code,) for code in student_codes])
+        self.conn.commit()
+
+    def mark_written(self, student_codes):
+        self.conn.executemany("""
+            UPDATE students SET dirty = 0 WHERE student_code = ?
+        """, [(code,) for code in student_codes])
+        self.conn.commit()
+
+    def dirty_students(self):
+        return {code for (code,) in self.conn.execute(
+            "SELECT student_code FROM students WHERE dirty = 1"
+        )}
+
+    # =========================
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
@@ -0,0 +1,156 @@
+import numpy as np
+
+
+# =========================
+# EXACT (BRUTE FORCE)
+# =========================
+class ExactIndex:
+    """
+    Compares every query with every gallery row.
+    Always correct, cost grows linearly with enrollment.
+    """
+
+    approximate = False
+
+    def __init__(self, gallery):
+        self.gallery = gallery
+
+    def search(self, queries, k=2):
+        return self.gallery.nearest(queries, k)
+
+
+# =========================
+# IVF (K-MEANS PARTITIONED)
+# =========================
+class IVFIndex:
+    """
+    Inverted-file index: gallery rows are clustered with k-means and a
+    query is only compared with the rows of its n_probe nearest clusters.
+    """
+
+    approximate = True
+
+    def __init__(self, gallery, n_lists=None, n_probe=8,
+                 iterations=10, train_size=20000, seed=0):
+        self.gallery = gallery
+        self.n_probe = n_probe
+
+        rows = len(gallery.matrix)
+        if n_lists is None:
+            n_lists = int(np.sqrt(rows))
+        self.n_lists = max(1, min(n_lists, rows))
+
+        self.centroids = self._train(iterations, train_size, seed)
+        assign = self._nearest_centroid(gallery.matrix)
+
+        # rows grouped per list so each list is one contiguous slice
+        self.order = np.argsort(assign, kind="stable")
+        self.offsets = np.searchsorted(
+            assign[self.order], np.arange(self.n_lists + 1)
+        )
+        self.matrix = np.ascontiguousarray(gallery.matrix[self.order])
+        self.sq_norms = gallery.sq_norms[self.order]
+
+    def _train(self, iterations, train_size, seed):
+        rng = np.random.default_rng(seed)
+        data = self.gallery.matrix
+        if len(data) > train_size:
+            data = data[rng.choice(len(data), train_size, replace=False)]
+
+        centroids = data[rng.choice(len(data), self.n_lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            assign = self._nearest_centroid(data, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, data)
+            counts = np.bincount(assign, minlength=self.n_lists)
+
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+
+        return centroids
+
+    def _nearest_centroid(self, data, centroids=None, n=1, chunk=8192):
+        centroids = self.centroids if centroids is None else centroids
+        c_sq = np.einsum("ij,ij->i", centroids, centroids)
+        out = []
+
+        for start in range(0, len(data), chunk):
+            block = data[start:start + chunk]
+            d = c_sq[None, :] - 2.0 * (block @ centroids.T)
+            if n == 1:
+                out.append(np.argmin(d, axis=1))
+            else:
+                out.append(np.argpartition(d, n - 1, axis=1)[:, :n])
+
+        if not out:
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate(out)
+
+    def search(self, queries, k=2):
+        original = queries
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.matrix.shape[1])
+        k = min(k, len(self.gallery))
+
+        # enough rows to still find k different students with templates
+        k_rows = min(k * self.gallery.max_templates, len(self.matrix))
+        n_probe = min(self.n_probe, self.n_lists)
+        probes = self._nearest_centroid(queries, n=n_probe).reshape(len(queries), -1)
+
+        candidates = np.empty((len(queries), k_rows), dtype=np.intp)
+        found = np.zeros(len(queries), dtype=bool)
+
+        for i, (query, lists) in enumerate(zip(queries, probes)):
+            # contiguous slices: no copy of the probed rows
+            spans = [(self.offsets[l], self.offsets[l + 1]) for l in lists]
+            spans = [(a, b) for a, b in spans if b > a]
+            if sum(b - a for a, b in spans) < k_rows:
+                continue
+
+            rows = np.concatenate([np.arange(a, b) for a, b in spans])
+            sq = np.concatenate([
+                self.sq_norms[a:b] - 2.0 * (self.matrix[a:b] @ query)
+                for a, b in spans
+            ])
+            best = rows[np.argpartition(sq, k_rows - 1)[:k_rows]]
+            candidates[i] = self.order[best]
+            found[i] = True
+
+        original = np.asarray(original, dtype=np.float64).reshape(len(queries), -1)
+        indices = np.empty((len(queries), k), dtype=np.intp)
+        distances = np.empty((len(queries), k))
+
+        if found.any():
+            indices[found], distances[found] = self.gallery.refine(
+                original[found], candidates[found], k
+            )
+
+        # not enough rows in the probed lists: search those queries exactly
+        if not found.all():
+            missing = ~found
+            indices[missing], distances[missing] = self.gallery.nearest(original[missing], k)
+
+        return indices, distances
+
+
+# =========================
+# FACTORY
+# =========================
+INDEXES = {
+    "exact": ExactIndex,
+    "ivf": IVFIndex,
+}
+
+
+def make_index(kind, gallery, **options):
+    """
+    Build the search index named `kind` over `gallery`.
+    Galleries too small to partition always use exact search.
+    """
+    if kind not in INDEXES:
+        raise ValueError(f"Unknown index type: {kind}")
+
+    if kind != "exact" and len(gallery) < 2:
+        return ExactIndex(gallery)
+
+    return INDEXES[kind](gallery, **options)
@@ -0,0 +1,273 @@
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+
+
+# recognition threads (OpenCV and numpy release the GIL while they work)
+RECOGNITION_WORKERS = 2
+
+
+class FrameSlots:
+    """
+    Hand-off between pipeline stages holding the latest frame of each
+    camera. put() never blocks: a newer frame replaces the one its
+    camera still has waiting, so a slow consumer always gets fresh
+    frames instead of a growing backlog. get() returns the camera that
+    has waited longest, so a fast camera cannot starve a slow one.
+
+    exclusive=True: a camera handed out by get() is skipped until done()
+    is called for it, so several consumers never work on the same
+    camera at once and each camera's frames are taken in order.
+    """
+
+    def __init__(self, exclusive=False):
+        self.exclusive = exclusive
+        self._items = OrderedDict()
+        self._busy = set()
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def reset(self):
+        with self._cond:
+            self._items.clear()
+            self._busy.clear()
+
+    def put(self, key, item):
+        with self._cond:
+            if key in self._items:
+                del self._items[key]
+                self.dropped += 1
+            self._items[key] = item
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """
+        Returns: the longest waiting item, or None when nothing arrived in time
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._next() is not None, timeout):
+                return None
+            key = self._next()
+            if self.exclusive:
+                self._busy.add(key)
+            return self._items.pop(key)
+
+    def done(self, key):
+        """
+        exclusive: the consumer is finished with the camera's last item
+        """
+        with self._cond:
+            self._busy.discard(key)
+            self._cond.notify_all()
+
+    def _next(self):
+        # longest waiting camera no consumer is working on
+        return next((key for key in self._items if key not in self._busy), None)
+
+
+class CameraStream:
+    """
+    One capture source of a pipeline with its per-camera state.
+    source: device index, RTSP / HTTP URL or video file path
+    tracker / scheduler / detection: optional FaceTracker,
+        AdaptiveScheduler and DetectionPolicy of this camera (they
+        follow frame-to-frame state, so cameras must not share them)
+    """
+
+    def __init__(self, source, tracker=None, scheduler=None, detection=None, name=None):
+        self.source = source
+        self.name = name or str(source)
+        self.tracker = tracker
+        self.scheduler = scheduler
+        self.detection = detection
+
+        self.latest_seq = 0
+        self.latest = ([], [])
+
+    def reset(self):
+        self.latest_seq = 0
+        self.latest = ([], [])
+        for part in (self.tracker, self.scheduler, self.detection):
+            if part is not None:
+                part.reset()
+
+
+class RecognitionPipeline:
+    """
+    Live camera processing split into stages running on their own threads:
+
+        capture (one per camera) ──> recognition workers ──> on_results
+             │
+             └──> render (latest results drawn on every frame) ──> on_frame
+
+    Capture reads at camera speed and hands each frame to both stages.
+    All cameras share one pool of workers, which always take the
+    freshest frames, so recognition runs as often as the CPU allows and
+    the preview never waits for it. A camera is recognized by one worker
+    at a time: its tracker and detection state follow its frames in
+    order, while the other workers serve the other cameras.
+    """
+
+    def __init__(self, recognizer, streams, open_capture, on_frame, on_results,
+                 on_error=None, workers=RECOGNITION_WORKERS, frame_size=(640, 480)):
+        """
+        streams: CameraStream list
+        open_capture(source): returns an opened cv2.VideoCapture (called
+                      on the camera's capture thread)
+        on_frame(stream, frame, boxes, results): called for every
+                      captured frame, from the single render thread
+        on_results(stream, boxes, results): called once per recognized
+                      frame, never concurrently and never for a frame
+                      older than one already reported for that camera
+        on_error(message): a camera could not be opened
+        """
+        self.recognizer = recognizer
+        self.streams = list(streams)
+        self.open_capture = open_capture
+        self.on_frame = on_frame
+        self.on_results = on_results
+        self.on_error = on_error or print
+        self.workers = max(1, workers)
+        self.frame_size = frame_size
+
+        self._stop = threading.Event()
+        self._threads = []
+        self._recognize_slots = FrameSlots(exclusive=True)
+        self._render_slots = FrameSlots()
+
+        self._results_lock = threading.Lock()
+        self._live_lock = threading.Lock()
+        self._live = 0
+
+    # =========================
+    # CONTROL
+    # =========================
+    def start(self):
+        if self.active:
+            return
+
+        # a previous run must release the cameras before they are reopened
+        self.join(timeout=2.0)
+
+        self._stop.clear()
+        self._live = len(self.streams)
+        self._recognize_slots.reset()
+        self._render_slots.reset()
+        for stream in self.streams:
+            stream.reset()
+
+        self._threads = [
+            threading.Thread(target=self._capture_loop, args=(stream,), daemon=True)
+            for stream in self.streams
+        ]
+        self._threads.append(threading.Thread(target=self._render_loop, daemon=True))
+        self._threads += [
+            threading.Thread(target=self._recognize_loop, daemon=True)
+            for _ in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    @property
+    def running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    @property
+    def active(self):
+        # running and not asked to stop (threads may still be winding down)
+        return self.running and not self._stop.is_set()
+
+    def effective_rate(self):
+        """
+        Returns: recognition passes per second over all cameras
+        """
+        return sum(s.scheduler.effective_rate() for s in self.streams if s.scheduler)
+
+    # =========================
+    # STAGES
+    # =========================
+    def _capture_loop(self, stream):
+        try:
+            cap = self.open_capture(stream.source)
+        except Exception as e:
+            self.on_error(f"Camera {stream.name} error: {e}")
+            self._stream_done()
+            return
+
+        seq = 0
+        try:
+            while not self._stop.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+
+                frame = cv2.resize(frame, self.frame_size)
+                if stream.scheduler is not None:
+                    stream.scheduler.observe_frame(frame)
+                seq += 1
+                self._recognize_slots.put(stream, (stream, seq, frame))
+                self._render_slots.put(stream, (stream, frame))
+        finally:
+            cap.release()
+            self._stream_done()
+
+    def _stream_done(self):
+        # the pipeline ends when its last camera does
+        with self._live_lock:
+            self._live -= 1
+            if self._live <= 0:
+                self._stop.set()
+
+    def _recognize_loop(self):
+        while not self._stop.is_set():
+            item = self._recognize_slots.get(timeout=0.1)
+            if item is None:
+                continue
+
+            stream, seq, frame = item
+            try:
+                self._recognize(stream, seq, frame)
+            finally:
+                self._recognize_slots.done(stream)
+
+    def _recognize(self, stream, seq, frame):
+        if stream.scheduler is not None and not stream.scheduler.claim():
+            return
+
+        started = time.monotonic()
+        try:
+            boxes, results = self.recognizer.recognize_faces(
+                frame, stream.tracker, stream.detection
+            )
+        except Exception as e:
+            print(f"[WARNING] Recognition failed ({stream.name}): {e}")
+            return
+
+        if stream.scheduler is not None:
+            stream.scheduler.observe_results(results, time.monotonic() - started)
+
+        with self._results_lock:
+            if self._stop.is_set():
+                return
+            stream.latest_seq = seq
+            stream.latest = (boxes, results)
+            self.on_results(stream, boxes, results)
+
+    def _render_loop(self):
+        while not self._stop.is_set():
+            item = self._render_slots.get(timeout=0.1)
+            if item is None:
+                continue
+
+            stream, frame = item
+            boxes, results = stream.latest
+            self.on_frame(stream, frame, boxes, results)
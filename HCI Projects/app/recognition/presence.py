@@ -0,0 +1,51 @@
+import threading
+import time
+
+
+class PresenceState:
+    """
+    Who has been seen during one lecture, shared by every camera of the
+    session: sightings from any camera add up, and a student counts as
+    present once seen `required` times. Only faces encoded in the pass
+    count as sightings; a match a tracker carried over from an earlier
+    frame ("fresh": False) is no new evidence.
+    """
+
+    def __init__(self, required=6):
+        self.required = required
+        self.present = set()
+        self.sightings = {}     # student_id -> {"count", "last"}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        # cleared in place: schedulers keep a reference to `present`
+        with self._lock:
+            self.present.clear()
+            self.sightings.clear()
+
+    def observe(self, results, now=None):
+        """
+        Record one recognition pass of any camera.
+        Returns: [(student_id, name), ...] that just became present
+        """
+        now = time.time() if now is None else now
+        newly_present = []
+
+        with self._lock:
+            for r in results:
+                sid = r["student_id"]
+                if not sid or not r.get("fresh", True):
+                    continue
+
+                history = self.sightings.setdefault(sid, {"count": 0, "last": now})
+                history["count"] += 1
+                history["last"] = now
+
+                if history["count"] >= self.required and sid not in self.present:
+                    self.present.add(sid)
+                    newly_present.append((sid, r["name"]))
+
+        return newly_present
+
+    def __contains__(self, student_id):
+        return student_id in self.present
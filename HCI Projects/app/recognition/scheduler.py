@@ -0,0 +1,174 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+class CpuBudget:
+    """
+    Cores that recognition may use on average, shared by the schedulers
+    of every camera of a session so the total stays bounded however
+    many cameras there are.
+
+    Each scheduler asks for the cores its current rate needs. While
+    the sum fits, everyone gets what they asked for; beyond that every
+    camera is scaled down in proportion, so a busy camera (motion, new
+    faces) keeps a larger share than an idle one.
+    """
+
+    def __init__(self, cores=1.0):
+        self.cores = cores
+        self._demand = {}
+        self._lock = threading.Lock()
+
+    def share(self, key, demand):
+        """
+        demand: cores the caller would use at its own rate
+        Returns: cores the caller may use
+        """
+        with self._lock:
+            self._demand[key] = demand
+            total = sum(self._demand.values())
+            if total <= self.cores:
+                return demand
+            return self.cores * demand / total
+
+    def release(self, key):
+        with self._lock:
+            self._demand.pop(key, None)
+
+
+class AdaptiveScheduler:
+    """
+    Decides how often the pipeline runs recognition.
+
+        motion or a new face    -> max_rate (door rush at lecture start)
+        unrecognized faces      -> base_rate
+        static, everyone known  -> slowly back off to min_rate
+
+    The rate is also capped by this camera's share of a CpuBudget
+    (measured from the duration of recent passes).
+    Rates are recognition passes per second.
+    """
+
+    def __init__(self, min_rate=0.5, base_rate=5.0, max_rate=15.0, budget=None,
+                 motion_threshold=4.0, hold=2.0, settled=None):
+        """
+        budget: CpuBudget shared with the other cameras of the session
+                (default: one core for this camera alone)
+        motion_threshold: mean grey-level change (0-255) between frames
+                          that counts as motion
+        hold: seconds the maximum rate is kept after motion / a new face
+        settled: set of student ids that need no more sightings
+                 (PresenceState.present)
+        """
+        self.min_rate = min_rate
+        self.base_rate = base_rate
+        self.max_rate = max_rate
+        self.budget = budget if budget is not None else CpuBudget()
+        self.motion_threshold = motion_threshold
+        self.hold = hold
+        self.settled = settled if settled is not None else set()
+
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.rate = self.base_rate
+            self._next_due = 0.0
+            self._boost_until = 0.0
+            self._previous = None
+            self._pass_time = None
+            self._known_tracks = set()
+            self._passes = deque(maxlen=512)
+        self.budget.release(self)
+
+    # =========================
+    # INPUTS
+    # =========================
+    def observe_frame(self, frame, now=None):
+        """
+        Called for every captured frame: cheap frame-difference motion check.
+        """
+        now = time.monotonic() if now is None else now
+
+        thumb = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (80, 60))
+        thumb = thumb.astype(np.int16)
+
+        with self._lock:
+            previous, self._previous = self._previous, thumb
+            if previous is not None and np.abs(thumb - previous).mean() > self.motion_threshold:
+                self._boost(now)
+
+    def observe_results(self, results, duration, now=None):
+        """
+        Called after every recognition pass.
+        duration: seconds the pass took
+        """
+        now = time.monotonic() if now is None else now
+
+        with self._lock:
+            self._pass_time = duration if self._pass_time is None \
+                else 0.8 * self._pass_time + 0.2 * duration
+
+            self._passes.append(now)
+
+            tracks = {r["track_id"] for r in results if "track_id" in r}
+            if tracks - self._known_tracks:
+                self._boost(now)
+            self._known_tracks = tracks
+
+            if now < self._boost_until:
+                target = self.max_rate
+            elif any(r["student_id"] not in self.settled for r in results):
+                target = self.base_rate
+            else:
+                target = self.min_rate
+
+            # speed up at once, slow down gradually
+            if target >= self.rate:
+                self.rate = target
+            else:
+                self.rate = max(target, self.rate * 0.8)
+
+    def _boost(self, now):
+        self._boost_until = now + self.hold
+        self.rate = self.max_rate
+        self._next_due = min(self._next_due, now)
+
+    # =========================
+    # DECISION
+    # =========================
+    def claim(self, now=None):
+        """
+        Returns: True when a recognition pass should run now
+                 (the caller then owns the slot)
+        """
+        now = time.monotonic() if now is None else now
+
+        with self._lock:
+            if now < self._next_due:
+                return False
+            self._next_due = now + 1.0 / self._capped_rate()
+            return True
+
+    def _capped_rate(self):
+        if self._pass_time:
+            cores = self.budget.share(self, self.rate * self._pass_time)
+            return min(self.rate, cores / self._pass_time)
+        return self.rate
+
+    def effective_rate(self, now=None, window=5.0):
+        """
+        Returns: recognition passes per second actually completed
+                 over the last window seconds
+        """
+        now = time.monotonic() if now is None else now
+
+        with self._lock:
+            while self._passes and now - self._passes[0] > window:
+                self._passes.popleft()
+            return len(self._passes) / window
@@ -0,0 +1,37 @@
+import numpy as np
+
+
+# upper bound on stored templates per student (memory: 512 bytes each)
+MAX_TEMPLATES = 5
+
+
+def select_templates(encodings, k=MAX_TEMPLATES, iterations=10):
+    """
+    Pick up to k representative encodings of one student (k-medoids):
+    cluster the photos with k-means, then keep the real photo closest to
+    each cluster centre. Keeps pose / lighting variety that a single
+    mean encoding averages away.
+    """
+    data = np.asarray(encodings, dtype=np.float64)
+    if len(data) <= k:
+        return list(data)
+
+    # farthest-point start: spread the initial centres over the photos
+    chosen = [int(np.argmin(np.linalg.norm(data - data.mean(axis=0), axis=1)))]
+    nearest = np.linalg.norm(data - data[chosen[0]], axis=1)
+    while len(chosen) < k:
+        chosen.append(int(np.argmax(nearest)))
+        nearest = np.minimum(nearest, np.linalg.norm(data - data[chosen[-1]], axis=1))
+
+    centres = data[chosen]
+    for _ in range(iterations):
+        dist = np.linalg.norm(data[:, None, :] - centres[None, :, :], axis=2)
+        assign = np.argmin(dist, axis=1)
+        for c in range(k):
+            members = data[assign == c]
+            if len(members):
+                centres[c] = members.mean(axis=0)
+
+    dist = np.linalg.norm(data[:, None, :] - centres[None, :, :], axis=2)
+    medoids = sorted(set(int(i) for i in np.argmin(dist, axis=0)))
+    return [data[i] for i in medoids]
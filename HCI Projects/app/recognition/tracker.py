@@ -0,0 +1,137 @@
+import itertools
+import threading
+import time
+
+
+def box_iou(a, b):
+    """
+    Intersection over union of two (top, right, bottom, left) boxes.
+    """
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    inter = max(0, bottom - top) * max(0, right - left)
+    if not inter:
+        return 0.0
+
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return inter / float(area_a + area_b - inter)
+
+
+class Track:
+    """
+    One face followed across frames.
+    """
+
+    def __init__(self, track_id, box, now):
+        self.id = track_id
+        self.box = box
+        self.result = None
+        self.hits = 0           # consecutive encodings that agreed
+        self.last_seen = now
+        self.last_verified = None
+
+
+class FaceTracker:
+    """
+    Carries identities between recognition passes so a seated student is
+    not re-encoded on every frame.
+
+    Each detected box is matched to the previous boxes by overlap (IoU).
+    A face is encoded only while its track is new or unconfirmed (fewer
+    than confirm_hits agreeing matches) and then once every
+    reverify_every seconds. A face that disappears for longer than
+    max_age starts a new track.
+    """
+
+    def __init__(self, iou_threshold=0.3, confirm_hits=3, reverify_every=2.0, max_age=1.0):
+        self.iou_threshold = iou_threshold
+        self.confirm_hits = confirm_hits
+        self.reverify_every = reverify_every
+        self.max_age = max_age
+
+        self._tracks = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._tracks = []
+
+    def boxes(self):
+        """
+        Returns: the last box of every live track
+        """
+        with self._lock:
+            return [track.box for track in self._tracks]
+
+    # =========================
+    # ASSOCIATION
+    # =========================
+    def assign(self, boxes, now=None):
+        """
+        Match this frame's boxes to tracks (new tracks for unmatched boxes).
+        Returns: (tracks aligned with boxes, indices of boxes to encode)
+        """
+        now = time.monotonic() if now is None else now
+
+        with self._lock:
+            self._tracks = [t for t in self._tracks if now - t.last_seen <= self.max_age]
+
+            # greedy: best overlapping pairs first
+            pairs = sorted(
+                ((box_iou(box, t.box), i, t) for i, box in enumerate(boxes) for t in self._tracks),
+                key=lambda p: p[0], reverse=True
+            )
+            assigned = [None] * len(boxes)
+            used = set()
+            for overlap, i, track in pairs:
+                if overlap < self.iou_threshold:
+                    break
+                if assigned[i] is None and track.id not in used:
+                    assigned[i] = track
+                    used.add(track.id)
+
+            for i, box in enumerate(boxes):
+                if assigned[i] is None:
+                    assigned[i] = Track(next(self._ids), box, now)
+                    self._tracks.append(assigned[i])
+                assigned[i].box = box
+                assigned[i].last_seen = now
+
+            todo = [i for i, track in enumerate(assigned) if self._needs_encoding(track, now)]
+
+        return assigned, todo
+
+    def _needs_encoding(self, track, now):
+        if track.result is None or track.hits < self.confirm_hits:
+            return True
+        return now - track.last_verified >= self.reverify_every
+
+    # =========================
+    # IDENTITIES
+    # =========================
+    def update(self, track, result, now=None):
+        """
+        Record the match of a freshly encoded face.
+        """
+        now = time.monotonic() if now is None else now
+
+        with self._lock:
+            if track.result is not None and track.result["student_id"] == result["student_id"]:
+                track.hits += 1
+            else:
+                track.hits = 1
+            track.result = result
+            track.last_verified = now
+
+    def result(self, track, fresh=False):
+        """
+        fresh: the face was encoded in this pass (update() just ran),
+               not carried over from an earlier one
+        Returns: the track's current match, tagged with its track id
+        """
+        result = dict(track.result)
+        result["track_id"] = track.id
+        result["fresh"] = fresh
+        return result
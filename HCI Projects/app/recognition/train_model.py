@@ -1,19 +1,44 @@
+import argparse
+import hashlib
 import os
+from multiprocessing import Pool
+
 import cv2
 import numpy as np
-import pickle
 import face_recognition
+from app import config
 from app.database.db import Database
+from app.recognition.detectors import DETECTORS, make_detector
+from app.recognition.image_index import ImageIndex
+from app.recognition.templates import MAX_TEMPLATES, select_templates
+
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
 
+# face detector of this process (one per worker)
+_detector = None
 
-def train_dataset(dataset_path=None):
+
+def train_dataset(dataset_path=None, workers=1, batch_size=50, full=False,
+                  max_templates=MAX_TEMPLATES, detector=None):
     """
     Offline training script.
     Reads images and stores face encodings directly in the database.
     Folder name must be the student_code.
     Uses multiple encodings per student and averages them for better accuracy.
+
+    Per-image encodings are cached in the dataset's ImageIndex: a re-run
+    only encodes new or changed photos and only rewrites the students
+    they belong to. An interrupted run resumes where it stopped.
+
+    workers: number of processes encoding images in parallel
+    batch_size: finished students written to the database per transaction
+    full: ignore the cache and re-encode every image
+    max_templates: representative encodings kept per student besides
+                   the average (0 stores only the average)
+    detector: detector backend (default: config.DETECTOR_BACKEND)
     """
-    
+
     # Auto-detect dataset path if not provided
     if dataset_path is None:
         # Get the directory where this script is located
@@ -21,7 +46,7 @@ def train_dataset(dataset_path=None):
         # Go up to app directory, then to dataset
         app_dir = os.path.dirname(script_dir)
         dataset_path = os.path.join(app_dir, "dataset")
-    
+
     # Convert to absolute path
     dataset_path = os.path.abspath(dataset_path)
 
@@ -34,93 +59,252 @@ def train_dataset(dataset_path=None):
         db.close()
         return
 
-    student_dirs = [d for d in os.listdir(dataset_path) 
+    student_dirs = [d for d in os.listdir(dataset_path)
                    if os.path.isdir(os.path.join(dataset_path, d))]
 
     if not student_dirs:
+        # still planned: students trained earlier may have to be cleared
         print(f"[WARNING] No student directories found in {dataset_path}")
-        db.close()
-        return
 
     print(f"[INFO] Found {len(student_dirs)} students in dataset")
     print(f"[INFO] Processing dataset at: {os.path.abspath(dataset_path)}\n")
 
-    for student_code in student_dirs:
-        student_dir = os.path.join(dataset_path, student_code)
+    index = ImageIndex(dataset_path)
+    to_encode, dirty = _plan(dataset_path, student_dirs, index, full)
+
+    if not dirty:
+        print("[INFO] No new or changed images, nothing to retrain")
+        index.close()
+        db.close()
+        print("[DONE] Training completed successfully.")
+        return
 
-        print(f"[INFO] Processing student: {student_code}")
+    print(f"[INFO] {sum(len(p) for p in to_encode.values())} images to encode, "
+          f"{len(dirty)} students to update\n")
 
-        encodings = []
-        processed_images = 0
+    tasks = ((code, path) for code, paths in to_encode.items() for path in paths)
+    remaining = {code: len(paths) for code, paths in to_encode.items()}
+    finished = []
+    emptied = []
 
-        image_files = [f for f in os.listdir(student_dir) 
-                      if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
+    def finish(student_code):
+        encodings = index.encodings(student_code)
+        if encodings:
+            finished.append((
+                student_code,
+                _aggregate(student_code, encodings),
+                select_templates(encodings, max_templates) if max_templates else []
+            ))
+        else:
+            # no usable photo left (folder removed or emptied): a stale
+            # encoding must not keep the student recognizable
+            print(f"[ERROR] No valid face encodings found for {student_code}, "
+                  "clearing its stored encoding")
+            emptied.append(student_code)
+
+        if len(finished) + len(emptied) >= batch_size:
+            _flush(db, index, finished, emptied)
+
+    # students that only lost photos, or were left dirty by an interrupted run
+    for student_code in dirty - set(to_encode):
+        finish(student_code)
+
+    detector = detector or config.DETECTOR_BACKEND
+    pool = Pool(workers, initializer=_init_worker, initargs=(detector,)) if workers > 1 else None
+    try:
+        if pool is not None:
+            results = pool.imap_unordered(_encode_image, tasks, chunksize=4)
+        else:
+            _load_detector(detector)
+            results = map(_encode_image, tasks)
+
+        for student_code, img_name, encoding, message, stat in results:
+            print(message)
+            if stat is not None:
+                index.put(student_code, img_name, *stat, encoding)
+
+            remaining[student_code] -= 1
+            if not remaining[student_code]:
+                index.commit()
+                finish(student_code)
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    _flush(db, index, finished, emptied)
+
+    index.close()
+    db.close()
+    print("[DONE] Training completed successfully.")
+
+
+def _plan(dataset_path, student_dirs, index, full):
+    """
+    Compare the dataset folder with the image index.
+    Returns: ({student_code: [image paths to encode]}, dirty student codes)
+    """
+    known = index.load()
+    to_encode = {}
+    dirty = index.dirty_students()
+
+    for student_code in set(known) - set(student_dirs):
+        print(f"[INFO] Student folder removed: {student_code}")
+        for img_name in known[student_code]:
+            index.delete(student_code, img_name)
+        dirty.add(student_code)
+
+    for student_code in student_dirs:
+        student_dir = os.path.join(dataset_path, student_code)
+        image_files = [f for f in os.listdir(student_dir)
+                      if f.lower().endswith(IMAGE_EXTENSIONS)]
+        cached = known.get(student_code, {})
 
         if not image_files:
             print(f"[WARNING] No image files found for {student_code}")
-            continue
+
+        for img_name in set(cached) - set(image_files):
+            index.delete(student_code, img_name)
+            dirty.add(student_code)
 
         for img_name in image_files:
             img_path = os.path.join(student_dir, img_name)
+            st = os.stat(img_path)
+            entry = cached.get(img_name)
 
-            image = cv2.imread(img_path)
-            if image is None:
-                print(f"[SKIP] Could not read image: {img_name}")
-                continue
+            if not full and entry is not None:
+                size, mtime_ns, sha1 = entry
+                if (size, mtime_ns) == (st.st_size, st.st_mtime_ns):
+                    continue
+                if _file_sha1(img_path) == sha1:
+                    index.touch(student_code, img_name, st.st_size, st.st_mtime_ns)
+                    continue
 
-            rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            boxes = face_recognition.face_locations(rgb, model="hog")
-            
-            if not boxes:
-                print(f"[SKIP] No face detected in: {img_name}")
-                continue
+            to_encode.setdefault(student_code, []).append(img_path)
+            dirty.add(student_code)
 
-            faces = face_recognition.face_encodings(rgb, boxes)
+    # marked before any encoding starts, so a crash cannot lose the update
+    index.mark_dirty(dirty)
+    return to_encode, dirty
 
-            if faces:
-                # Use the first face found in the image
-                encodings.append(faces[0])
-                processed_images += 1
-                print(f"[OK] Encoded: {img_name} (face detected)")
 
-        if encodings:
-            # Average all encodings for better accuracy
-            if len(encodings) > 1:
-                avg_encoding = np.mean(encodings, axis=0)
-                print(f"[INFO] Averaged {len(encodings)} encodings for {student_code}")
-            else:
-                avg_encoding = encodings[0]
-
-            # Check if student already exists
-            db.cursor.execute("SELECT id FROM students WHERE student_code = %s", (student_code,))
-            existing = db.cursor.fetchone()
-
-            if existing:
-                # Update existing student
-                blob = pickle.dumps(avg_encoding)
-                db.cursor.execute("""
-                    UPDATE students 
-                    SET face_encoding = %s 
-                    WHERE student_code = %s
-                """, (blob, student_code))
-                db.conn.commit()
-                print(f"[UPDATED] Student {student_code} encoding updated in database")
-            else:
-                # Add new student
-                db.add_student(
-                    student_code=student_code,
-                    name=student_code,
-                    face_encoding=avg_encoding
-                )
-                print(f"[SAVED] Student {student_code} added to database")
-        else:
-            print(f"[ERROR] No valid face encodings found for {student_code}")
+# =========================
+# IMAGE ENCODING (runs in worker processes)
+# =========================
+def _init_worker(detector):
+    # one process per core already: keep OpenCV from spawning more threads
+    cv2.setNumThreads(1)
+    _load_detector(detector)
 
-        print()  # Empty line for readability
 
-    db.close()
-    print("[DONE] Training completed successfully.")
+def _load_detector(detector):
+    global _detector
+    _detector = make_detector(detector)
+
+
+def _encode_image(task):
+    """
+    Returns: (student_code, image name, encoding or None, log message,
+              (size, mtime_ns, sha1) or None when the file is unreadable)
+    """
+    student_code, img_path = task
+    img_name = os.path.basename(img_path)
+
+    try:
+        st = os.stat(img_path)
+        with open(img_path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return student_code, img_name, None, f"[SKIP] Could not read image: {img_name}", None
+
+    stat = (st.st_size, st.st_mtime_ns, hashlib.sha1(data).hexdigest())
+
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return student_code, img_name, None, f"[SKIP] Could not read image: {img_name}", stat
+
+    rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    boxes = _detector.detect(rgb)
+
+    if not boxes:
+        return student_code, img_name, None, f"[SKIP] No face detected in: {img_name}", stat
+
+    faces = face_recognition.face_encodings(rgb, boxes)
+
+    if not faces:
+        return student_code, img_name, None, f"[SKIP] Could not encode face in: {img_name}", stat
+
+    # Use the first face found in the image
+    return (student_code, img_name, faces[0],
+            f"[OK] Encoded: {student_code}/{img_name} (face detected)", stat)
+
+
+def _file_sha1(path):
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def _aggregate(student_code, encodings):
+    # Average all encodings for better accuracy
+    if len(encodings) > 1:
+        print(f"[INFO] Averaged {len(encodings)} encodings for {student_code}")
+        return np.mean(encodings, axis=0)
+    return encodings[0]
+
+
+# =========================
+# DATABASE WRITES
+# =========================
+def _flush(db, index, finished, emptied):
+    """
+    Write finished students and clear the encodings of emptied ones,
+    then clear their dirty flag.
+    """
+    if finished:
+        _write_batch(db, finished)
+        index.mark_written([code for code, _, _ in finished])
+        finished.clear()
+    if emptied:
+        db.clear_encodings(emptied)
+        index.mark_written(emptied)
+        print(f"[SAVED] {len(emptied)} students without photos cleared\n")
+        emptied.clear()
+
+
+def _write_batch(db, students):
+    """
+    Store a batch of (student_code, encoding, templates) in one transaction.
+    """
+    ids = db.bulk_upsert_students(
+        [(code, code, enc) for code, enc, _ in students],
+        templates={code: tpl for code, _, tpl in students},
+        batch_size=len(students)
+    )
+    print(f"[SAVED] {len(ids)} students written to database\n")
 
 
 if __name__ == "__main__":
-    train_dataset()
+    parser = argparse.ArgumentParser(description="Train face encodings from the dataset folder")
+    parser.add_argument("dataset_path", nargs="?", default=None)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="parallel encoding processes (default: all cores)")
+    parser.add_argument("--batch-size", type=int, default=50,
+                        help="students written per database transaction")
+    parser.add_argument("--full", action="store_true",
+                        help="re-encode every image, ignoring the image cache")
+    parser.add_argument("--templates", type=int, default=MAX_TEMPLATES,
+                        help="templates stored per student (0: average only)")
+    parser.add_argument("--detector", choices=sorted(DETECTORS), default=None,
+                        help=f"face detector backend (default: {config.DETECTOR_BACKEND})")
+    args = parser.parse_args()
+
+    train_dataset(
+        args.dataset_path,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        full=args.full,
+        max_templates=min(args.templates, MAX_TEMPLATES),
+        detector=args.detector
+    )
@@ -0,0 +1,240 @@
+"""
+Mark attendance from a recorded lecture video, without the UI.
+
+Usage:
+    python -m app.recognition.video_attendance lecture.mp4 --lecture-id 12
+    python -m app.recognition.video_attendance lecture.mp4 --lecture-id 12 \\
+        --workers 8 --sample-fps 2 --start "2024-03-04 09:00:00"
+
+The video is split into chunks that worker processes decode in
+parallel, each seeking to its chunk and skipping the frames between
+samples. Attendance times are the video start time plus the offset of
+each student's first sighting.
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+from multiprocessing import Pool
+
+import cv2
+
+from app.database.db import Database
+from app.recognition.detection import DetectionPolicy
+from app.recognition.face_recognizer import FaceRecognizer
+from app.recognition.gallery_cache import GalleryCache
+from app.recognition.templates import MAX_TEMPLATES
+
+
+# farther apart than this, jump to the next sample instead of grabbing
+SEEK_AFTER = 50
+
+# recognizer of this process (one per worker)
+_recognizer = None
+
+
+def process_video(video_path, lecture_id, workers=1, sample_fps=2.0, start=None,
+                  required=3, scales=(0.5,), chunks_per_worker=4):
+    """
+    video_path: recorded lecture
+    sample_fps: frames recognized per second of video
+    start: wall-clock time of the first frame (default: the lecture's
+           session_date + start_time)
+    required: sightings needed before a student is marked present
+    Returns: {student_id: attendance_time} of the students marked
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"[ERROR] Cannot open video: {video_path}")
+        return {}
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    if total <= 0:
+        print(f"[ERROR] Cannot read the frame count of: {video_path}")
+        return {}
+
+    db = Database()
+    if start is None:
+        start = _lecture_start(db, lecture_id)
+        if start is None:
+            print(f"[ERROR] Lecture {lecture_id} not found")
+            db.close()
+            return {}
+
+    # bring the shared gallery file up to date once; workers only map it
+    try:
+        GalleryCache(max_templates=MAX_TEMPLATES).sync(db)
+    except Exception as e:
+        print(f"[WARNING] Gallery cache unavailable: {e}")
+
+    step = max(1, int(round(fps / sample_fps)))
+    n_chunks = max(1, workers * chunks_per_worker)
+    size = -(-total // n_chunks)
+    size += -size % step  # chunk borders on sampled frames
+    chunks = [(video_path, first, min(first + size, total), step, fps)
+              for first in range(0, total, size)]
+
+    print(f"[INFO] {total} frames at {fps:.1f} fps, recognizing every {step}th frame "
+          f"in {len(chunks)} chunks on {workers} workers")
+
+    started = time.perf_counter()
+    sightings = []
+    frames = sampled = faces = 0
+
+    initargs = (lecture_id, tuple(scales))
+    pool = Pool(workers, initializer=_init_worker, initargs=initargs) if workers > 1 else None
+    try:
+        if pool is not None:
+            results = pool.imap_unordered(_process_chunk, chunks)
+        else:
+            _load_recognizer(*initargs)
+            results = map(_process_chunk, chunks)
+
+        for chunk_sightings, chunk_frames, chunk_sampled, chunk_faces in results:
+            sightings += chunk_sightings
+            frames += chunk_frames
+            sampled += chunk_sampled
+            faces += chunk_faces
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    elapsed = time.perf_counter() - started
+
+    marked = _mark_present(db, lecture_id, sightings, start, required)
+    db.close()
+
+    print("=" * 60)
+    print(f"Video: {os.path.basename(video_path)}   lecture: {lecture_id}")
+    print(f"Frames processed:  {frames:>8}   {frames / elapsed:>8.1f} frames/s")
+    print(f"Frames recognized: {sampled:>8}   {sampled / elapsed:>8.1f} frames/s")
+    print(f"Faces:             {faces:>8}   {faces / elapsed:>8.1f} faces/s")
+    print(f"Students marked:   {len(marked):>8}   in {elapsed:.1f}s "
+          f"({total / fps / elapsed:.1f}x real time)")
+    print("=" * 60)
+    return marked
+
+
+def _lecture_start(db, lecture_id):
+    lecture = db.get_lecture(lecture_id)
+    if lecture is None:
+        return None
+    # MySQL returns TIME columns as timedelta
+    return datetime.combine(lecture["session_date"], datetime.min.time()) \
+        + lecture["start_time"]
+
+
+def _mark_present(db, lecture_id, sightings, start, required):
+    """
+    sightings: [(seconds into the video, student_id, name), ...]
+    A student seen at least `required` times is marked present at the
+    time of the first sighting.
+    """
+    seen = {}
+    for offset, sid, name in sorted(sightings):
+        seen.setdefault(sid, [offset, name, 0])[2] += 1
+
+    marked = {}
+    for sid, (offset, name, count) in seen.items():
+        if count < required:
+            continue
+        when = start + timedelta(seconds=offset)
+        marked[sid] = when
+        print(f"[OK] {name} present at {when:%H:%M:%S}")
+
+    db.mark_attendance_many(
+        (lecture_id, sid, when, "Present") for sid, when in marked.items()
+    )
+    return marked
+
+
+# =========================
+# CHUNK PROCESSING (runs in worker processes)
+# =========================
+def _init_worker(lecture_id, scales):
+    # one process per core already: keep OpenCV from spawning more threads
+    cv2.setNumThreads(1)
+    _load_recognizer(lecture_id, scales)
+
+
+def _load_recognizer(lecture_id, scales):
+    global _recognizer
+    # gallery and roster are loaded here, matching needs no connection
+    db = Database()
+    try:
+        # the parent synced the cache: workers only read it
+        _recognizer = FaceRecognizer(
+            db, tolerance=0.50,
+            cache=GalleryCache(max_templates=MAX_TEMPLATES), sync_cache=False,
+            max_templates=MAX_TEMPLATES,
+            detection=DetectionPolicy(scales=scales)
+        )
+        _recognizer.use_lecture(lecture_id)
+    finally:
+        db.close()
+
+
+def _process_chunk(chunk):
+    """
+    Returns: (sightings, frames covered, frames recognized, faces found)
+    """
+    video_path, first, end, step, fps = chunk
+    cap = cv2.VideoCapture(video_path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+
+    sightings = []
+    position = first
+    sampled = faces = 0
+    try:
+        for index in range(first, end, step):
+            if index - position > SEEK_AFTER:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+                position = index
+
+            # grab() skips a frame without converting it
+            while position < index and cap.grab():
+                position += 1
+
+            ret, frame = cap.read() if position == index else (False, None)
+            if not ret:
+                break
+            position += 1
+            sampled += 1
+
+            _, results = _recognizer.recognize_faces(frame)
+            faces += len(results)
+            sightings += [(index / fps, r["student_id"], r["name"])
+                          for r in results if r["student_id"]]
+    finally:
+        cap.release()
+
+    return sightings, position - first, sampled, faces
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mark attendance from a lecture video")
+    parser.add_argument("video")
+    parser.add_argument("--lecture-id", type=int, required=True)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="parallel decoding / recognition processes (default: all cores)")
+    parser.add_argument("--sample-fps", type=float, default=2.0,
+                        help="frames recognized per second of video")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=None,
+                        help='time of the first frame, "YYYY-MM-DD HH:MM:SS" '
+                             "(default: lecture date and start time)")
+    parser.add_argument("--required", type=int, default=3,
+                        help="sightings before a student is marked present")
+    parser.add_argument("--scales", type=float, nargs="+", default=[0.5],
+                        help="detection passes as frame scale factors, e.g. 0.5 1.0")
+    args = parser.parse_args()
+
+    process_video(
+        args.video, args.lecture_id,
+        workers=args.workers,
+        sample_fps=args.sample_fps,
+        start=args.start,
+        required=args.required,
+        scales=args.scales
+    )
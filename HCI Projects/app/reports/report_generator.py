@@ -17,7 +17,6 @@ class ReportGenerator:
     def _get_lecture_details(self, lecture_id):
         """Fetch course_name and instructor name for the lecture"""
         try:
-            cursor = self.db.conn.cursor()
             # Common column patterns – adjust based on your lectures table
             # Usually: course_name, instructor_id → join with instructors table
             # Or direct instructor name if stored in lectures
@@ -27,9 +26,9 @@ class ReportGenerator:
                 LEFT JOIN instructors i ON l.instructor_id = i.id
                 WHERE l.id = %s
             """
-            cursor.execute(query, (lecture_id,))
-            result = cursor.fetchone()
-            cursor.close()
+            with self.db.transaction() as cursor:
+                cursor.execute(query, (lecture_id,))
+                result = cursor.fetchone()
             if result:
                 return result[0] or "N/A", result[1] or "N/A"
             else:
@@ -38,10 +37,9 @@ class ReportGenerator:
             print(f"Error fetching lecture details: {e}")
             # Fallback simple query if join fails
             try:
-                cursor = self.db.conn.cursor()
-                cursor.execute("SELECT course_name FROM lectures WHERE id = %s", (lecture_id,))
-                course = cursor.fetchone()
-                cursor.close()
+                with self.db.transaction() as cursor:
+                    cursor.execute("SELECT course_name FROM lectures WHERE id = %s", (lecture_id,))
+                    course = cursor.fetchone()
                 return course[0] if course else "N/A", "N/A"
             except:
                 return "N/A", "N/A"
@@ -52,37 +50,34 @@ class ReportGenerator:
     def _get_all_students(self):
         """Fetch all students from the database (code, name)"""
         try:
-            cursor = self.db.conn.cursor()
+            with self.db.transaction() as cursor:
             
-            possible_queries = [
-                "SELECT student_id, name FROM students ORDER BY student_id",
-                "SELECT student_code, name FROM students ORDER BY student_code",
-                "SELECT code, name FROM students ORDER BY code",
-                "SELECT id, name FROM students ORDER BY id",
-            ]
+                possible_queries = [
+                    "SELECT student_id, name FROM students ORDER BY student_id",
+                    "SELECT student_code, name FROM students ORDER BY student_code",
+                    "SELECT code, name FROM students ORDER BY code",
+                    "SELECT id, name FROM students ORDER BY id",
+                ]
             
-            for query in possible_queries:
-                try:
-                    cursor.execute(query)
-                    students = cursor.fetchall()
-                    if students:
-                        return [(str(code), str(name or "")) for code, name in students]
-                except:
-                    continue
+                for query in possible_queries:
+                    try:
+                        cursor.execute(query)
+                        students = cursor.fetchall()
+                        if students:
+                            return [(str(code), str(name or "")) for code, name in students]
+                    except:
+                        continue
             
-            print("None of the common column names worked. Table structure:")
-            cursor.execute("DESCRIBE students")
-            columns = cursor.fetchall()
-            print("Columns in 'students' table:", [col[0] for col in columns])
+                print("None of the common column names worked. Table structure:")
+                cursor.execute("DESCRIBE students")
+                columns = cursor.fetchall()
+                print("Columns in 'students' table:", [col[0] for col in columns])
             
-            return []
+                return []
             
         except Exception as e:
             print(f"Error accessing students table: {e}")
             return []
-        finally:
-            if 'cursor' in locals():
-                cursor.close()
 
     # =========================
     # CSV REPORT
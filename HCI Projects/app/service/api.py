@@ -0,0 +1,178 @@
+import hmac
+import ipaddress
+import json
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import cv2
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    JSON API of an AttendanceService:
+
+        GET  /status                  session state, present students, rate
+        GET  /events?since=<seq>      log lines newer than seq
+        GET  /lectures                lectures to choose from
+        GET  /preview.jpg             latest annotated frame (204 before any,
+                                      304 when If-None-Match is still current)
+        POST /session/start           {"lecture_id": 12} (404 for an
+                                      unknown lecture)
+        POST /session/stop
+
+    With a token set, every request needs "Authorization: Bearer <token>"
+    (401 otherwise).
+    """
+    service = None
+    token = ""
+    _jpeg = (None, None)    # (ETag, bytes) of the last encoded preview
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if url.path == "/status":
+            self._json(self.service.status())
+        elif url.path == "/events":
+            try:
+                since = int(query.get("since", ["0"])[0])
+            except ValueError:
+                self._json({"error": "since must be an integer"}, 400)
+                return
+            self._json(self.service.events(since))
+        elif url.path == "/lectures":
+            self._json(self.service.lectures())
+        elif url.path == "/preview.jpg":
+            self._preview()
+        else:
+            self._json({"error": f"Unknown path: {url.path}"}, 404)
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        url = urlparse(self.path)
+
+        if url.path == "/session/start":
+            try:
+                lecture_id = int(self._body().get("lecture_id"))
+            except (TypeError, ValueError):
+                self._json({"error": "lecture_id is required"}, 400)
+                return
+            try:
+                self._json({"roster_size": self.service.start(lecture_id)})
+            except LookupError as e:
+                self._json({"error": str(e)}, 404)
+            except RuntimeError as e:
+                self._json({"error": str(e)}, 409)
+        elif url.path == "/session/stop":
+            self.service.stop()
+            self._json({"active": False})
+        else:
+            self._json({"error": f"Unknown path: {url.path}"}, 404)
+
+    # =========================
+    # HELPERS
+    # =========================
+    def _authorized(self):
+        if not self.token:
+            return True
+        sent = self.headers.get("Authorization") or ""
+        if hmac.compare_digest(sent.encode("utf-8"), f"Bearer {self.token}".encode("utf-8")):
+            return True
+        self._json({"error": "Missing or wrong service token"}, 401)
+        return False
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _json(self, payload, code=200):
+        body = json.dumps(payload, default=_to_json).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _preview(self):
+        # clients poll faster than frames arrive: unchanged frames are
+        # neither drawn nor encoded again, nor sent
+        etag = f'"{self.service.frame_version}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        cached_etag, body = self._jpeg
+        if cached_etag != etag:
+            rgb = self.service.preview()
+            if rgb is None:
+                self.send_response(204)
+                self.end_headers()
+                return
+
+            ok, jpeg = cv2.imencode(".jpg", cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR),
+                                    [cv2.IMWRITE_JPEG_QUALITY, 80])
+            body = jpeg.tobytes()
+            type(self)._jpeg = (etag, body)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # clients poll several times a second
+
+
+def _to_json(value):
+    # dates and MySQL TIME values of the lecture list
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return str(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False    # a host name: may resolve to a public address
+
+
+def check_bind(host, token):
+    """
+    Raises: ValueError when `host` is reachable from other machines and
+            no token is set
+    """
+    if not token and not is_loopback(host):
+        raise ValueError(
+            f"Refusing to serve {host} without a token: set SERVICE_TOKEN or "
+            "ATTENDANCE_SERVICE_TOKEN, anyone on the network could otherwise "
+            "control sessions and see the camera preview"
+        )
+
+
+def make_server(service, host, port, token=""):
+    """
+    token: shared secret clients must send (see _Handler); required
+           unless `host` is a loopback address
+    Returns: ThreadingHTTPServer serving `service` (call serve_forever)
+    """
+    check_bind(host, token)
+    handler = type("AttendanceHandler", (_Handler,), {"service": service, "token": token})
+    return ThreadingHTTPServer((host, port), handler)
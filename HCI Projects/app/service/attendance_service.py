@@ -0,0 +1,262 @@
+import threading
+from collections import deque
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from app import config
+from app.database.attendance_writer import AttendanceWriter
+from app.database.db import Database
+from app.recognition.detection import DetectionPolicy
+from app.recognition.encoder import BatchEncoder
+from app.recognition.face_recognizer import FaceRecognizer
+from app.recognition.gallery_cache import GalleryCache
+from app.recognition.pipeline import CameraStream, RecognitionPipeline
+from app.recognition.presence import PresenceState
+from app.recognition.scheduler import AdaptiveScheduler, CpuBudget
+from app.recognition.templates import MAX_TEMPLATES
+from app.recognition.tracker import FaceTracker
+
+
+class AttendanceService:
+    """
+    Live attendance without any UI: cameras, recognition and attendance
+    writes for one lecture at a time.
+
+    Runs inside the session window, or headless in daemon.py where the
+    window (or anything else) drives it over the HTTP API. Frames are
+    only converted for display when preview() is asked for.
+    """
+
+    def __init__(self, db=None, sources=None):
+        """
+        db: Database to use (default: a new pooled one, closed by close())
+        sources: camera sources (default: config.CAMERA_SOURCES)
+        """
+        self._own_db = db is None
+        # used by the API's request threads at the same time
+        self.db = db or Database(pool_size=config.DB_POOL_SIZE)
+
+        self.face_rec = FaceRecognizer(
+            self.db, tolerance=0.50,
+            cache=GalleryCache(max_templates=MAX_TEMPLATES),
+            max_templates=MAX_TEMPLATES,
+            # faces from concurrent recognition workers share one dlib call
+            encoder=BatchEncoder()
+        )
+
+        # attendance goes to the local spool first and is written to MySQL
+        # behind, on its own connection and thread
+        self.writer = AttendanceWriter(Database)
+        self.writer.start()     # replays marks left from an earlier outage
+
+        # sightings from every camera count towards the same lecture
+        self.presence = PresenceState(required=6)
+        # one CPU budget for all cameras together
+        budget = CpuBudget(config.RECOGNITION_CORES)
+
+        self.streams = [
+            CameraStream(
+                source,
+                tracker=FaceTracker(),
+                # faster on motion / new faces, slower once everyone is marked
+                scheduler=AdaptiveScheduler(budget=budget, settled=self.presence.present),
+                # only search where something moved, plus known faces
+                detection=DetectionPolicy(detector=self.face_rec.detection.detector, roi=True)
+            )
+            for source in (sources if sources is not None else config.CAMERA_SOURCES)
+        ]
+
+        # capture (per camera), recognition and preview run on their own
+        # threads; all cameras share the gallery and the recognition workers
+        self.pipeline = RecognitionPipeline(
+            self.face_rec, self.streams,
+            open_capture=self._open_camera,
+            on_frame=self._keep_frame,
+            on_results=self._handle_results,
+            on_error=self.log
+        )
+
+        self.lecture_id = None
+        self.roster_size = 0
+        self.present = []
+        self._frames = {}
+        # bumped for every new frame; preview() redraws only when it moved
+        self.frame_version = 0
+        self._preview = (0, None)
+
+        self._events = deque(maxlen=500)
+        self._event_seq = 0
+        self._events_lock = threading.Lock()
+
+    # =========================
+    # SESSION CONTROL
+    # =========================
+    @property
+    def active(self):
+        return self.pipeline.active
+
+    def start(self, lecture_id):
+        """
+        Returns: number of students faces are matched against
+        Raises: LookupError for an unknown lecture, RuntimeError while
+                another lecture is running
+        """
+        if self.active:
+            raise RuntimeError(f"Lecture {self.lecture_id} is already running")
+        # a wrong id would match every student and spool marks the
+        # database can never take
+        if self.db.get_lecture(lecture_id) is None:
+            raise LookupError(f"Lecture {lecture_id} does not exist")
+
+        self.roster_size = self.face_rec.use_lecture(lecture_id)
+
+        self.lecture_id = lecture_id
+        self.presence.reset()
+        self.present = []
+        self._frames.clear()
+        self.frame_version += 1     # drops the last session's preview
+        self.log(f"Matching against {self.roster_size} students")
+
+        # students trained mid-day show up without restarting the session
+        self.face_rec.start_auto_refresh(Database, interval=30.0)
+        self.pipeline.start()
+        return self.roster_size
+
+    def stop(self):
+        self.pipeline.stop()
+        self.face_rec.stop_auto_refresh()
+        # recognition in flight may still mark students
+        self.pipeline.join(timeout=2.0)
+        # marks are safe in the spool: don't hold the caller through an outage
+        if not self.writer.flush(timeout=5.0):
+            self.log(f"{self.writer.pending} attendance marks spooled until the database is back")
+
+    def close(self):
+        self.stop()
+        self.face_rec.encoder.stop()
+        self.writer.stop()
+        if self._own_db:
+            self.db.close()
+
+    # =========================
+    # STATUS
+    # =========================
+    def status(self):
+        return {
+            "active": self.active,
+            "lecture_id": self.lecture_id,
+            "known_students": len(self.face_rec.known_students),
+            "roster_size": self.roster_size,
+            "present": list(self.present),
+            "rate": round(self.pipeline.effective_rate(), 2),
+            "cameras": [stream.name for stream in self.streams],
+            "last_event": self._event_seq,
+        }
+
+    def lectures(self):
+        return self.db.list_lectures()
+
+    def log(self, text):
+        print(f"[Session] {text}")
+        with self._events_lock:
+            self._event_seq += 1
+            self._events.append({"seq": self._event_seq, "text": text})
+
+    def events(self, since=0):
+        """
+        Returns: log lines newer than `since` (a previous "seq")
+        """
+        with self._events_lock:
+            return [event for event in self._events if event["seq"] > since]
+
+    def preview(self):
+        """
+        Returns: RGB image of the latest frame(s) with face boxes and
+                 names, cameras side by side; None before the first frame.
+                 The same array is returned until a new frame arrives.
+        """
+        version = self.frame_version
+        drawn, image = self._preview
+        if drawn == version:
+            return image
+
+        tiles = []
+        for stream in self.streams:
+            latest = self._frames.get(stream)
+            if latest is not None:
+                label = stream.name if len(self.streams) > 1 else None
+                tiles.append(annotate(*latest, label=label))
+
+        if not tiles:
+            image = None
+        elif len(self.streams) == 1:
+            image = tiles[0]
+        else:
+            image = mosaic(tiles)
+
+        self._preview = (version, image)
+        return image
+
+    # =========================
+    # PIPELINE CALLBACKS
+    # =========================
+    def _open_camera(self, source):
+        cap = self.face_rec.start_video_capture(source)
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+        return cap
+
+    def _keep_frame(self, stream, frame, boxes, results):
+        # no conversion here: only preview() pays for drawing
+        self._frames[stream] = (frame, boxes, results)
+        self.frame_version += 1
+
+    def _handle_results(self, stream, boxes, results):
+        """
+        Called by the pipeline for each recognized frame of any camera
+        (one at a time).
+        """
+        for sid, name in self.presence.observe(results):
+            now = datetime.now()
+            self.writer.add(self.lecture_id, sid, attendance_time=now)
+            ts = now.strftime("%H:%M:%S")
+            self.present.append({"student_id": sid, "name": name, "time": ts})
+            self.log(f"✓ {name} marked present at {ts}")
+
+
+# =========================
+# PREVIEW DRAWING
+# =========================
+def annotate(frame, boxes, results, label=None):
+    """
+    Returns: RGB copy of a BGR frame with face boxes and names drawn
+    """
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    for (top, right, bottom, left), r in zip(boxes, results):
+        color = (0, 255, 0) if r["student_id"] else (255, 0, 0)
+        name = r["name"] if r["student_id"] else "Unknown"
+        cv2.rectangle(rgb, (left, top), (right, bottom), color, 2)
+        cv2.putText(
+            rgb, name, (left, top - 6),
+            cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2
+        )
+
+    if label:
+        cv2.putText(
+            rgb, label, (10, 25),
+            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2
+        )
+    return rgb
+
+
+def mosaic(tiles):
+    """
+    Equal-sized images in a two-column grid, scaled back to about one
+    image's size.
+    """
+    tiles = tiles + [np.zeros_like(tiles[0])] * (len(tiles) % 2)
+    grid = np.vstack([np.hstack(tiles[i:i + 2]) for i in range(0, len(tiles), 2)])
+    return cv2.resize(grid, (grid.shape[1] // 2, grid.shape[0] // 2))
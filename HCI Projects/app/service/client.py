@@ -0,0 +1,95 @@
+import json
+import urllib.error
+import urllib.request
+
+import cv2
+import numpy as np
+
+from app import config
+
+
+class ServiceClient:
+    """
+    Talks to a running daemon.py; same methods as AttendanceService, so
+    the session window can drive either.
+    Raises ConnectionError when the daemon cannot be reached and
+    RuntimeError when it refuses a request.
+    """
+
+    def __init__(self, url=None, timeout=2.0, token=None):
+        """
+        token: shared secret of the daemon (default: config.SERVICE_TOKEN)
+        """
+        self.url = (url or config.SERVICE_URL).rstrip("/")
+        self.timeout = timeout
+        self.token = config.SERVICE_TOKEN if token is None else token
+        self._preview = (None, None)    # (ETag, RGB image) last received
+
+    def start(self, lecture_id):
+        return self._request("POST", "/session/start", {"lecture_id": lecture_id})["roster_size"]
+
+    def stop(self):
+        self._request("POST", "/session/stop")
+
+    def close(self):
+        pass  # the daemon keeps running
+
+    def status(self):
+        return self._request("GET", "/status")
+
+    def events(self, since=0):
+        return self._request("GET", f"/events?since={since}")
+
+    def lectures(self):
+        return self._request("GET", "/lectures")
+
+    def preview(self):
+        """
+        Returns: RGB image, or None when the daemon has no frame yet.
+                 The same array is returned until a new frame arrives.
+        """
+        etag, image = self._preview
+        headers = {"If-None-Match": etag} if etag else {}
+
+        status, data, reply = self._send("GET", "/preview.jpg", headers=headers)
+        if status == 304:
+            return image
+        if status == 204 or not data:
+            image = None
+        else:
+            bgr = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            image = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+
+        self._preview = (reply.get("ETag"), image)
+        return image
+
+    def _request(self, method, path, payload=None):
+        status, body, headers = self._send(method, path, payload)
+        return json.loads(body)
+
+    def _send(self, method, path, payload=None, headers=None):
+        """
+        Returns: (HTTP status, body, response headers)
+        """
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = dict(headers or {})
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        request = urllib.request.Request(
+            self.url + path, data=data, method=method,
+            headers={"Content-Type": "application/json", **headers}
+        )
+
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.read(), response.headers
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return e.code, b"", e.headers
+            try:
+                message = json.loads(e.read())["error"]
+            except (ValueError, KeyError):
+                message = str(e)
+            raise RuntimeError(message)
+        except (urllib.error.URLError, OSError) as e:
+            raise ConnectionError(f"Attendance daemon not reachable at {self.url}: {e}")
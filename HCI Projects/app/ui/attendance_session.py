@@ -1,12 +1,11 @@
+import time
 import tkinter as tk
 from tkinter import ttk, messagebox
-import threading
-import time
-from datetime import datetime
-import cv2
 from PIL import Image, ImageTk
 
-from app.recognition.face_recognizer import FaceRecognizer
+from app import config
+from app.service.attendance_service import AttendanceService
+from app.service.client import ServiceClient
 
 
 # =========================
@@ -23,32 +22,46 @@ MUTED = "#94a3b8"
 FONT_TITLE = ("Segoe UI", 18, "bold")
 FONT_TEXT = ("Segoe UI", 11)
 
+# how often the window asks the service for log lines / status (ms), and
+# for a preview while minimized (to notice being restored)
+STATUS_INTERVAL = 500
+HIDDEN_INTERVAL = 500
+
 
 class AttendanceSession(tk.Toplevel):
+    """
+    Window over an attendance service: a running daemon.py when there is
+    one, otherwise an in-process AttendanceService. Either way the window
+    only sends start / stop and polls status, log lines and the preview.
+    """
 
     def __init__(self, master, db, lectures):
         super().__init__(master)
 
         self.db = db
         self.lectures = lectures
-        self.face_rec = FaceRecognizer(self.db, tolerance=0.50)
+        self.service = self._connect(db)
 
         self.active = False
-        self.recognized_students = set()
-        self.face_recognition_history = {}
+        self._last_event = 0
 
-        # ✅ NEW (delay fix)
-        self.frame_count = 0
-        self.recog_every = 5
-        self.last_boxes = []
-        self.last_results = []
+        # preview: one PhotoImage, pasted into while the frame size holds
+        self.preview_fps = config.PREVIEW_FPS
+        self._photo = None
+        self._shown = None
+        # at most one pending callback per loop, however often it is started
+        self._jobs = {}
 
         self.title("Attendance Session")
         self.geometry("1100x720")
         self.configure(bg=BG_COLOR)
         self.protocol("WM_DELETE_WINDOW", self.on_close)
 
-        if not self.face_rec.known_students:
+        try:
+            status = self.service.status()
+        except (ConnectionError, RuntimeError):
+            status = None   # the daemon went away since _connect
+        if status is not None and not status["known_students"]:
             messagebox.showwarning(
                 "No Students Found",
                 "No students found in database.\n\n"
@@ -57,6 +70,25 @@ class AttendanceSession(tk.Toplevel):
 
         self._setup_ui()
 
+        if status is None:
+            self.status_label.config(text="Status: Daemon unreachable", fg=DANGER)
+            self._safe_log(f"Attendance daemon at {self.service.url} is not answering")
+            return
+        if isinstance(self.service, ServiceClient):
+            self._safe_log(f"Connected to attendance daemon at {self.service.url}")
+        # the daemon may already be running a lecture
+        self._last_event = status["last_event"]
+        if status["active"]:
+            self._show_running(status)
+
+    def _connect(self, db):
+        try:
+            client = ServiceClient(timeout=1.0)
+            client.status()
+            return client
+        except (ConnectionError, RuntimeError):
+            return AttendanceService(db)
+
     # =========================
     # UI SETUP
     # =========================
@@ -146,110 +178,139 @@ class AttendanceSession(tk.Toplevel):
             messagebox.showerror("Error", "Please select a lecture first.")
             return
 
-        self.lecture_id = self.lecture_map[self.lecture_cb.get()]
-        self.active = True
-        self.recognized_students.clear()
-        self.face_recognition_history.clear()
+        lecture_id = self.lecture_map[self.lecture_cb.get()]
+        try:
+            self.service.start(lecture_id)
+        except (ConnectionError, LookupError, RuntimeError) as e:
+            messagebox.showerror("Error", str(e))
+            return
 
+        self._show_running(self.service.status())
+
+    def _show_running(self, status):
+        self.active = True
         self.start_btn.config(state="disabled")
         self.stop_btn.config(state="normal")
         self.status_label.config(text="Status: Running", fg=SUCCESS)
 
-        threading.Thread(target=self._camera_loop, daemon=True).start()
+        for label, lecture_id in self.lecture_map.items():
+            if lecture_id == status["lecture_id"]:
+                self.lecture_var.set(label)
+
+        self._schedule(STATUS_INTERVAL, self._poll_status)
+        if self.preview_fps > 0:
+            self._schedule(0, self._update_preview)
 
     def stop_session(self):
+        try:
+            self.service.stop()
+        except (ConnectionError, RuntimeError) as e:
+            messagebox.showerror("Error", str(e))
+            return
+
         self.active = False
+        self._poll_events()
         self.start_btn.config(state="normal")
         self.stop_btn.config(state="disabled")
         self.status_label.config(text="Status: Stopped", fg=DANGER)
 
     def on_close(self):
+        # a daemon keeps its session running without the window
         self.active = False
+        for job in self._jobs.values():
+            self.after_cancel(job)
+        self._jobs.clear()
+        self.service.close()
         self.after(100, self.destroy)
 
     # =========================
-    # CAMERA LOOP (OPTIMIZED)
+    # POLLING
     # =========================
-    def _camera_loop(self):
-        try:
-            cap = self.face_rec.start_video_capture()
-            cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        except Exception as e:
-            self._safe_log(f"Camera error: {e}")
+    def _poll_status(self):
+        if not self.active or not self.status_label.winfo_exists():
             return
 
         try:
-            while self.active:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-
-                frame = cv2.resize(frame, (640, 480))
-                self.frame_count += 1
-
-                # 🧠 HEAVY PART (every N frames)
-                if self.frame_count % self.recog_every == 0:
-                    boxes, results = self.face_rec.recognize_faces(frame)
-                    self.last_boxes = boxes
-                    self.last_results = results
-                    now = time.time()
-
-                    for r in results:
-                        sid = r["student_id"]
-                        name = r["name"]
-
-                        if sid:
-                            history = self.face_recognition_history.setdefault(
-                                sid, {"count": 0, "last": now}
-                            )
-                            history["count"] += 1
-                            history["last"] = now
-
-                            if history["count"] >= 6 and sid not in self.recognized_students:
-                                self.db.mark_attendance(self.lecture_id, sid)
-                                self.recognized_students.add(sid)
-                                ts = datetime.now().strftime("%H:%M:%S")
-                                self._safe_log(f"✓ {name} marked present at {ts}")
-
-                # 🖼️ FAST DISPLAY
-                self._update_preview(frame, self.last_boxes, self.last_results)
-                time.sleep(0.01)
-
-        finally:
-            cap.release()
+            status = self.service.status()
+            self._poll_events()
+        except (ConnectionError, RuntimeError):
+            self.status_label.config(text="Status: Daemon unreachable", fg=DANGER)
+            self._schedule(STATUS_INTERVAL, self._poll_status)
+            return
+
+        if not status["active"]:
+            # stopped elsewhere, or every camera ended
+            self.active = False
+            self.start_btn.config(state="normal")
+            self.stop_btn.config(state="disabled")
+            self.status_label.config(text="Status: Stopped", fg=DANGER)
+            return
+
+        self.status_label.config(
+            text=f"Status: Running ({status['rate']:.1f} recognitions/s)", fg=SUCCESS
+        )
+        self._schedule(STATUS_INTERVAL, self._poll_status)
+
+    def _poll_events(self):
+        for event in self.service.events(self._last_event):
+            self._last_event = event["seq"]
+            self._safe_log(event["text"])
+
+    def _schedule(self, delay, callback):
+        # replaces a pending call of the same loop instead of adding one
+        job = self._jobs.pop(callback.__name__, None)
+        if job is not None:
+            self.after_cancel(job)
+
+        def run():
+            self._jobs.pop(callback.__name__, None)
+            callback()
+
+        self._jobs[callback.__name__] = self.after(delay, run)
 
     # =========================
     # UI HELPERS
     # =========================
     def _safe_log(self, text):
-        def safe():
-            if self.listbox.winfo_exists():
-                self.listbox.insert(tk.END, text)
-                self.listbox.yview_moveto(1)
-        self.after(0, safe)
-
-    def _update_preview(self, frame, boxes, results):
-        if not self.active:
+        if self.listbox.winfo_exists():
+            self.listbox.insert(tk.END, text)
+            self.listbox.yview_moveto(1)
+
+    def _update_preview(self):
+        """
+        Draws the service's latest frame, at most preview_fps times a
+        second however fast the cameras run; frames in between are never
+        converted. Nothing is fetched while the window is minimized.
+        """
+        if not self.active or not self.canvas.winfo_exists():
             return
 
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        if self.state() == "iconic":
+            self._schedule(HIDDEN_INTERVAL, self._update_preview)
+            return
 
-        for (top, right, bottom, left), r in zip(boxes, results):
-            color = (0, 255, 0) if r["student_id"] else (255, 0, 0)
-            label = r["name"] if r["student_id"] else "Unknown"
-            cv2.rectangle(rgb, (left, top), (right, bottom), color, 2)
-            cv2.putText(
-                rgb, label, (left, top - 6),
-                cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2
-            )
+        started = time.perf_counter()
+        try:
+            rgb = self.service.preview()
+        except (ConnectionError, RuntimeError):
+            rgb = None
+
+        # the service hands back the same array until a new frame arrives
+        if rgb is not None and rgb is not self._shown:
+            self._show_frame(rgb)
+
+        interval = 1000.0 / self.preview_fps
+        spent = (time.perf_counter() - started) * 1000
+        self._schedule(max(1, int(interval - spent)), self._update_preview)
 
+    def _show_frame(self, rgb):
         img = Image.fromarray(rgb)
-        tkimg = ImageTk.PhotoImage(img)
 
-        def safe_update():
-            if self.canvas.winfo_exists():
-                self.canvas.configure(image=tkimg)
-                self.canvas.image = tkimg
+        if self._photo is not None and \
+                (self._photo.width(), self._photo.height()) == img.size:
+            self._photo.paste(img)
+        else:
+            self._photo = ImageTk.PhotoImage(img)
+            self.canvas.configure(image=self._photo)
 
-        self.after(0, safe_update)
+        self._shown = rgb
@@ -4,6 +4,7 @@ from tkinter import ttk, messagebox
 from app.ui.lecture_form import LectureForm
 from app.ui.attendance_session import AttendanceSession
 from app.ui.report_viewer import ReportViewer
+from app import config
 from app.database.db import Database
 
 
@@ -30,7 +31,8 @@ class Dashboard(tk.Frame):
         self.master = master
         self.pack(fill="both", expand=True)
 
-        self.db = Database()
+        # shared with the session window's threads and report generation
+        self.db = Database(pool_size=config.DB_POOL_SIZE)
 
         self._create_widgets()
         self._set_status("Ready")
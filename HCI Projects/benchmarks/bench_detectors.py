@@ -0,0 +1,109 @@
+"""
+Throughput and accuracy of the face detector backends on local photos.
+Every backend runs over the same images. Accuracy is measured against the
+HOG boxes the stored encodings were trained with, and against the
+dataset layout (every training photo shows one face).
+
+Run from the project folder:
+    python -m benchmarks.bench_detectors app/dataset --backends hog haar yunet
+"""
+import argparse
+import os
+import time
+
+import cv2
+
+from app.recognition.detectors import DETECTORS, make_detector
+from app.recognition.tracker import box_iou
+from app.recognition.train_model import IMAGE_EXTENSIONS
+
+
+def load_images(path, limit, width):
+    """
+    All photos under path (recursively), resized to the given width
+    like camera frames.
+    """
+    images = []
+    for root, _, files in sorted(os.walk(path)):
+        for name in sorted(files):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            image = cv2.imread(os.path.join(root, name))
+            if image is None:
+                continue
+            if width and image.shape[1] != width:
+                scale = width / image.shape[1]
+                image = cv2.resize(image, (0, 0), fx=scale, fy=scale)
+            images.append(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+            if len(images) == limit:
+                return images
+    return images
+
+
+def run(detector, images):
+    found = []
+    start = time.perf_counter()
+    for rgb in images:
+        found.append(detector.detect(rgb))
+    return found, time.perf_counter() - start
+
+
+def agreement(found, reference, threshold=0.5):
+    """
+    Returns: (share of reference faces found, share of boxes that match one)
+    """
+    matched = total_ref = total_found = 0
+    for boxes, ref in zip(found, reference):
+        total_ref += len(ref)
+        total_found += len(boxes)
+        matched += sum(
+            1 for r in ref if any(box_iou(r, b) >= threshold for b in boxes)
+        )
+    recall = matched / total_ref if total_ref else 0.0
+    precision = matched / total_found if total_found else 0.0
+    return recall, precision
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path", nargs="?", default=os.path.join("app", "dataset"))
+    parser.add_argument("--backends", nargs="+", default=sorted(DETECTORS),
+                        choices=sorted(DETECTORS))
+    parser.add_argument("--limit", type=int, default=200, help="images used")
+    parser.add_argument("--width", type=int, default=640,
+                        help="resize images to this width (0: keep size)")
+    args = parser.parse_args()
+
+    images = load_images(args.path, args.limit, args.width)
+    if not images:
+        print(f"[ERROR] No images found in {args.path}")
+        return
+
+    reference, _ = run(make_detector("hog"), images)
+
+    print("=" * 72)
+    print(f"Images: {len(images)}   width: {args.width or 'original'}   reference: hog")
+    print("=" * 72)
+    print(f"{'backend':<10}{'img/s':>9}{'ms/img':>9}{'one face':>11}"
+          f"{'recall':>10}{'precision':>12}")
+
+    for kind in args.backends:
+        try:
+            detector = make_detector(kind)
+        except (OSError, RuntimeError, ValueError) as e:
+            print(f"{kind:<10}  skipped: {e}")
+            continue
+        if detector.name != kind:
+            print(f"{kind:<10}  skipped: model file missing")
+            continue
+
+        found, elapsed = run(detector, images)
+        one_face = sum(1 for boxes in found if len(boxes) == 1) / len(images)
+        recall, precision = agreement(found, reference)
+
+        print(f"{kind:<10}{len(images) / elapsed:>9.1f}{1000 * elapsed / len(images):>9.2f}"
+              f"{one_face:>11.2%}{recall:>10.2%}{precision:>12.2%}")
+
+
+if __name__ == "__main__":
+    main()
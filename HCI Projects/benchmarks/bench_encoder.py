@@ -0,0 +1,95 @@
+"""
+Face encoding throughput: one face_encodings call per frame vs the
+BatchEncoder shared by several streams (cameras / recognition workers).
+Faces are detected once up front; only encoding is timed.
+
+Run from the project folder:
+    python -m benchmarks.bench_encoder app/dataset --streams 1 2 4 --batch 32
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+import face_recognition
+
+from app.recognition.encoder import BatchEncoder
+from benchmarks.bench_detectors import load_images
+
+
+def load_frames(path, limit, width):
+    """
+    Returns: [(rgb, boxes), ...] for the images in which faces were found
+    """
+    frames = []
+    for rgb in load_images(path, limit, width):
+        boxes = face_recognition.face_locations(rgb)
+        if boxes:
+            frames.append((rgb, boxes))
+    return frames
+
+
+def run_streams(encode, frames, streams, per_stream):
+    """
+    streams threads, each encoding per_stream frames like one camera.
+    Returns: (faces encoded, seconds)
+    """
+    counts = [0] * streams
+
+    def stream(n):
+        for i in range(per_stream):
+            rgb, boxes = frames[(n * per_stream + i) % len(frames)]
+            counts[n] += len(encode(rgb, boxes))
+
+    threads = [threading.Thread(target=stream, args=(n,)) for n in range(streams)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path", nargs="?", default="app/dataset")
+    parser.add_argument("--limit", type=int, default=100, help="images used")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--frames", type=int, default=100, help="frames per stream")
+    parser.add_argument("--streams", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--wait", type=float, default=0.01, help="max batching delay (s)")
+    args = parser.parse_args()
+
+    frames = load_frames(args.path, args.limit, args.width)
+    if not frames:
+        print(f"[ERROR] No faces found in {args.path}")
+        return
+
+    encoder = BatchEncoder(batch_size=args.batch, max_wait=args.wait)
+
+    # both paths must give the same encodings
+    rgb, boxes = frames[0]
+    diff = np.max(np.abs(
+        np.array(face_recognition.face_encodings(rgb, boxes)) - np.array(encoder.encode(rgb, boxes))
+    ))
+
+    print("=" * 64)
+    print(f"Frames: {len(frames)}   faces/frame: "
+          f"{np.mean([len(b) for _, b in frames]):.1f}   batch: {args.batch}   "
+          f"wait: {args.wait * 1000:.0f}ms")
+    print(f"Max encoding difference vs face_encodings: {diff:.2e}")
+    print("=" * 64)
+    print(f"{'streams':<10}{'per-frame faces/s':>20}{'batched faces/s':>18}{'speedup':>10}")
+
+    for streams in args.streams:
+        faces, single = run_streams(face_recognition.face_encodings, frames, streams, args.frames)
+        _, batched = run_streams(encoder.encode, frames, streams, args.frames)
+        print(f"{streams:<10}{faces / single:>20.1f}{faces / batched:>18.1f}"
+              f"{single / batched:>10.2f}")
+
+    encoder.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Recall vs latency of the approximate gallery index against exact search.
+Uses synthetic 128-d encodings, no camera or database needed.
+
+Run from the project folder:
+    python -m benchmarks.bench_index --students 100000 --probes 4 8 16
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.recognition.gallery import Gallery
+from app.recognition.index import ExactIndex, IVFIndex
+
+
+def synthetic_gallery(n_students, dim=128, n_groups=512, seed=0):
+    """
+    Face encodings are not uniform noise: they cluster (age, ethnicity,
+    lighting). Students are drawn around a few hundred group centres.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(0.0, 0.12, size=(n_groups, dim))
+    groups = rng.integers(0, n_groups, size=n_students)
+    encodings = centres[groups] + rng.normal(0.0, 0.05, size=(n_students, dim))
+    return encodings.astype(np.float32)
+
+
+def synthetic_queries(encodings, n_queries, noise=0.02, seed=1):
+    """
+    New photos of enrolled students: a gallery row plus capture noise.
+    """
+    rng = np.random.default_rng(seed)
+    truth = rng.integers(0, len(encodings), size=n_queries)
+    queries = encodings[truth] + rng.normal(0.0, noise, size=(n_queries, encodings.shape[1]))
+    return queries, truth
+
+
+def time_search(index, queries, batch):
+    found = []
+    start = time.perf_counter()
+    for i in range(0, len(queries), batch):
+        idx, _ = index.search(queries[i:i + batch], k=2)
+        found.append(idx[:, 0])
+    elapsed = time.perf_counter() - start
+    return np.concatenate(found), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=8,
+                        help="faces matched per call (faces in one frame)")
+    parser.add_argument("--lists", type=int, default=None)
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    encodings = synthetic_gallery(args.students)
+    gallery = Gallery((i, str(i), enc) for i, enc in enumerate(encodings))
+    queries, _ = synthetic_queries(encodings, args.queries)
+
+    exact = ExactIndex(gallery)
+    exact_best, exact_time = time_search(exact, queries, args.batch)
+
+    start = time.perf_counter()
+    ivf = IVFIndex(gallery, n_lists=args.lists)
+    build_time = time.perf_counter() - start
+
+    per_frame = 1000.0 * args.batch / len(queries)
+
+    print("=" * 60)
+    print(f"Gallery: {args.students} x 128   queries: {args.queries}   batch: {args.batch}")
+    print(f"IVF lists: {ivf.n_lists}   build: {build_time:.2f}s")
+    print("=" * 60)
+    print(f"{'index':<16}{'recall@1':>10}{'ms/frame':>12}{'speedup':>10}")
+    print(f"{'exact':<16}{1.0:>10.4f}{exact_time * per_frame:>12.3f}{1.0:>10.2f}")
+
+    for n_probe in args.probes:
+        ivf.n_probe = n_probe
+        best, elapsed = time_search(ivf, queries, args.batch)
+        recall = float(np.mean(best == exact_best))
+        print(f"{'ivf/' + str(n_probe):<16}{recall:>10.4f}"
+              f"{elapsed * per_frame:>12.3f}{exact_time / elapsed:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
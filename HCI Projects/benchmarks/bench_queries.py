@@ -0,0 +1,194 @@
+"""
+Report and lecture-list query latency before and after the schema
+indexes (migration 2), on a synthetic semester of attendance.
+
+SQLite runs on a temporary file. MySQL needs an empty scratch database
+(its tables are dropped first), never the real one:
+    CREATE DATABASE attendance_bench;
+
+Run from the project folder:
+    python -m benchmarks.bench_queries --backend sqlite
+    python -m benchmarks.bench_queries --backend mysql --database attendance_bench
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from app import config
+from app.database.backends import drop_tables
+from app.database.db import Database
+
+# schema version without the report indexes
+BASE_VERSION = 1
+
+# same queries as Database.get_student_report / list_lectures, for EXPLAIN
+QUERIES = {
+    "student report": """
+        SELECT l.course_name, l.session_date, a.status
+        FROM attendance a
+        JOIN lectures l ON a.lecture_id = l.id
+        WHERE a.student_id = %s
+        ORDER BY l.session_date
+    """,
+    "lecture list": """
+        SELECT id, course_name, session_date, start_time
+        FROM lectures
+        ORDER BY session_date DESC, start_time DESC
+    """,
+}
+
+def seed_semester(db, students, courses, weeks, per_week, roster, rate, seed=0):
+    """
+    courses x weeks x per_week lectures; each course has `roster`
+    enrolled students of whom about `rate` attend each lecture.
+    Returns: (student ids, number of attendance rows)
+    """
+    rng = np.random.default_rng(seed)
+    encodings = rng.normal(0.0, 0.1, size=(students, 128)).astype(np.float32)
+    ids = db.bulk_upsert_students(
+        (f"S{i:06d}", f"Student {i}", encodings[i]) for i in range(students)
+    )
+    codes = list(ids)
+    student_ids = np.array([ids[code] for code in codes])
+
+    db.add_instructor("Bench Instructor", "bench@example.com")
+    instructor_id = db.get_instructors()[0]["id"]
+
+    first_day = date(2025, 2, 2)
+    records = []
+    for c in range(courses):
+        course = f"Course {c:03d}"
+        members = rng.choice(students, size=min(roster, students), replace=False)
+        db.enroll_students(course, [codes[m] for m in members])
+
+        start = timedelta(hours=8 + c % 10)
+        for week in range(weeks):
+            for k in range(per_week):
+                day = first_day + timedelta(days=7 * week + (c + 2 * k) % 5)
+                lecture_id = db.create_lecture(
+                    instructor_id, course, f"Room {c % 20}",
+                    day, start, start + timedelta(hours=2)
+                )
+                seen = datetime.combine(day, datetime.min.time()) + start
+                present = members[rng.random(len(members)) < rate]
+                records.extend(
+                    (lecture_id, int(student_ids[m]), seen, "Present") for m in present
+                )
+
+    for i in range(0, len(records), 5000):
+        db.mark_attendance_many(records[i:i + 5000])
+    return student_ids, len(records)
+
+
+def query_plan(db, sql, params):
+    with db.transaction() as cursor:
+        if db.backend.name == "sqlite":
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+        cursor.execute("EXPLAIN " + sql, params)
+        columns = [c[0] for c in cursor.description]
+        plan = []
+        for row in cursor.fetchall():
+            r = dict(zip(columns, row))
+            plan.append(f"{r['table']}: key={r['key']} rows={r['rows']} {r['Extra'] or ''}")
+        return plan
+
+
+def time_calls(call, args_list):
+    """
+    Returns: (mean ms, p95 ms)
+    """
+    times = []
+    for args in args_list:
+        start = time.perf_counter()
+        call(*args)
+        times.append(1000.0 * (time.perf_counter() - start))
+    return float(np.mean(times)), float(np.percentile(times, 95))
+
+
+def measure(db, student_ids, reports, lists, seed=2):
+    rng = np.random.default_rng(seed)
+    sample = [(int(s),) for s in rng.choice(student_ids, size=reports)]
+    return {
+        "student report": time_calls(db.get_student_report, sample),
+        "lecture list": time_calls(db.list_lectures, [()] * lists),
+    }, {
+        name: query_plan(db, sql, (sample[0][0],) if "%s" in sql else ())
+        for name, sql in QUERIES.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--database", default=None,
+                        help="MySQL scratch database (required for --backend mysql)")
+    parser.add_argument("--students", type=int, default=3000)
+    parser.add_argument("--courses", type=int, default=60)
+    parser.add_argument("--weeks", type=int, default=15)
+    parser.add_argument("--per-week", type=int, default=2,
+                        help="lectures per course per week")
+    parser.add_argument("--roster", type=int, default=120,
+                        help="students enrolled per course")
+    parser.add_argument("--rate", type=float, default=0.85,
+                        help="share of the roster attending a lecture")
+    parser.add_argument("--reports", type=int, default=300,
+                        help="student reports timed")
+    parser.add_argument("--lists", type=int, default=30,
+                        help="lecture lists timed")
+    args = parser.parse_args()
+
+    scratch = None
+    if args.backend == "sqlite":
+        scratch = tempfile.mkdtemp(prefix="bench_queries_")
+        config.SQLITE_PATH = os.path.join(scratch, "bench.sqlite")
+    else:
+        if not args.database:
+            parser.error("--backend mysql needs --database (an empty scratch database)")
+        config.DB_NAME = args.database
+        drop_tables("mysql")
+
+    db = Database(backend=args.backend, schema_version=BASE_VERSION)
+
+    start = time.perf_counter()
+    student_ids, n_rows = seed_semester(
+        db, args.students, args.courses, args.weeks, args.per_week,
+        args.roster, args.rate
+    )
+    seed_time = time.perf_counter() - start
+
+    before, plans_before = measure(db, student_ids, args.reports, args.lists)
+    db.migrate()
+    after, plans_after = measure(db, student_ids, args.reports, args.lists)
+
+    print("=" * 64)
+    print(f"Backend: {args.backend}   students: {args.students}   "
+          f"lectures: {args.courses * args.weeks * args.per_week}")
+    print(f"Attendance rows: {n_rows}   seeded in {seed_time:.1f}s")
+    print("=" * 64)
+    print(f"{'query':<16}{'before ms':>11}{'p95':>9}{'after ms':>11}{'p95':>9}{'speedup':>9}")
+    for name in QUERIES:
+        (b_mean, b_p95), (a_mean, a_p95) = before[name], after[name]
+        print(f"{name:<16}{b_mean:>11.3f}{b_p95:>9.3f}{a_mean:>11.3f}{a_p95:>9.3f}"
+              f"{b_mean / a_mean:>9.2f}")
+
+    for name in QUERIES:
+        print(f"\n{name} plan")
+        for label, plans in (("before", plans_before), ("after", plans_after)):
+            for line in plans[name]:
+                print(f"  {label:<7}{line}")
+
+    db.close()
+    if scratch is not None:
+        for name in os.listdir(scratch):
+            os.remove(os.path.join(scratch, name))
+        os.rmdir(scratch)
+
+
+if __name__ == "__main__":
+    main()
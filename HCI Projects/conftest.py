@@ -0,0 +1,58 @@
+"""
+Shared pytest fixtures. Run from the project folder:
+    python -m pytest
+
+Database tests run on both backends: SQLite in a temporary file, MySQL
+in the scratch database named by ATTENDANCE_TEST_MYSQL_DB (its tables
+are dropped first; skipped when unset or unreachable).
+"""
+import os
+import time
+
+import pytest
+
+from app import config
+from app.database.backends import drop_tables
+from app.database.db import Database
+
+
+@pytest.fixture(params=["sqlite", "mysql"])
+def backend(request, tmp_path, monkeypatch):
+    """
+    Name of a backend pointed at an empty database.
+    """
+    if request.param == "sqlite":
+        monkeypatch.setattr(config, "SQLITE_PATH", str(tmp_path / "attendance.sqlite"))
+        return "sqlite"
+
+    pytest.importorskip("mysql.connector")
+    name = os.environ.get("ATTENDANCE_TEST_MYSQL_DB")
+    if not name:
+        pytest.skip("set ATTENDANCE_TEST_MYSQL_DB to a scratch MySQL database")
+    monkeypatch.setattr(config, "DB_NAME", name)
+    try:
+        drop_tables("mysql")
+    except Exception as e:
+        pytest.skip(f"MySQL not available: {e}")
+    return "mysql"
+
+
+@pytest.fixture
+def local_tz(monkeypatch):
+    """
+    Local time 5:30 ahead of UTC, so local and UTC stamps differ.
+    """
+    if not hasattr(time, "tzset"):
+        pytest.skip("changing the time zone needs time.tzset (Unix)")
+    monkeypatch.setenv("TZ", "IST-5:30")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.fixture
+def db(backend):
+    database = Database(backend=backend)
+    yield database
+    database.close()
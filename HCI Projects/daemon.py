@@ -0,0 +1,46 @@
+"""
+Headless attendance: cameras and recognition without a window.
+
+Usage:
+    python daemon.py
+    ATTENDANCE_SERVICE_TOKEN=<secret> python daemon.py --host 0.0.0.0 --port 8765
+
+Sessions are started, stopped and watched over HTTP (see
+app/service/api.py); the session window of main.py connects to a running
+daemon on its own.
+"""
+import argparse
+
+from app import config
+from app.service.api import check_bind, make_server
+from app.service.attendance_service import AttendanceService
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run attendance sessions without the UI")
+    parser.add_argument("--host", default=config.SERVICE_HOST,
+                        help="address to listen on (default: local connections only)")
+    parser.add_argument("--port", type=int, default=config.SERVICE_PORT)
+    args = parser.parse_args()
+
+    # before the cameras open
+    try:
+        check_bind(args.host, config.SERVICE_TOKEN)
+    except ValueError as e:
+        parser.error(str(e))
+
+    service = AttendanceService()
+    server = make_server(service, args.host, args.port, config.SERVICE_TOKEN)
+    print(f"[INFO] Attendance daemon listening on http://{args.host}:{args.port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("[INFO] Shutting down")
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import json
+import threading
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+pytest.importorskip("cv2")
+
+from app.service.api import check_bind, make_server
+
+
+class FakeService:
+    """
+    The parts of AttendanceService the API calls.
+    """
+
+    def events(self, since):
+        return [{"seq": since + 1, "text": "seen"}]
+
+    def start(self, lecture_id):
+        raise LookupError(f"No lecture with id {lecture_id}")
+
+    def status(self):
+        return {"active": False}
+
+
+@pytest.fixture
+def server():
+    server = make_server(FakeService(), "127.0.0.1", 0, token="secret")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def call(url, token="secret", data=None):
+    request = Request(url, data=data)
+    if token:
+        request.add_header("Authorization", f"Bearer {token}")
+    try:
+        with urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_events(server):
+    assert call(f"{server}/events?since=4") == (200, [{"seq": 5, "text": "seen"}])
+    assert call(f"{server}/events?since=abc")[0] == 400
+
+
+def test_token_required(server):
+    assert call(f"{server}/status", token=None)[0] == 401
+    assert call(f"{server}/status", token="wrong")[0] == 401
+    assert call(f"{server}/status") == (200, {"active": False})
+
+
+def test_unknown_lecture(server):
+    body = json.dumps({"lecture_id": 99}).encode("utf-8")
+    assert call(f"{server}/session/start", data=body)[0] == 404
+    assert call(f"{server}/session/start", data=b"{}")[0] == 400
+
+
+def test_check_bind():
+    check_bind("127.0.0.1", "")
+    check_bind("0.0.0.0", "secret")
+    with pytest.raises(ValueError):
+        check_bind("0.0.0.0", "")
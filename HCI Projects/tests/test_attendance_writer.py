@@ -0,0 +1,81 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.database.attendance_spool import AttendanceSpool
+from app.database.attendance_writer import AttendanceWriter
+from app.database.db import Database
+
+
+@pytest.fixture
+def lecture(db):
+    enc = np.zeros((6, 128))
+    ids = db.bulk_upsert_students([(f"S{i}", f"Student {i}", enc[i]) for i in range(6)])
+    db.add_instructor("Instructor", "instructor@example.com")
+    lecture_id = db.create_lecture(db.get_instructors()[0]["id"], "Course A", "Room 1",
+                                   date(2025, 3, 4), timedelta(hours=9),
+                                   timedelta(hours=11))
+    return lecture_id, [ids[f"S{i}"] for i in range(6)]
+
+
+def test_spool_deduplicates_and_survives_reopening(tmp_path):
+    path = str(tmp_path / "spool.sqlite")
+    spool = AttendanceSpool(path)
+    when = datetime(2025, 3, 4, 9, 30, 15, 250000)
+
+    assert spool.add(1, 7, when)
+    assert not spool.add(1, 7, when + timedelta(minutes=5), "Late")
+    assert spool.add(2, 7, when, "Late")
+    spool.close()
+
+    spool = AttendanceSpool(path)
+    assert spool.peek(10) == [(1, 7, when, "Present"), (2, 7, when, "Late")]
+    spool.remove(spool.peek(1))
+    assert len(spool) == 1
+    spool.close()
+
+
+def test_writer_moves_spooled_marks(backend, lecture, tmp_path):
+    lecture_id, students = lecture
+    spool = AttendanceSpool(str(tmp_path / "spool.sqlite"))
+    writer = AttendanceWriter(lambda: Database(backend=backend), spool, max_wait=0.0)
+
+    for sid in students:
+        writer.add(lecture_id, sid)
+    assert writer.flush(10.0)
+    writer.stop()
+
+    db = Database(backend=backend)
+    try:
+        assert len(db.get_lecture_report(lecture_id)) == len(students)
+    finally:
+        db.close()
+    spool.close()
+
+
+def test_writer_sets_refused_marks_aside(backend, lecture, tmp_path):
+    lecture_id, students = lecture
+    spool = AttendanceSpool(str(tmp_path / "spool.sqlite"))
+    writer = AttendanceWriter(lambda: Database(backend=backend), spool, max_wait=0.0)
+
+    # a deleted lecture and a deleted student, among good marks
+    writer.add(lecture_id + 100, students[0])
+    for sid in students:
+        writer.add(lecture_id, sid)
+    writer.add(lecture_id, students[-1] + 100)
+    assert writer.flush(10.0)
+    writer.stop()
+
+    db = Database(backend=backend)
+    try:
+        assert len(db.get_lecture_report(lecture_id)) == len(students)
+    finally:
+        db.close()
+
+    rejected = spool.conn.execute(
+        "SELECT lecture_id, student_id FROM rejected ORDER BY lecture_id, student_id"
+    ).fetchall()
+    assert rejected == [(lecture_id, students[-1] + 100), (lecture_id + 100, students[0])]
+    assert len(spool) == 0
+    spool.close()
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from app import config
+from app.database.backends import BACKENDS, make_backend, translate
+from app.database.db import Database
+
+
+@pytest.mark.parametrize("mysql, sqlite", [
+    ("SELECT id FROM students WHERE student_code = %s",
+     "SELECT id FROM students WHERE student_code = ?"),
+    ("INSERT IGNORE INTO attendance (lecture_id) VALUES (%s)",
+     "INSERT OR IGNORE INTO attendance (lecture_id) VALUES (?)"),
+    ("ON DUPLICATE KEY UPDATE face_encoding = VALUES(face_encoding)",
+     "ON CONFLICT DO UPDATE SET face_encoding = excluded.face_encoding"),
+    ("VALUES (%s, %s, NOW())",
+     "VALUES (?, ?, datetime('now'))"),
+    ("SET updated_at = CURRENT_TIMESTAMP(6)",
+     "SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')"),
+])
+def test_translate(mysql, sqlite):
+    assert translate(mysql) == sqlite
+
+
+def test_translate_leaves_plain_sql_alone():
+    sql = "SELECT COUNT(face_encoding), MAX(updated_at) FROM students"
+    assert translate(sql) == sql
+    # VALUES followed by a space is a row list, not VALUES(col)
+    assert "VALUES (" in translate("INSERT INTO t (a) VALUES (%s)")
+
+
+def test_make_backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SQLITE_PATH", str(tmp_path / "attendance.sqlite"))
+    backend = make_backend("SQLite")
+    assert backend.name == "sqlite" and backend.path == config.SQLITE_PATH
+    backend.close()
+
+    with pytest.raises(ValueError):
+        make_backend("oracle")
+    assert set(BACKENDS) == {"mysql", "sqlite"}
+
+
+def test_sqlite_local_stamps_move_to_utc(tmp_path, monkeypatch, local_tz):
+    monkeypatch.setattr(config, "SQLITE_PATH", str(tmp_path / "attendance.sqlite"))
+    db = Database(backend="sqlite", schema_version=3)
+    try:
+        db.add_student("S1", "Old", np.zeros(128))
+        db.add_student("S2", "Deleted", np.zeros(128))
+        with db.transaction() as cursor:
+            cursor.execute("UPDATE students SET updated_at = %s WHERE student_code = 'S1'",
+                           ("2025-01-15 10:00:00.000",))
+            cursor.execute("DELETE FROM students WHERE student_code = 'S2'")
+
+        assert db.migrate() == [4]
+        db.add_student("S3", "New", np.zeros(128))
+
+        with db.transaction() as cursor:
+            cursor.execute("SELECT student_code, updated_at FROM students ORDER BY id")
+            stamps = dict(cursor.fetchall())
+            cursor.execute("SELECT deleted_at FROM student_deletions")
+            deleted = cursor.fetchone()[0]
+    finally:
+        db.close()
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    assert stamps["S1"] == datetime(2025, 1, 15, 4, 30)
+    assert abs(stamps["S3"] - now) < timedelta(minutes=1)
+    assert abs(deleted - now) < timedelta(minutes=1)
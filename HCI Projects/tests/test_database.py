@@ -0,0 +1,249 @@
+import pickle
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from app.database.db import Database
+from app.database.encoding_codec import pack_encoding
+
+
+def encodings(n, seed=0):
+    return np.random.default_rng(seed).normal(0.0, 0.1, size=(n, 128)).astype(np.float32)
+
+
+def add_students(db, n, seed=0, templates=None):
+    enc = encodings(n, seed)
+    return db.bulk_upsert_students(
+        [(f"S{i:03d}", f"Student {i}", enc[i]) for i in range(n)], templates
+    ), enc
+
+
+def run(db, sql, params=()):
+    with db.transaction() as cursor:
+        cursor.execute(sql, params)
+
+
+def add_lecture(db, course="Course A", day=date(2025, 3, 4)):
+    db.add_instructor("Instructor", "instructor@example.com")
+    instructor_id = db.get_instructors()[0]["id"]
+    return db.create_lecture(instructor_id, course, "Room 1", day,
+                             timedelta(hours=9, minutes=30), timedelta(hours=11))
+
+
+# =========================
+# SCHEMA
+# =========================
+def test_create_tables_applies_every_migration(db):
+    latest = db.backend.migrations[-1][0]
+    assert db.get_schema_version() == latest
+    assert db.migrate() == []
+
+
+def test_migrate_up_to_target(backend):
+    db = Database(backend=backend, schema_version=1)
+    try:
+        assert db.get_schema_version() == 1
+        assert db.migrate() == [v for v, _, _ in db.backend.migrations if v > 1]
+    finally:
+        db.close()
+
+    # a second process finds the schema up to date
+    db = Database(backend=backend)
+    try:
+        assert db.migrate() == []
+    finally:
+        db.close()
+
+
+# =========================
+# STUDENTS AND GALLERY
+# =========================
+def test_bulk_upsert_inserts_then_updates(db):
+    ids, enc = add_students(db, 5)
+    assert sorted(ids) == [f"S{i:03d}" for i in range(5)]
+
+    again = db.bulk_upsert_students([("S001", "Renamed", enc[4])], batch_size=2)
+    assert again == {"S001": ids["S001"]}
+
+    students, matrix = db.load_gallery()
+    assert [sid for sid, _ in students] == sorted(ids.values())
+    row = [sid for sid, _ in students].index(ids["S001"])
+    assert students[row][1] == "Student 1"     # the name is kept
+    np.testing.assert_array_equal(matrix[row], enc[4])
+
+
+def test_templates_replace_and_limit(db):
+    enc = encodings(6, seed=1)
+    ids, _ = add_students(db, 2, templates={"S000": list(enc[:3])})
+
+    students, matrix = db.load_gallery(max_templates=2)
+    # S000: two of its three templates; S001 has none and falls back
+    assert [sid for sid, _ in students] == [ids["S000"]] * 2 + [ids["S001"]]
+    np.testing.assert_array_equal(matrix[:2], enc[:2])
+
+    db.replace_templates({ids["S000"]: [enc[5]]})
+    students, matrix = db.load_gallery(max_templates=4)
+    assert [sid for sid, _ in students] == [ids["S000"], ids["S001"]]
+    np.testing.assert_array_equal(matrix[0], enc[5])
+
+
+def test_gallery_skips_pickled_and_damaged_rows(db):
+    ids, enc = add_students(db, 3)
+    run(db, "UPDATE students SET face_encoding = %s WHERE id = %s",
+        (pickle.dumps(enc[0].astype(np.float64)), ids["S000"]))
+    run(db, "UPDATE students SET face_encoding = %s WHERE id = %s",
+        (pack_encoding(enc[1])[:-8], ids["S001"]))
+
+    students, matrix = db.load_gallery()
+    assert students == [(ids["S002"], "Student 2")]
+    np.testing.assert_array_equal(matrix, enc[2:])
+
+
+def test_gallery_changes_and_revision(db):
+    assert db.get_gallery_revision() == (0, None)
+    ids, _ = add_students(db, 4)
+
+    count, latest = db.get_gallery_revision()
+    assert count == 4 and isinstance(latest, datetime)
+
+    students, matrix, cleared, watermark = db.load_gallery_changes()
+    assert len(students) == 4 and matrix.shape == (4, 128) and cleared == []
+    assert watermark == latest
+
+    # stamps only go down to the millisecond: date the unchanged rows
+    # well before `since` instead of relying on the clock moving on
+    before = datetime(2025, 1, 1)
+    run(db, "UPDATE students SET updated_at = %s", (before,))
+    since = before + timedelta(seconds=1)
+
+    db.clear_encodings(["S001"])
+    run(db, "DELETE FROM students WHERE id = %s", (ids["S002"],))
+
+    count, newer = db.get_gallery_revision()
+    assert count == 2 and newer > since
+
+    students, matrix, cleared, watermark = db.load_gallery_changes(since=since)
+    assert students == [] and matrix.shape == (0, 128)
+    assert sorted(cleared) == sorted([ids["S001"], ids["S002"]])
+    assert watermark == newer
+
+
+def test_change_stamps_are_utc(db, local_tz):
+    ids, _ = add_students(db, 2)
+    run(db, "DELETE FROM students WHERE id = %s", (ids["S001"],))
+    db.replace_templates({ids["S000"]: list(encodings(1))})
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    _, latest = db.get_gallery_revision()
+    _, _, _, watermark = db.load_gallery_changes()
+    assert abs(latest - now) < timedelta(minutes=1)
+    assert watermark == latest
+
+
+def test_clear_encodings_keeps_the_student(db):
+    ids, enc = add_students(db, 2, templates={"S000": list(encodings(2, seed=3))})
+    db.clear_encodings(["S000"])
+
+    students, _ = db.load_gallery(max_templates=3)
+    assert students == [(ids["S001"], "Student 1")]
+    # attendance history can still refer to the student
+    lecture_id = add_lecture(db)
+    db.mark_attendance(lecture_id, ids["S000"])
+    assert len(db.get_lecture_report(lecture_id)) == 1
+
+
+# =========================
+# LECTURES AND ROSTERS
+# =========================
+def test_date_and_time_round_trip(db):
+    lecture_id = add_lecture(db, day=date(2025, 3, 4))
+    lecture = db.get_lecture(lecture_id)
+
+    assert lecture["session_date"] == date(2025, 3, 4)
+    # TIME comes back as a timedelta, as mysql.connector returns it
+    assert lecture["start_time"] == timedelta(hours=9, minutes=30)
+    assert lecture["end_time"] == timedelta(hours=11)
+    assert db.get_lecture(lecture_id + 1) is None
+
+    ids, _ = add_students(db, 1)
+    seen = datetime(2025, 3, 4, 9, 41, 7)
+    db.mark_attendance(lecture_id, ids["S000"], "Late", attendance_time=seen)
+    assert db.get_lecture_report(lecture_id) == [("S000", "Student 0", "Late", seen)]
+
+
+def test_lecture_list_newest_first(db):
+    first = add_lecture(db, day=date(2025, 3, 4))
+    second = add_lecture(db, day=date(2025, 3, 11))
+    assert [l["id"] for l in db.list_lectures()] == [second, first]
+
+
+def test_rosters(db):
+    ids, _ = add_students(db, 4)
+    db.enroll_students("Course A", ["S000", "S001", "S001", "S999"])
+    db.enroll_students("Course A", ["S002"])
+    db.enroll_students("Course B", ["S003"])
+
+    expected = sorted(ids[c] for c in ("S000", "S001", "S002"))
+    assert sorted(db.get_course_roster("Course A")) == expected
+
+    lecture_id = add_lecture(db, course="Course A")
+    assert sorted(db.get_lecture_roster(lecture_id)) == expected
+
+
+# =========================
+# ATTENDANCE
+# =========================
+def test_mark_attendance_keeps_the_first_mark(db):
+    ids, _ = add_students(db, 3)
+    lecture_id = add_lecture(db)
+    first = datetime(2025, 3, 4, 9, 35)
+    later = datetime(2025, 3, 4, 10, 5)
+
+    db.mark_attendance(lecture_id, ids["S000"], attendance_time=first)
+    db.mark_attendance(lecture_id, ids["S000"], "Late", attendance_time=later)
+    db.mark_attendance_many([
+        (lecture_id, ids["S000"], later, "Late"),
+        (lecture_id, ids["S001"], first, "Present"),
+        (lecture_id, ids["S001"], later, "Late"),
+        (lecture_id, ids["S002"], later, "Late"),
+    ])
+    db.mark_attendance_many([])
+
+    report = {code: (status, when) for code, _, status, when in db.get_lecture_report(lecture_id)}
+    assert report == {
+        "S000": ("Present", first),
+        "S001": ("Present", first),
+        "S002": ("Late", later),
+    }
+    assert db.get_student_report(ids["S000"]) == [("Course A", date(2025, 3, 4), "Present")]
+
+
+def test_insert_ignore_skips_unknown_lecture(db):
+    ids, _ = add_students(db, 2)
+    lecture_id = add_lecture(db)
+
+    # like MySQL: the row breaking the foreign key is skipped
+    db.mark_attendance(lecture_id + 100, ids["S000"])
+    db.mark_attendance(lecture_id, ids["S001"])
+    assert db.get_student_report(ids["S000"]) == []
+    assert [code for code, _, _, _ in db.get_lecture_report(lecture_id)] == ["S001"]
+
+
+def test_mark_attendance_many_refuses_unknown_lecture(db):
+    ids, _ = add_students(db, 2)
+    lecture_id = add_lecture(db)
+    when = datetime(2025, 3, 4, 9, 35)
+
+    # nothing is dropped silently: the batch fails as a whole
+    with pytest.raises(Exception, match="(?i)foreign key"):
+        db.mark_attendance_many([
+            (lecture_id, ids["S000"], when, "Present"),
+            (lecture_id + 100, ids["S000"], when, "Present"),
+            (lecture_id, ids["S001"], when, "Present"),
+        ])
+    assert db.get_lecture_report(lecture_id) == []
+
+
+def test_ping(db):
+    assert db.ping()
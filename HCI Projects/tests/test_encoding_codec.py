@@ -0,0 +1,52 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from app.database.encoding_codec import (
+    ENCODING_DIM, HEADER, MODEL_DLIB_RESNET, is_packed, pack_encoding,
+    read_header, unpack_encoding, unpack_encodings, unpack_legacy
+)
+
+
+def test_round_trip():
+    encoding = np.random.default_rng(0).normal(size=ENCODING_DIM)
+    blob = pack_encoding(encoding)
+
+    assert len(blob) == HEADER.size + 4 * ENCODING_DIM
+    assert is_packed(blob)
+    assert read_header(blob) == (1, ENCODING_DIM, MODEL_DLIB_RESNET)
+
+    decoded = unpack_encoding(blob)
+    assert decoded.dtype == np.float32
+    np.testing.assert_array_equal(decoded, encoding.astype(np.float32))
+
+
+def test_bulk_decode_matches_single():
+    rows = np.random.default_rng(1).normal(size=(5, ENCODING_DIM)).astype(np.float32)
+    # database drivers may hand back bytearray / memoryview
+    blobs = [pack_encoding(rows[0]), bytearray(pack_encoding(rows[1]))] + \
+        [memoryview(pack_encoding(r)) for r in rows[2:]]
+
+    matrix = unpack_encodings(blobs)
+    assert matrix.shape == (5, ENCODING_DIM) and matrix.flags["C_CONTIGUOUS"]
+    np.testing.assert_array_equal(matrix, rows)
+    assert unpack_encodings([]).shape == (0, ENCODING_DIM)
+
+
+def test_bulk_decode_refuses_mixed_formats():
+    good = pack_encoding(np.zeros(ENCODING_DIM))
+    with pytest.raises(ValueError):
+        unpack_encodings([good, good[:-4]])
+    with pytest.raises(ValueError):
+        unpack_encodings([good, pack_encoding(np.zeros(ENCODING_DIM), model_id=2)])
+
+
+def test_legacy_pickle():
+    encoding = np.random.default_rng(2).normal(size=ENCODING_DIM)
+    blob = pickle.dumps(encoding)
+
+    assert not is_packed(blob) and not is_packed(None)
+    with pytest.raises(ValueError):
+        read_header(blob)
+    np.testing.assert_allclose(unpack_legacy(blob), encoding, rtol=1e-6)
@@ -0,0 +1,84 @@
+import numpy as np
+
+from app.recognition.gallery import Gallery
+
+try:
+    from face_recognition import face_distance
+except ImportError:
+    def face_distance(face_encodings, face_to_compare):
+        # same formula as face_recognition.face_distance
+        return np.linalg.norm(face_encodings - face_to_compare, axis=1)
+
+
+def random_gallery(n, templates=1, seed=0):
+    rng = np.random.default_rng(seed)
+    matrix = rng.normal(0.0, 0.1, size=(n * templates, 128))
+    rows = [(sid, f"Student {sid}") for sid in range(1, n + 1) for _ in range(templates)]
+    return rows, matrix
+
+
+def queries_near(matrix, n, seed=1):
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(matrix), n, replace=False)
+    return matrix[picks] + rng.normal(0.0, 0.02, size=(n, 128))
+
+
+# =========================
+# GALLERY
+# =========================
+def test_nearest_matches_face_distance():
+    rows, matrix = random_gallery(200)
+    gallery = Gallery([(sid, name, enc) for (sid, name), enc in zip(rows, matrix)])
+    queries = queries_near(matrix, 10)
+
+    idx, dist = gallery.nearest(queries, k=3)
+    assert idx.shape == dist.shape == (10, 3)
+
+    for q, query in enumerate(queries):
+        expected = face_distance(gallery.matrix, query)
+        order = np.argsort(expected)[:3]
+        np.testing.assert_array_equal(idx[q], order)
+        np.testing.assert_allclose(dist[q], expected[order], rtol=1e-12)
+
+
+def test_templates_use_the_closest_row():
+    rows, matrix = random_gallery(50, templates=3, seed=2)
+    gallery = Gallery.from_matrix(rows, matrix)
+    assert len(gallery) == 50 and gallery.multi
+    queries = queries_near(matrix, 8, seed=3)
+
+    idx, dist = gallery.nearest(queries, k=2)
+    per_student = np.array([
+        face_distance(gallery.matrix, query).reshape(50, 3).min(axis=1) for query in queries
+    ])
+    for q in range(len(queries)):
+        order = np.argsort(per_student[q])[:2]
+        np.testing.assert_array_equal(idx[q], order)
+        np.testing.assert_allclose(dist[q], per_student[q][order], rtol=1e-6)
+
+
+def test_rows_of_a_student_are_grouped():
+    matrix = np.eye(4, 128)
+    gallery = Gallery.from_matrix([(7, "A"), (9, "B"), (7, "A"), (9, "B")], matrix)
+
+    assert gallery.students == [(7, "A"), (9, "B")]
+    np.testing.assert_array_equal(gallery.matrix, matrix[[0, 2, 1, 3]])
+    idx, dist = gallery.nearest(matrix[2], k=1)
+    assert gallery.students[idx[0, 0]] == (7, "A") and dist[0, 0] == 0
+
+
+def test_subset_and_small_galleries():
+    rows, matrix = random_gallery(10, templates=2, seed=4)
+    gallery = Gallery.from_matrix(rows, matrix)
+
+    roster = gallery.subset([2, 5, 42])
+    assert roster.students == [(2, "Student 2"), (5, "Student 5")]
+    np.testing.assert_array_equal(roster.matrix, matrix[[2, 3, 8, 9]].astype(np.float32))
+
+    idx, dist = roster.nearest(matrix[:3], k=5)
+    assert idx.shape == (3, 2)
+
+    empty = Gallery([])
+    idx, dist = empty.nearest(matrix[:3], k=2)
+    assert idx.shape == dist.shape == (3, 0)
+    assert len(gallery.subset([])) == 0
@@ -0,0 +1,89 @@
+import numpy as np
+
+from app.database.encoding_codec import pack_encoding
+from app.recognition.gallery_cache import GalleryCache
+
+
+def add(db, codes, seed=0):
+    enc = np.random.default_rng(seed).normal(0.0, 0.1, size=(len(codes), 128))
+    ids = db.bulk_upsert_students([(c, f"Student {c}", e) for c, e in zip(codes, enc)])
+    return ids, enc.astype(np.float32)
+
+
+def cached(cache):
+    students, matrix = cache.load()
+    return dict(zip((sid for sid, _ in students), np.asarray(matrix)))
+
+
+def test_first_sync_builds_the_cache(db, tmp_path):
+    cache = GalleryCache(str(tmp_path / "cache"))
+    assert cache.load() is None
+
+    ids, enc = add(db, ["A", "B", "C"])
+    assert cache.sync(db)
+    rows = cached(cache)
+    assert set(rows) == set(ids.values())
+    np.testing.assert_array_equal(rows[ids["B"]], enc[1])
+
+    # nothing changed: no new generation
+    assert not cache.sync(db)
+
+
+def test_incremental_sync_sees_updates_clears_and_deletions(db, tmp_path):
+    cache = GalleryCache(str(tmp_path / "cache"))
+    ids, _ = add(db, ["A", "B", "C", "D"])
+    cache.sync(db)
+    cache.load()
+
+    new_ids, new_enc = add(db, ["A", "E"], seed=1)
+    db.clear_encodings(["B"])
+    with db.transaction() as cursor:
+        cursor.execute("DELETE FROM students WHERE id = %s", (ids["C"],))
+
+    assert cache.sync(db)
+    rows = cached(cache)
+    assert set(rows) == {ids["A"], ids["D"], new_ids["E"]}
+    np.testing.assert_array_equal(rows[ids["A"]], new_enc[0])
+
+
+def test_delete_plus_insert_is_not_missed(db, tmp_path):
+    cache = GalleryCache(str(tmp_path / "cache"))
+    ids, _ = add(db, ["A", "B"])
+    cache.sync(db)
+    cache.load()
+
+    # same student count as before
+    with db.transaction() as cursor:
+        cursor.execute("DELETE FROM students WHERE id = %s", (ids["A"],))
+    new_ids, _ = add(db, ["C"], seed=2)
+
+    assert cache.sync(db)
+    assert set(cached(cache)) == {ids["B"], new_ids["C"]}
+
+
+def test_undecodable_row_does_not_force_resyncs(db, tmp_path):
+    cache = GalleryCache(str(tmp_path / "cache"))
+    ids, _ = add(db, ["A", "B"])
+    with db.transaction() as cursor:
+        cursor.execute("UPDATE students SET face_encoding = %s WHERE id = %s",
+                       (pack_encoding(np.zeros(128))[:-4], ids["A"]))
+
+    cache.sync(db)
+    cache.load()
+    assert set(cached(cache)) == {ids["B"]}
+    assert not cache.sync(db)
+
+
+def test_one_file_per_generation(db, tmp_path):
+    folder = tmp_path / "cache"
+    cache = GalleryCache(str(folder))
+    for seed in range(3):
+        add(db, [f"S{seed}"], seed=seed)
+        cache.sync(db)
+
+    files = sorted(p.name for p in folder.iterdir())
+    assert [f for f in files if f.endswith(".npy")] == [cache._read_meta()["file"]]
+    assert "gallery.json" in files and not any(f.endswith(".tmp") for f in files)
+
+    # a cache built for another template count is not reused
+    assert GalleryCache(str(folder), max_templates=3).load() is None
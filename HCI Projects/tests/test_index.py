@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from app.recognition.gallery import Gallery
+from app.recognition.index import ExactIndex, IVFIndex, make_index
+
+
+def random_gallery(n, templates=1, seed=0):
+    rng = np.random.default_rng(seed)
+    matrix = rng.normal(0.0, 0.1, size=(n * templates, 128))
+    rows = [(sid, f"Student {sid}") for sid in range(1, n + 1) for _ in range(templates)]
+    return rows, matrix
+
+
+def queries_near(matrix, n, seed=1):
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(matrix), n, replace=False)
+    return matrix[picks] + rng.normal(0.0, 0.02, size=(n, 128))
+
+
+def test_ivf_recall_against_exact():
+    rows, matrix = random_gallery(2000, seed=5)
+    gallery = Gallery.from_matrix(rows, matrix)
+    queries = queries_near(matrix, 100, seed=6)
+
+    exact_idx, exact_dist = ExactIndex(gallery).search(queries, k=2)
+    ivf = IVFIndex(gallery, n_lists=32, n_probe=8)
+    idx, dist = ivf.search(queries, k=2)
+
+    recall = np.mean(idx[:, 0] == exact_idx[:, 0])
+    assert recall >= 0.95
+    # whatever it finds is measured exactly
+    hit = idx[:, 0] == exact_idx[:, 0]
+    np.testing.assert_allclose(dist[hit, 0], exact_dist[hit, 0])
+
+
+def test_ivf_probing_every_list_is_exact():
+    rows, matrix = random_gallery(300, seed=7)
+    gallery = Gallery.from_matrix(rows, matrix)
+    queries = queries_near(matrix, 20, seed=8)
+
+    exact_idx, exact_dist = ExactIndex(gallery).search(queries, k=3)
+    idx, dist = IVFIndex(gallery, n_lists=8, n_probe=8).search(queries, k=3)
+    np.testing.assert_array_equal(idx, exact_idx)
+    np.testing.assert_allclose(dist, exact_dist)
+
+
+def test_make_index():
+    rows, matrix = random_gallery(20, seed=9)
+    gallery = Gallery.from_matrix(rows, matrix)
+
+    assert isinstance(make_index("ivf", gallery, n_lists=4), IVFIndex)
+    assert isinstance(make_index("ivf", gallery.subset([1])), ExactIndex)
+    with pytest.raises(ValueError):
+        make_index("hnsw", gallery)
@@ -0,0 +1,91 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+
+from app.recognition.pipeline import CameraStream, FrameSlots, RecognitionPipeline
+from app.recognition.tracker import FaceTracker
+
+
+def test_slots_keep_the_latest_frame():
+    slots = FrameSlots()
+    slots.put("a", 1)
+    slots.put("b", 1)
+    slots.put("a", 2)
+
+    assert slots.dropped == 1
+    assert [slots.get(0), slots.get(0), slots.get(0)] == [1, 2, None]
+
+
+def test_exclusive_slots_hand_a_camera_to_one_consumer():
+    slots = FrameSlots(exclusive=True)
+    slots.put("a", 1)
+    slots.put("b", 1)
+    assert slots.get(0) == 1        # camera a
+
+    slots.put("a", 2)
+    assert slots.get(0) == 1        # b: a is still being worked on
+    assert slots.get(0) is None
+
+    slots.done("a")
+    assert slots.get(0) == 2
+
+
+class FakeCapture:
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    def read(self):
+        if not self.frames:
+            return False, None
+        self.frames -= 1
+        time.sleep(0.001)
+        return True, np.zeros((480, 640, 3), np.uint8)
+
+    def release(self):
+        pass
+
+
+class CountingRecognizer:
+    """
+    Counts calls made for a camera another worker is still on.
+    """
+
+    def __init__(self):
+        self.busy = set()
+        self.lock = threading.Lock()
+        self.overlaps = 0
+
+    def recognize_faces(self, frame, tracker=None, detection=None):
+        with self.lock:
+            if tracker in self.busy:
+                self.overlaps += 1
+            self.busy.add(tracker)
+        time.sleep(0.005)
+        with self.lock:
+            self.busy.discard(tracker)
+        return [], []
+
+
+def test_a_camera_is_recognized_by_one_worker_at_a_time():
+    recognizer = CountingRecognizer()
+    streams = [CameraStream(i, tracker=FaceTracker()) for i in range(2)]
+    reported = {stream: [] for stream in streams}
+
+    pipeline = RecognitionPipeline(
+        recognizer, streams,
+        open_capture=lambda source: FakeCapture(200),
+        on_frame=lambda *args: None,
+        on_results=lambda stream, boxes, results: reported[stream].append(stream.latest_seq),
+        workers=4
+    )
+    pipeline.start()
+    pipeline.join(timeout=10.0)
+
+    assert recognizer.overlaps == 0
+    for seqs in reported.values():
+        assert seqs and seqs == sorted(set(seqs))
@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip("cv2")
+
+from app.recognition.scheduler import AdaptiveScheduler, CpuBudget
+
+
+def passes_per_second(schedulers, seconds=10.0, step=0.01):
+    # cameras deliver frames side by side
+    claimed, now = [0] * len(schedulers), 0.0
+    while now < seconds:
+        for i, scheduler in enumerate(schedulers):
+            claimed[i] += scheduler.claim(now)
+        now += step
+    return [count / seconds for count in claimed]
+
+
+def test_budget_is_split_in_proportion():
+    budget = CpuBudget(cores=1.0)
+    assert budget.share("a", 0.3) == 0.3
+    assert budget.share("b", 0.5) == 0.5
+
+    # 0.6 + 0.9 asked for, 1.0 available
+    assert budget.share("a", 0.6) == pytest.approx(0.6 / 1.1)
+    assert budget.share("b", 0.9) == pytest.approx(0.6)
+
+    budget.release("a")
+    assert budget.share("b", 0.9) == 0.9
+
+
+def test_cameras_share_one_budget():
+    budget = CpuBudget(cores=1.0)
+    cameras = [AdaptiveScheduler(max_rate=15.0, budget=budget) for _ in range(4)]
+    for scheduler in cameras:
+        # a new face: maximum rate, each pass takes 0.1 s of CPU
+        scheduler.observe_results([{"track_id": 1, "student_id": None}], 0.1, now=0.0)
+
+    rates = passes_per_second(cameras)
+    # 4 cameras x 15 passes/s x 0.1 s would be 6 cores
+    assert sum(rate * 0.1 for rate in rates) == pytest.approx(1.0, rel=0.1)
+
+
+def test_reset_gives_the_share_back():
+    budget = CpuBudget(cores=1.0)
+    busy, idle = (AdaptiveScheduler(budget=budget) for _ in range(2))
+    for scheduler in (busy, idle):
+        scheduler.observe_results([{"track_id": 1, "student_id": None}], 0.2, now=0.0)
+        scheduler.claim(0.0)
+
+    idle.reset()
+    assert busy._capped_rate() == pytest.approx(5.0)
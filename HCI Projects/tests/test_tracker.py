@@ -0,0 +1,94 @@
+from app.recognition.presence import PresenceState
+from app.recognition.tracker import FaceTracker, box_iou
+
+
+def match(student_id, name="Student"):
+    return {"student_id": student_id, "name": name, "distance": 0.4}
+
+
+def test_box_iou():
+    box = (10, 60, 60, 10)      # top, right, bottom, left
+    assert box_iou(box, box) == 1.0
+    assert box_iou(box, (100, 160, 160, 100)) == 0.0
+    assert abs(box_iou(box, (10, 85, 60, 35)) - 1 / 3) < 1e-9
+
+
+# =========================
+# TRACKER
+# =========================
+def test_tracker_encodes_until_confirmed_then_reverifies():
+    tracker = FaceTracker(confirm_hits=3, reverify_every=2.0, max_age=1.0)
+    box = (10, 60, 60, 10)
+    now = 0.0
+
+    for _ in range(3):
+        tracks, todo = tracker.assign([box], now)
+        assert todo == [0]
+        tracker.update(tracks[0], match(7), now)
+        now += 0.1
+
+    # confirmed: carried over without encoding
+    tracks, todo = tracker.assign([(12, 62, 62, 12)], now)
+    assert todo == []
+    result = tracker.result(tracks[0])
+    assert result["student_id"] == 7 and result["track_id"] == tracks[0].id
+    assert result["fresh"] is False
+
+    tracks, todo = tracker.assign([box], 0.2 + 2.0)
+    assert todo == [0]
+    tracker.update(tracks[0], match(7), 2.2)
+    assert tracker.result(tracks[0], fresh=True)["fresh"] is True
+
+
+def test_tracker_disagreement_and_expiry():
+    tracker = FaceTracker(confirm_hits=2, max_age=1.0)
+    box = (10, 60, 60, 10)
+
+    tracks, _ = tracker.assign([box], 0.0)
+    first = tracks[0].id
+    tracker.update(tracks[0], match(7), 0.0)
+    tracker.update(tracks[0], match(8), 0.1)
+    assert tracks[0].hits == 1
+
+    # a second face far away gets its own track
+    tracks, todo = tracker.assign([box, (200, 260, 260, 200)], 0.5)
+    assert tracks[0].id == first and tracks[1].id != first and 1 in todo
+    assert len(tracker.boxes()) == 2
+
+    # gone longer than max_age: a new track
+    tracks, todo = tracker.assign([box], 5.0)
+    assert tracks[0].id != first and todo == [0]
+    tracker.reset()
+    assert tracker.boxes() == []
+
+
+# =========================
+# PRESENCE
+# =========================
+def test_presence_counts_fresh_sightings_only():
+    presence = PresenceState(required=3)
+
+    carried = dict(match(7, "A"), fresh=False)
+    for _ in range(10):
+        assert presence.observe([carried, match(None)]) == []
+    assert 7 not in presence
+
+    fresh = dict(match(7, "A"), fresh=True)
+    assert presence.observe([fresh]) == []
+    assert presence.observe([fresh]) == []
+    assert presence.observe([fresh]) == [(7, "A")]
+    assert presence.observe([fresh]) == []
+    assert 7 in presence
+
+
+def test_presence_adds_up_cameras_and_resets():
+    presence = PresenceState(required=2)
+    present = presence.present
+
+    # results without the flag (no tracker) all count
+    assert presence.observe([match(3, "B")], now=1.0) == []
+    assert presence.observe([match(3, "B")], now=2.0) == [(3, "B")]
+    assert presence.sightings[3] == {"count": 2, "last": 2.0}
+
+    presence.reset()
+    assert present is presence.present and not present and 3 not in presence